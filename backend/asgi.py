@@ -0,0 +1,12 @@
+"""ASGI entry point for the optional async stack (see servicehub/aio).
+
+    pip install -r requirements-async.txt
+    hypercorn asgi:app --bind 0.0.0.0:5001
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from servicehub.aio import create_async_app  # noqa: E402 (settings are read from the environment on import)
+
+app = create_async_app()
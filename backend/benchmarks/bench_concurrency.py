@@ -0,0 +1,117 @@
+"""Per-process concurrency benchmark: Flask/gunicorn vs. Quart/hypercorn.
+
+Starts ``fake_vendor.py`` with an injected latency, then one server process
+per stack (a single gthread gunicorn worker, a single hypercorn worker) and
+drives ``/api/llr/check-status`` with many concurrent clients.  Each request
+is one vendor round trip, so throughput is bounded by how many vendor calls
+one process can keep in flight.
+
+Needs a MongoDB at MONGO_URI (test tokens are inserted into and removed from
+``llr_tokens``) and the packages in ``requirements-async.txt``.
+
+    python benchmarks/bench_concurrency.py [clients] [vendor latency seconds]
+"""
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+from pymongo import MongoClient
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VENDOR_PORT = 5055
+SERVERS = {
+    "flask (gunicorn gthread, 1 worker)": [
+        'gunicorn', '-c', 'gunicorn.conf.py', '--workers', '1', '--bind', '127.0.0.1:5101', 'app:app'
+    ],
+    "quart (hypercorn, 1 worker)": [
+        'hypercorn', '--workers', '1', '--bind', '127.0.0.1:5102', 'asgi:app'
+    ],
+}
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def start(command, env):
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def drive(base_url, tokens):
+    latencies = []
+    statuses = []
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300,
+                                 limits=httpx.Limits(max_connections=None)) as client:
+        async def one(token):
+            started = time.perf_counter()
+            response = await client.post('/api/llr/check-status', json={"token": token})
+            latencies.append(time.perf_counter() - started)
+            statuses.append(response.status_code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(token) for token in tokens))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "elapsed": elapsed,
+        "ok": statuses.count(200),
+        "shed": statuses.count(503),
+        "p50": statistics.median(latencies),
+        "max": max(latencies),
+    }
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+
+    env = dict(os.environ, VENDOR_BASE_URL=f"http://127.0.0.1:{VENDOR_PORT}",
+               FAKE_VENDOR_LATENCY=str(latency), FAKE_VENDOR_PORT=str(VENDOR_PORT))
+    db = MongoClient(env['MONGO_URI'])[env.get('MONGO_DB_NAME', 'servicehub')]
+    run_id = uuid.uuid4().hex
+    tokens = [f"bench-{run_id}-{i}" for i in range(clients)]
+
+    vendor = start([sys.executable, 'fake_vendor.py'], env)
+    try:
+        wait_until_up(f"http://127.0.0.1:{VENDOR_PORT}/__config")
+        print(f"clients: {clients}  vendor latency: {latency}s")
+        for name, command in SERVERS.items():
+            # Fresh non-terminal tokens, so every request reaches the vendor
+            db.llr_tokens.delete_many({"benchRun": run_id})
+            db.llr_tokens.insert_many([
+                {"token": token, "status": "processing", "benchRun": run_id} for token in tokens
+            ])
+            server = start(command, env)
+            try:
+                base_url = f"http://{command[command.index('--bind') + 1]}"
+                wait_until_up(f"{base_url}/api/health")
+                result = asyncio.run(drive(base_url, tokens))
+            finally:
+                server.terminate()
+                server.wait()
+            print(f"{name:>36}: {result['ok'] / result['elapsed']:7.1f} req/s  "
+                  f"ok {result['ok']:>5}  shed {result['shed']:>5}  "
+                  f"p50 {result['p50']:6.2f}s  max {result['max']:6.2f}s")
+    finally:
+        db.llr_tokens.delete_many({"benchRun": run_id})
+        vendor.terminate()
+        vendor.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Storage and read benchmark: legacy payment_history rows vs. compact ledger buckets.
+
+Writes the same synthetic ledger (``users`` x ``entries per user``, spread
+over a year) in both formats into a scratch database, then reports data and
+index sizes from ``collStats`` and the median time to read one user's full
+history the way ``/api/user/payment-history`` does.
+
+    MONGO_URI=... python benchmarks/bench_ledger.py [users] [entries per user]
+
+The scratch database (``servicehub_bench_ledger``) is dropped afterwards.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from servicehub.ledger import compact_operations, merge_history  # noqa: E402
+
+BENCH_DB = 'servicehub_bench_ledger'
+TYPES = ['debit', 'debit', 'debit', 'credit', 'refund']
+
+
+def synthetic_rows(users, per_user):
+    start = datetime(2025, 1, 1)
+    for user in users:
+        balance = 5000.0
+        for i in range(per_user):
+            transaction_type = random.choice(TYPES)
+            amount = random.choice([30.0, 50.0, 120.0, 200.0, 500.0])
+            balance += amount if transaction_type != 'debit' else -amount
+            yield {
+                "userId": user['_id'],
+                "userName": user['name'],
+                "userMobile": user['mobile'],
+                "transactionType": transaction_type,
+                "amount": amount,
+                "description": f"Payment for LLR Exam service - Application: AP{random.randint(10**9, 10**10)}",
+                "referenceId": str(ObjectId()),
+                "balanceAfter": balance,
+                "createdAt": start + timedelta(minutes=i * 525600 // per_user)
+            }
+
+
+def sizes(db, name):
+    stats = db.command('collStats', name)
+    return stats['size'], stats['storageSize'], stats['totalIndexSize']
+
+
+def time_reads(read, user_ids, repeat=3):
+    samples = []
+    for _ in range(repeat):
+        for user_id in user_ids:
+            started = time.perf_counter()
+            read(user_id)
+            samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    user_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    client = MongoClient(os.environ['MONGO_URI'])
+    client.drop_database(BENCH_DB)
+    db = client[BENCH_DB]
+    try:
+        users = [{"_id": ObjectId(), "name": f"Retailer {i}", "mobile": f"98{i:08d}"} for i in range(user_count)]
+        db.users.insert_many(users)
+        db.payment_history.create_index([("userId", 1), ("createdAt", -1)])
+        db.ledger_buckets.create_index([("u", 1), ("m", -1)])
+
+        batch = []
+        for row in synthetic_rows(users, per_user):
+            batch.append(row)
+            if len(batch) == 5000:
+                db.payment_history.insert_many([dict(doc) for doc in batch])
+                db.ledger_buckets.bulk_write(compact_operations(batch), ordered=False)
+                batch = []
+        if batch:
+            db.payment_history.insert_many([dict(doc) for doc in batch])
+            db.ledger_buckets.bulk_write(compact_operations(batch), ordered=False)
+
+        def read_legacy(user_id):
+            return list(db.payment_history.find({"userId": user_id}).sort("createdAt", -1))
+
+        def read_compact(user_id):
+            buckets = list(db.ledger_buckets.find({"u": user_id}))
+            user = db.users.find_one({"_id": user_id}, {"name": 1, "mobile": 1})
+            return merge_history([], buckets, user)
+
+        sample = [user['_id'] for user in random.sample(users, min(20, len(users)))]
+        print(f"users: {user_count}  entries per user: {per_user}")
+        print(f"{'format':>8} {'data MB':>9} {'storage MB':>11} {'index MB':>9} {'read ms (p50)':>14}")
+        for label, name, read in (('legacy', 'payment_history', read_legacy),
+                                  ('compact', 'ledger_buckets', read_compact)):
+            data, storage, index = sizes(db, name)
+            print(f"{label:>8} {data / 2**20:9.2f} {storage / 2**20:11.2f} {index / 2**20:9.2f} "
+                  f"{time_reads(read, sample):14.2f}")
+    finally:
+        client.drop_database(BENCH_DB)
+
+
+if __name__ == '__main__':
+    main()
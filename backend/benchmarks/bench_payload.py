@@ -0,0 +1,124 @@
+"""Bytes on the wire per page load, before and after trimming and compression.
+
+Seeds a scratch database with one retailer's history (service requests, LLR
+tokens with their vendor responses and PDFs, DL PDFs and ledger entries),
+then replays each page's API calls through the Flask test client twice:
+
+* before: the calls the page made originally, full documents (``?fields=*``)
+  and ``Accept-Encoding: identity``
+* after: the calls it makes now, default fields, with gzip and with brotli
+
+    MONGO_URI=... python benchmarks/bench_payload.py [requests] [llr tokens]
+
+The scratch database (``servicehub_bench_payload``) is dropped afterwards.
+"""
+import base64
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+BENCH_DB = 'servicehub_bench_payload'
+os.environ['MONGO_DB_NAME'] = BENCH_DB
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson.objectid import ObjectId  # noqa: E402
+from pymongo import MongoClient  # noqa: E402
+
+from servicehub import create_app  # noqa: E402
+from servicehub.compression import brotli  # noqa: E402
+from servicehub.helpers import build_payment_history_doc  # noqa: E402
+from servicehub.ledger import append_entries  # noqa: E402
+
+
+def fake_pdf(size=180_000):
+    # Real PDFs are mostly deflated streams; random bytes are a fair stand-in
+    return base64.b64encode(os.urandom(size)).decode()
+
+
+def seed(db, request_count, token_count):
+    user = {"_id": ObjectId(), "name": "Retailer", "mobile": "9800000000", "password": "x",
+            "walletBalance": 5000.0, "isBlocked": False}
+    service = {"_id": ObjectId(), "name": "PAN Card", "description": "New PAN application",
+               "defaultPrice": 50.0, "isActive": True,
+               "fields": [{"name": f"field{i}", "type": "text", "required": True} for i in range(6)]}
+    db.users.insert_one(user)
+    db.services.insert_one(service)
+    start = datetime(2026, 1, 1)
+    db.service_requests.insert_many([{
+        "userId": user['_id'], "userName": user['name'], "userMobile": user['mobile'],
+        "serviceId": service['_id'], "serviceName": service['name'], "servicePrice": 50.0,
+        "fieldData": {f"field{j}": f"value {random.randint(10**8, 10**9)}" for j in range(6)},
+        "status": random.choice(['pending', 'success', 'failed']), "adminMessage": "Done",
+        "createdAt": start + timedelta(hours=i), "updatedAt": start + timedelta(hours=i)
+    } for i in range(request_count)])
+    tokens = []
+    for i in range(token_count):
+        vendor_response = {"status": "200", "token": f"T{i:08d}", "applno": f"AP{i:010d}",
+                           "applname": "APPLICANT NAME", "queue": str(i), "rtocode": "AP01",
+                           "rtoname": "RTO OFFICE", "statecode": "AP", "statename": "STATE"}
+        tokens.append(dict(vendor_response, **{
+            "userId": user['_id'], "userName": user['name'], "userMobile": user['mobile'],
+            "serviceId": service['_id'], "serviceName": "LLR Exam", "servicePrice": 200.0,
+            "dob": "01-01-2000", "status": "completed", "apiResponse": vendor_response,
+            "latestResponse": dict(vendor_response, message="...", remarks="Passed"),
+            "pdfData": fake_pdf(), "filename": f"{i}.pdf", "remarks": "Passed",
+            "createdAt": start + timedelta(hours=i), "completedAt": start + timedelta(hours=i, minutes=5)
+        }))
+    db.llr_tokens.insert_many(tokens)
+    dl_pdf = db.dl_pdfs.insert_one({
+        "userId": user['_id'], "serviceId": service['_id'], "serviceName": "DL PDF", "servicePrice": 30.0,
+        "dlno": "AP0120200001234", "pdfType": "1", "name": "HOLDER", "dob": "01-01-1990",
+        "status": "completed", "pdfData": fake_pdf(), "createdAt": start
+    }).inserted_id
+    return user, dl_pdf
+
+
+def page_bytes(client, urls, encoding):
+    total = 0
+    for url in urls:
+        response = client.get(url, headers={"Accept-Encoding": encoding})
+        assert response.status_code == 200, (url, response.status_code)
+        total += len(response.get_data())
+    return total
+
+
+def main():
+    request_count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    token_count = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    mongo = MongoClient(os.environ['MONGO_URI'])
+    mongo.drop_database(BENCH_DB)
+    app = create_app()
+    try:
+        with app.app_context():
+            user, dl_pdf = seed(mongo[BENCH_DB], request_count, token_count)
+            append_entries([build_payment_history_doc(user, "debit", 50.0, "Payment for PAN Card service",
+                                                      str(ObjectId()), 5000.0 - i)
+                            for i in range(request_count)])
+        uid = user['_id']
+        pages = {
+            'user dashboard': (
+                [f'/api/user/refresh/{uid}', f'/api/user/services/{uid}',
+                 f'/api/user/service-requests/{uid}?fields=*', f'/api/user/payment-history/{uid}'],
+                [f'/api/user/summary/{uid}', f'/api/user/services/{uid}']
+            ),
+            'llr tokens': ([f'/api/llr/user-tokens/{uid}?fields=*'], [f'/api/llr/user-tokens/{uid}']),
+            'admin requests': (['/api/admin/service-requests?fields=*'], ['/api/admin/service-requests']),
+            'dl download': ([f'/api/dl/download-pdf/{dl_pdf}'], [f'/api/dl/download-pdf/{dl_pdf}']),
+        }
+        encodings = ['gzip'] + (['br'] if brotli is not None else [])
+        client = app.test_client()
+        print(f"requests: {request_count}  llr tokens: {token_count}")
+        print(f"{'page':>16} {'before KB':>10} " + " ".join(f"{'after ' + e + ' KB':>14}" for e in encodings))
+        for page, (before_urls, after_urls) in pages.items():
+            before = page_bytes(client, before_urls, 'identity')
+            after = [page_bytes(client, after_urls, encoding) for encoding in encodings]
+            print(f"{page:>16} {before / 1024:10.1f} " + " ".join(f"{size / 1024:14.1f}" for size in after))
+    finally:
+        mongo.drop_database(BENCH_DB)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Cold-start benchmark for the API.
+
+Each run starts a fresh interpreter, imports ``app`` (which builds the app
+through ``create_app``), serves one ``/api/health`` request and reports how
+long that took and how many MongoDB connections and server checks happened
+along the way.  Both should stay at zero before the first real request.
+
+    python benchmarks/bench_startup.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r'''
+import json, time
+from pymongo import monitoring
+
+events = {"connections": 0, "heartbeats": 0}
+
+class ConnectionCounter(monitoring.ConnectionPoolListener):
+    def connection_created(self, event): events["connections"] += 1
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): pass
+    def connection_check_out_started(self, event): pass
+    def connection_check_out_failed(self, event): pass
+    def connection_checked_out(self, event): pass
+    def connection_checked_in(self, event): pass
+
+class HeartbeatCounter(monitoring.ServerHeartbeatListener):
+    def started(self, event): events["heartbeats"] += 1
+    def succeeded(self, event): pass
+    def failed(self, event): pass
+
+monitoring.register(ConnectionCounter())
+monitoring.register(HeartbeatCounter())
+
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get('/api/health')
+served = time.perf_counter()
+
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_request_ms": (served - imported) * 1000,
+    "status": response.status_code,
+    **events
+}))
+'''
+
+
+def run_once():
+    env = dict(os.environ)
+    # An address nothing listens on: any eager connection attempt would show up
+    env.setdefault('MONGO_URI', 'mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=200')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = [run_once() for _ in range(runs)]
+    print(f"runs: {runs}")
+    for key in ('import_ms', 'first_request_ms'):
+        values = [r[key] for r in results]
+        print(f"{key:>18}: median {statistics.median(values):8.1f}  max {max(values):8.1f}")
+    print(f"{'mongo connections':>18}: {max(r['connections'] for r in results)}")
+    print(f"{'mongo heartbeats':>18}: {max(r['heartbeats'] for r in results)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Local stand-in for the jkdigitalcenter API.
+
+Run it and point the backend at it to exercise vendor failure handling
+without spending real credits:
+
+    python fake_vendor.py                      # listens on :5055
+    VENDOR_BASE_URL=http://localhost:5055 python app.py
+
+Latency and failures can be injected at start-up with FAKE_VENDOR_LATENCY
+(seconds) and FAKE_VENDOR_FAILURE_RATE (0-1), or changed while running:
+
+    curl -X POST localhost:5055/__config -d '{"latency": 45, "failureRate": 0.5}' \
+         -H 'Content-Type: application/json'
+
+``paymentStatus`` (FAKE_VENDOR_PAYMENT_STATUS) sets what pg-order-status
+reports, e.g. "404" to leave payments unpaid for the reconciliation worker.
+"""
+import base64
+import os
+import random
+import time
+import uuid
+
+from flask import Flask, jsonify, request
+
+app = Flask(__name__)
+
+config = {
+    "latency": float(os.getenv('FAKE_VENDOR_LATENCY', 0)),
+    "failureRate": float(os.getenv('FAKE_VENDOR_FAILURE_RATE', 0))
+}
+# What pg-order-status reports: "200" (paid) or anything else (still unpaid)
+payment_config = {
+    "paymentStatus": os.getenv('FAKE_VENDOR_PAYMENT_STATUS', '200')
+}
+
+FAKE_PDF = base64.b64encode(b"%PDF-1.4\n% fake vendor document\n%%EOF\n").decode()
+
+
+def simulate():
+    """Apply injected latency; return an error response if this call should fail."""
+    if config['latency']:
+        time.sleep(config['latency'])
+    if random.random() < config['failureRate']:
+        return jsonify({"status": "500", "message": "Injected vendor failure"}), 503
+    return None
+
+
+@app.route('/__config', methods=['GET', 'POST'])
+def update_config():
+    if request.method == 'POST':
+        data = request.get_json() or {}
+        for key in config:
+            if key in data:
+                config[key] = float(data[key])
+        if 'paymentStatus' in data:
+            payment_config['paymentStatus'] = str(data['paymentStatus'])
+    return jsonify(dict(config, **payment_config))
+
+
+@app.route('/api/v2/llexam/doexam.php', methods=['POST'])
+def do_exam():
+    failure = simulate()
+    if failure:
+        return failure
+    applno = request.form.get('applno', '')
+    return jsonify({
+        "status": "200",
+        "token": uuid.uuid4().hex,
+        "applno": applno,
+        "applname": "TEST APPLICANT",
+        "dob": request.form.get('dob', ''),
+        "queue": "1",
+        "rtocode": "MH01",
+        "rtoname": "TEST RTO",
+        "statecode": "MH",
+        "statename": "MAHARASHTRA"
+    })
+
+
+@app.route('/api/v2/llexam/checkexam.php', methods=['POST'])
+def check_exam():
+    failure = simulate()
+    if failure:
+        return failure
+    return jsonify({
+        "status": "200",
+        "message": FAKE_PDF,
+        "filename": f"{request.form.get('token', 'llr')}.pdf",
+        "remarks": "PASSED"
+    })
+
+
+@app.route('/api/v2/dlpdfapi.php', methods=['POST'])
+def dl_pdf():
+    failure = simulate()
+    if failure:
+        return failure
+    return jsonify({
+        "status": "200",
+        "name": "TEST HOLDER",
+        "dob": "01-01-1990",
+        "pdf": FAKE_PDF
+    })
+
+
+@app.route('/api/v2/pg/orders/pg-order-status.php', methods=['GET'])
+def pg_order_status():
+    failure = simulate()
+    if failure:
+        return failure
+    return jsonify({"status": payment_config['paymentStatus'], "txnid": request.args.get('txnid')})
+
+
+if __name__ == '__main__':
+    app.run(port=int(os.getenv('FAKE_VENDOR_PORT', 5055)), threaded=True)
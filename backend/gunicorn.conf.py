@@ -0,0 +1,39 @@
+"""Production gunicorn settings.
+
+    flask --app app init-db                 # once per deploy: indexes + default admin
+    gunicorn -c gunicorn.conf.py app:app
+    flask --app app reconcile-payments      # background workers, beside gunicorn
+    flask --app app purge-services
+
+Requests spend most of their time waiting on MongoDB and on 30-90 s vendor
+calls, so each worker runs many threads (gthread) rather than relying on more
+processes.  Set GUNICORN_WORKER_CLASS=gevent (with gevent installed) to hold
+even more concurrent vendor calls per process.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.getenv('GUNICORN_THREADS', 16))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 500))  # gevent only
+
+# The app is imported in each worker after the fork, so every worker creates
+# its own MongoClient whose pool (MONGO_MAX_POOL_SIZE) matches its threads.
+preload_app = False
+raw_env = [f"MONGO_MAX_POOL_SIZE={os.getenv('MONGO_MAX_POOL_SIZE', threads)}"]
+
+# LLR exam submission waits up to 90 s on the vendor
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth from large PDF payloads;
+# nothing long-running may live on a worker thread, so service purges run in purge-services
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
@@ -0,0 +1,42 @@
+"""Service Hub API application factory."""
+from flask import Flask, jsonify
+from flask_cors import CORS
+
+from .auth import check_secret_key
+from .extensions import Services
+
+
+def create_app(services=None):
+    """Build the Flask app.
+
+    ``services`` lets callers inject their own ``Services`` container (for
+    example one wrapping a test database); by default every dependency is
+    created lazily on first use, so building the app does no network I/O.
+    """
+    app = Flask(__name__)
+    check_secret_key(app.debug)
+    CORS(app, resources={
+        r"/api/*": {
+            "origins": ["*"],
+            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type", "Authorization", "Idempotency-Key"]
+        }
+    })
+    app.extensions['servicehub'] = services or Services()
+
+    from .blueprints import admin, dl, llr, payment, user
+    from .cli import register_commands
+    from .compression import compress_response
+    from .helpers import load_auth_claims
+
+    app.before_request(load_auth_claims)
+    app.after_request(compress_response)
+    for module in (admin, user, llr, dl, payment):
+        app.register_blueprint(module.bp)
+    register_commands(app)
+
+    @app.route('/api/health', methods=['GET'])
+    def health_check():
+        return jsonify({"status": "healthy", "message": "Service Hub API is running"})
+
+    return app
@@ -0,0 +1,59 @@
+"""Optional asyncio stack: Quart + Motor + httpx.
+
+Serves the I/O-bound routes (``/api/llr/*``, ``/api/dl/*`` and
+``/api/user/refresh``) with the same request and response contract as the
+Flask app, so a reverse proxy can send those paths here while everything
+else stays on gunicorn.  A vendor call in flight costs a coroutine instead
+of a worker thread.  Requires the packages in ``requirements-async.txt``.
+"""
+from flask.helpers import get_debug_flag
+from quart import Quart, jsonify, request
+from quart_cors import cors
+
+from ..auth import check_secret_key
+from ..compression import choose_encoding, encode_response, is_compressible, should_compress
+from .extensions import AsyncServices
+
+
+async def compress_response(response):
+    if not is_compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    # Streamed bodies have no length up front and are left alone
+    if not should_compress(response):
+        return response
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    return encode_response(response, await response.get_data(), encoding)
+
+
+def create_async_app(services=None):
+    """Build the Quart app; ``services`` works like in ``create_app``."""
+    app = Quart(__name__)
+    check_secret_key(app.debug or get_debug_flag())
+    app = cors(
+        app,
+        allow_origin="*",
+        allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        allow_headers=["Content-Type", "Authorization", "Idempotency-Key"]
+    )
+    app.extensions['servicehub'] = services or AsyncServices()
+
+    from .blueprints import dl, llr, user
+    from .helpers import load_auth_claims
+
+    app.before_request(load_auth_claims)
+    app.after_request(compress_response)
+    for module in (user, llr, dl):
+        app.register_blueprint(module.bp)
+
+    @app.after_serving
+    async def close_services():
+        await app.extensions['servicehub'].close()
+
+    @app.route('/api/health', methods=['GET'])
+    async def health_check():
+        return jsonify({"status": "healthy", "message": "Service Hub async API is running"})
+
+    return app
@@ -0,0 +1,27 @@
+"""Revocation set for the asyncio stack."""
+import asyncio
+
+from ..auth import BLOCKED_USERS_QUERY, RevocationSet
+
+
+class AsyncRevocationSet(RevocationSet):
+    """``RevocationSet`` over a Motor collection; only the reload is awaited."""
+
+    def __init__(self, users_collection, **kwargs):
+        super().__init__(users_collection, **kwargs)
+        self._reload_lock = None
+
+    async def _reload_if_stale(self):
+        if not self._is_stale():
+            return
+        if self._reload_lock is None:
+            self._reload_lock = asyncio.Lock()
+        async with self._reload_lock:
+            if not self._is_stale():
+                return
+            cursor = self.users_collection.find(BLOCKED_USERS_QUERY, {"_id": 1})
+            self._replace(await cursor.to_list(length=None))
+
+    async def is_revoked(self, user_id):
+        await self._reload_if_stale()
+        return str(user_id) in self._blocked
@@ -0,0 +1 @@
+"""Async blueprints: llr, dl and the user refresh endpoint."""
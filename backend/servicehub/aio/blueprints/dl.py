@@ -0,0 +1,402 @@
+"""DL PDF generation and download endpoints (asyncio stack)."""
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import httpx
+from bson.objectid import ObjectId
+from quart import Blueprint, current_app, jsonify, request, stream_with_context
+
+from ...archive import ZipStream
+from ...config import (DL_PDF_API_URL, DL_API_KEY, DL_CACHE_TTL_SECONDS, DL_CACHE_CHARGE_POLICY,
+                       DL_BULK_MAX_ITEMS, DL_BULK_WORKERS)
+from ...documents import (DL_PDF_LIST_FIELDS, DL_REQUIRED_FIELDS, DL_VENDOR_HEADERS,
+                          PDF_LIST_HIDDEN, build_dl_pdf_record, clean_dl_bulk_input, clean_dl_input,
+                          dl_bulk_filename, dl_cache_filter, dl_generation_description,
+                          dl_pdf_request, dl_refund_description, dl_success_payload,
+                          list_projection, serialize_dl_pdf, service_price_for,
+                          stored_vendor_response)
+from ...metrics import metrics
+from ...pdfstore import PDF_PROJECTION, pdf_hash
+from ...vendor import VendorUnavailable
+from ..extensions import (vendor, idempotency_store, users_collection, services_collection,
+                          user_service_prices_collection, dl_pdfs_collection)
+from ..helpers import (get_request_user, vendor_unavailable_response, debit_wallet, credit_wallet,
+                      pdf_file_response, pdf_not_modified)
+from ..idempotency import idempotent
+from ..pdfstore import load_pdf, load_pdf_bytes, release_pdf, share_pdf, store_pdf
+from ..settlement import record_order_created, refund_order_batch, reserve_order_batch, settle_order
+
+bp = Blueprint('dl', __name__)
+
+
+async def find_cached_dl_pdf(clean, with_pdf=True):
+    if DL_CACHE_TTL_SECONDS <= 0:
+        return None
+    metrics.inc('dl_cache_lookups')
+    cached = await dl_pdfs_collection.find_one(
+        dl_cache_filter(clean, datetime.utcnow() - timedelta(seconds=DL_CACHE_TTL_SECONDS)),
+        dict(PDF_PROJECTION, name=1, dob=1) if with_pdf else {"_id": 1},
+        sort=[("createdAt", -1)]
+    )
+    if cached:
+        metrics.inc('dl_cache_hits')
+        return cached
+    return None
+
+@bp.route('/api/dl/generate-pdf', methods=['POST'])
+@idempotent(idempotency_store, 'dl-generate-pdf')
+async def generate_dl_pdf():
+    try:
+        data = await request.get_json()
+
+        missing_fields = [field for field in DL_REQUIRED_FIELDS if field not in data]
+        if missing_fields:
+            return jsonify({
+                "error": f"Missing required fields: {', '.join(missing_fields)}",
+                "required_fields": DL_REQUIRED_FIELDS
+            }), 400
+
+        user_id = data['userId']
+        service_id = data['serviceId']
+        clean = clean_dl_input(data)
+
+        try:
+            user_oid = ObjectId(user_id)
+            service_oid = ObjectId(service_id)
+        except:
+            return jsonify({"error": "Invalid ID format"}), 400
+
+        user = await get_request_user(user_oid)
+        service = await services_collection.find_one({"_id": service_oid, "deletedAt": None})
+
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        if user.get('isBlocked'):
+            return jsonify({"error": "Account blocked"}), 403
+        if not service:
+            return jsonify({"error": "Service not found"}), 404
+        if not service.get('isActive', True):
+            return jsonify({"error": "Service unavailable"}), 400
+
+        user_price = await user_service_prices_collection.find_one({
+            "userId": user_oid,
+            "serviceId": service_oid
+        })
+        service_price = service_price_for(service, user_price)
+
+        if service_price <= 0:
+            return jsonify({"error": "Service price not configured"}), 400
+
+        cached = await find_cached_dl_pdf(clean)
+        if cached:
+            charge = service_price if DL_CACHE_CHARGE_POLICY == 'full' else 0
+            pdf_fields = await share_pdf(cached)
+            pdf_record = build_dl_pdf_record(
+                user, service, charge, clean, cached.get('name'), cached.get('dob'), pdf_fields,
+                cachedFrom=cached['_id']
+            )
+            stored = False
+            try:
+                if charge:
+                    settled = await settle_order(user, charge, dl_pdfs_collection, pdf_record,
+                                                 dl_generation_description(clean))
+                    if settled is None:
+                        return jsonify({"error": "Insufficient wallet balance"}), 400
+                    new_balance = settled[1]
+                else:
+                    await dl_pdfs_collection.insert_one(pdf_record)
+                    await record_order_created(dl_pdfs_collection.name, pdf_record)
+                    wallet = await users_collection.find_one({"_id": user_oid}, {"walletBalance": 1})
+                    new_balance = (wallet or {}).get('walletBalance', 0)
+                stored = True
+            finally:
+                if not stored:
+                    await release_pdf(pdf_fields)
+
+            return jsonify(dict(
+                dl_success_payload(cached.get('name'), cached.get('dob'), await load_pdf(cached), new_balance),
+                cached=True
+            ))
+
+        new_balance = await debit_wallet(user_oid, service_price)
+        if new_balance is None:
+            return jsonify({"error": "Insufficient wallet balance"}), 400
+        settled = False
+
+        metrics.inc('dl_vendor_calls')
+
+        try:
+            response = await vendor.post(
+                'dl',
+                DL_PDF_API_URL,
+                data=dl_pdf_request(clean, DL_API_KEY),
+                headers=DL_VENDOR_HEADERS,
+                timeout=60,
+                fair_key=user_oid
+            )
+            response.raise_for_status()
+
+            api_response = response.json()
+            if api_response.get('status') != '200':
+                return jsonify({
+                    "error": api_response.get('message', 'API request failed'),
+                    "api_status": api_response.get('status')
+                }), 400
+
+            pdf_fields = await store_pdf(api_response.get('pdf'))
+            pdf_record = build_dl_pdf_record(
+                user, service, service_price, clean,
+                api_response.get('name'), api_response.get('dob'), pdf_fields,
+                apiResponse=stored_vendor_response(api_response, 'pdf', pdf_fields)
+            )
+
+            try:
+                await settle_order(user, service_price, dl_pdfs_collection, pdf_record,
+                                   dl_generation_description(clean), reserved_balance=new_balance)
+            except Exception:
+                await release_pdf(pdf_fields)
+                raise
+            settled = True
+
+            return jsonify(dl_success_payload(
+                api_response.get('name'), api_response.get('dob'), api_response.get('pdf'), new_balance
+            ))
+
+        except VendorUnavailable as e:
+            return vendor_unavailable_response(e)
+        except httpx.HTTPError as e:
+            return jsonify({
+                "error": "DL API service unavailable",
+                "details": str(e)
+            }), 503
+        except ValueError as e:
+            return jsonify({
+                "error": "Invalid API response",
+                "details": str(e)
+            }), 502
+        finally:
+            if not settled:
+                await credit_wallet(user_oid, service_price)
+
+    except Exception as e:
+        current_app.logger.error(f"DL PDF Generation Error: {str(e)}")
+        return jsonify({
+            "error": "Internal server error",
+            "details": str(e)
+        }), 500
+
+async def generate_bulk_dl_item(user, service, job):
+    clean = job['clean']
+    if job['cachedFrom']:
+        cached = await dl_pdfs_collection.find_one({"_id": job['cachedFrom']}, dict(PDF_PROJECTION, name=1, dob=1))
+        if not cached or not (cached.get('pdfHash') or cached.get('pdfData')):
+            return {"success": False, "error": "Cached PDF is no longer available"}
+        name, dob = cached.get('name'), cached.get('dob')
+        pdf_fields = await share_pdf(cached)
+        extra = {"cachedFrom": cached['_id']}
+    else:
+        metrics.inc('dl_vendor_calls')
+        try:
+            response = await vendor.post(
+                'dl',
+                DL_PDF_API_URL,
+                data=dl_pdf_request(clean, DL_API_KEY),
+                headers=DL_VENDOR_HEADERS,
+                timeout=60,
+                fair_key=user['_id']
+            )
+            response.raise_for_status()
+            api_response = response.json()
+        except (VendorUnavailable, httpx.HTTPError, ValueError) as e:
+            return {"success": False, "error": f"DL API request failed: {str(e)}"}
+        if api_response.get('status') != '200' or not api_response.get('pdf'):
+            return {"success": False, "error": api_response.get('message', 'API request failed'),
+                    "api_status": api_response.get('status')}
+        name, dob = api_response.get('name'), api_response.get('dob')
+        pdf_fields = await store_pdf(api_response['pdf'])
+        if 'pdfHash' not in pdf_fields:
+            return {"success": False, "error": "Invalid PDF in API response"}
+        extra = {"apiResponse": stored_vendor_response(api_response, 'pdf', pdf_fields)}
+
+    pdf_record = build_dl_pdf_record(user, service, job['charge'], clean, name, dob, pdf_fields, **extra)
+    pdf_record['_id'] = job['recordId']
+    try:
+        await dl_pdfs_collection.insert_one(pdf_record)
+    except Exception:
+        await release_pdf(pdf_fields)
+        raise
+    await record_order_created(dl_pdfs_collection.name, pdf_record)
+    return {"success": True, "name": name, "dob": dob, "cached": bool(job['cachedFrom'])}
+
+@bp.route('/api/dl/generate-pdf/bulk', methods=['POST'])
+async def generate_dl_pdf_bulk():
+    try:
+        data = await request.get_json()
+        user_id = data.get('userId')
+        service_id = data.get('serviceId')
+
+        if not user_id or not service_id:
+            return jsonify({"error": "User ID and Service ID are required"}), 400
+
+        cleans, error = clean_dl_bulk_input(data, DL_BULK_MAX_ITEMS)
+        if error:
+            return jsonify({"error": error}), 400
+
+        try:
+            user_oid = ObjectId(user_id)
+            service_oid = ObjectId(service_id)
+        except:
+            return jsonify({"error": "Invalid ID format"}), 400
+
+        user = await get_request_user(user_oid)
+        service = await services_collection.find_one({"_id": service_oid, "deletedAt": None})
+
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        if user.get('isBlocked'):
+            return jsonify({"error": "Account blocked"}), 403
+        if not service:
+            return jsonify({"error": "Service not found"}), 404
+        if not service.get('isActive', True):
+            return jsonify({"error": "Service unavailable"}), 400
+
+        user_price = await user_service_prices_collection.find_one({
+            "userId": user_oid,
+            "serviceId": service_oid
+        })
+        service_price = service_price_for(service, user_price)
+
+        if service_price <= 0:
+            return jsonify({"error": "Service price not configured"}), 400
+
+        jobs = []
+        for clean in cleans:
+            cached = await find_cached_dl_pdf(clean, with_pdf=False)
+            charge = service_price if not cached or DL_CACHE_CHARGE_POLICY == 'full' else 0
+            jobs.append({"clean": clean, "recordId": ObjectId(), "charge": charge,
+                         "cachedFrom": cached['_id'] if cached else None})
+
+        items = [(job['recordId'], job['charge'], dl_generation_description(job['clean']))
+                 for job in jobs if job['charge']]
+        if items:
+            new_balance = await reserve_order_batch(user, items)
+            if new_balance is None:
+                return jsonify({"error": "Insufficient wallet balance"}), 400
+        else:
+            wallet = await users_collection.find_one({"_id": user_oid}, {"walletBalance": 1})
+            new_balance = (wallet or {}).get('walletBalance', 0)
+        metrics.inc('dl_bulk_items', len(jobs))
+
+        slots = asyncio.Semaphore(DL_BULK_WORKERS)
+
+        async def run_job(job):
+            async with slots:
+                try:
+                    result = await generate_bulk_dl_item(user, service, job)
+                except Exception as e:
+                    result = {"success": False, "error": str(e)}
+                return job, dict(result, dlno=job['clean']['dlno'])
+
+        @stream_with_context
+        async def generate():
+            archive = ZipStream()
+            tasks = [asyncio.ensure_future(run_job(job)) for job in jobs]
+            manifest = []
+            outcome = {}
+
+            async def finish():
+                results = await asyncio.gather(*tasks)
+                failed = [
+                    (job['recordId'], job['charge'], dl_refund_description(job['clean']))
+                    for job, entry in results if not entry['success'] and job['charge']
+                ]
+                outcome['failed'] = sum(1 for _, entry in results if not entry['success'])
+                outcome['refunded'] = sum(amount for _, amount, _ in failed)
+                outcome['balance'] = await refund_order_batch(user_oid, failed) if failed else new_balance
+
+            try:
+                for next_job in asyncio.as_completed(tasks):
+                    job, entry = await next_job
+                    if entry['success']:
+                        pdf = await dl_pdfs_collection.find_one({"_id": job['recordId']}, PDF_PROJECTION)
+                        entry['file'] = dl_bulk_filename(job['clean'])
+                        yield archive.add(entry['file'], await load_pdf_bytes(pdf))
+                    manifest.append(entry)
+            finally:
+                # Shielded so that a client going away does not stop the refunds
+                await asyncio.shield(asyncio.ensure_future(finish()))
+            yield archive.add('manifest.json', json.dumps({
+                "submitted": len(jobs),
+                "generated": len(jobs) - outcome['failed'],
+                "failed": outcome['failed'],
+                "refunded": outcome['refunded'],
+                "newWalletBalance": outcome['balance'],
+                "items": manifest
+            }, indent=2))
+            yield archive.close()
+
+        filename = f"dl-pdfs-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.zip"
+        return generate(), 200, {"Content-Type": "application/zip",
+                                 "Content-Disposition": f'attachment; filename="{filename}"'}
+
+    except Exception as e:
+        current_app.logger.error(f"DL PDF Bulk Generation Error: {str(e)}")
+        return jsonify({
+            "error": "Internal server error",
+            "details": str(e)
+        }), 500
+
+@bp.route('/api/dl/user-pdfs/<user_id>', methods=['GET'])
+async def get_user_dl_pdfs(user_id):
+    try:
+        cursor = dl_pdfs_collection.find(
+            {"userId": ObjectId(user_id)},
+            list_projection(DL_PDF_LIST_FIELDS, request.args.get('fields'), PDF_LIST_HIDDEN)
+        ).sort("createdAt", -1)
+        pdfs = await cursor.to_list(length=None)
+        return jsonify({"pdfs": [serialize_dl_pdf(pdf) for pdf in pdfs]})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/dl/download-pdf/<pdf_id>', methods=['GET'])
+async def download_dl_pdf(pdf_id):
+    try:
+        pdf = await dl_pdfs_collection.find_one(
+            {"_id": ObjectId(pdf_id)},
+            dict(PDF_PROJECTION, _id=0, name=1, dob=1, dlno=1)
+        )
+        pdf_data = await load_pdf(pdf) if pdf else None
+
+        if not pdf_data:
+            return jsonify({"error": "PDF not found"}), 404
+
+        return jsonify({
+            "success": True,
+            "name": pdf.get('name'),
+            "dob": pdf.get('dob'),
+            "dlno": pdf.get('dlno'),
+            "pdfData": pdf_data
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/dl/download-pdf/<pdf_id>/file', methods=['GET'])
+async def download_dl_pdf_file(pdf_id):
+    try:
+        pdf = await dl_pdfs_collection.find_one({"_id": ObjectId(pdf_id)}, dict(PDF_PROJECTION, _id=0, dlno=1))
+        if not pdf:
+            return jsonify({"error": "PDF not found"}), 404
+
+        if pdf.get('pdfHash'):
+            not_modified = pdf_not_modified(pdf['pdfHash'])
+            if not_modified:
+                return not_modified
+
+        data = await load_pdf_bytes(pdf)
+        if not data:
+            return jsonify({"error": "PDF not found"}), 404
+
+        return await pdf_file_response(data, pdf.get('pdfHash') or pdf_hash(data), f"{pdf.get('dlno') or pdf_id}.pdf")
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
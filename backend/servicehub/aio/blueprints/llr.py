@@ -0,0 +1,495 @@
+"""LLR exam submission and status endpoints (asyncio stack)."""
+import asyncio
+
+import httpx
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from quart import Blueprint, jsonify, request, stream_with_context
+
+from ...config import (LLR_API_KEY, LLR_EXAM_API_URL, LLR_STATUS_API_URL, LLR_CALLBACK_URL,
+                       LLR_TERMINAL_STATUSES, LLR_STATUS_MIN_RECHECK_SECONDS, LLR_BATCH_MAX_TOKENS,
+                       LLR_BATCH_WORKERS, LLR_BULK_MAX_ROWS, LLR_BULK_WORKERS)
+from ...documents import (BLOCKED_MESSAGE, LLR_TOKEN_LIST_FIELDS, LLR_VENDOR_HEADERS,
+                          PDF_LIST_HIDDEN, build_llr_status_update, build_llr_token_doc,
+                          clean_llr_exam_input, list_projection, llr_exam_error, llr_exam_request,
+                          llr_exam_success_payload, llr_recently_checked, llr_refund_description,
+                          llr_status_changed, llr_status_payload,
+                          missing_llr_exam_fields, ndjson_line, parse_llr_bulk_csv,
+                          serialize_llr_token, service_price_for, stored_vendor_response)
+from ...metrics import metrics
+from ...pdfstore import PDF_PROJECTION, pdf_hash
+from ...summary import order_status_operations
+from ...vendor import VendorUnavailable
+from ..extensions import (vendor, idempotency_store, llr_status_flights, llr_status_writes,
+                          services_collection, user_service_prices_collection, llr_tokens_collection)
+from ..helpers import (get_request_user, vendor_unavailable_response, debit_wallet, credit_wallet,
+                      pdf_file_response, pdf_not_modified)
+from ..idempotency import idempotent
+from ..pdfstore import load_pdf, load_pdf_bytes, release_pdf, store_pdf
+from ..settlement import (apply_summary_operations, record_order_created, record_order_status,
+                          refund_order_batch, reserve_order_batch, settle_order, settle_refund)
+
+bp = Blueprint('llr', __name__)
+
+
+@bp.route('/api/llr/submit-exam', methods=['POST'])
+@idempotent(idempotency_store, 'llr-submit-exam')
+async def submit_llr_exam():
+    try:
+        data = await request.get_json()
+        user_id = data.get('userId')
+        service_id = data.get('serviceId')
+
+        missing_fields = missing_llr_exam_fields(data)
+        if missing_fields:
+            return jsonify({"error": f"Missing required fields: {', '.join(missing_fields)}"}), 400
+
+        user = await get_request_user(user_id)
+        service = await services_collection.find_one({"_id": ObjectId(service_id), "deletedAt": None})
+
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        if user.get('isBlocked', False):
+            return jsonify({"error": BLOCKED_MESSAGE}), 403
+        if not service:
+            return jsonify({"error": "Service not found"}), 404
+
+        user_price = await user_service_prices_collection.find_one({
+            "userId": ObjectId(user_id),
+            "serviceId": ObjectId(service_id)
+        })
+        service_price = service_price_for(service, user_price)
+
+        if service_price <= 0:
+            return jsonify({"error": "Service price not set for your account. Please contact administrator."}), 400
+
+        clean = clean_llr_exam_input(data)
+
+        new_balance = await debit_wallet(ObjectId(user_id), service_price)
+        if new_balance is None:
+            return jsonify({"error": "Insufficient wallet balance"}), 400
+        settled = False
+
+        try:
+            response = await vendor.post(
+                'exam',
+                LLR_EXAM_API_URL,
+                data=llr_exam_request(clean, LLR_API_KEY, LLR_CALLBACK_URL),
+                headers=LLR_VENDOR_HEADERS,
+                timeout=90,
+                fair_key=user_id
+            )
+
+            llr_response = response.json()
+
+            if llr_response.get('status') != '200':
+                payload, status_code = llr_exam_error(llr_response)
+                return jsonify(payload), status_code
+
+            token_doc = build_llr_token_doc(user, service, service_price, llr_response, clean)
+            description = f"Payment for {service['name']} service - Application: {clean['applno']}"
+            await settle_order(user, service_price, llr_tokens_collection, token_doc, description,
+                               reserved_balance=new_balance)
+            settled = True
+
+            return jsonify(llr_exam_success_payload(llr_response, new_balance))
+
+        except VendorUnavailable as e:
+            return vendor_unavailable_response(e)
+        except httpx.HTTPError as e:
+            return jsonify({
+                "error": f"LLR API request failed: {str(e)}"
+            }), 500
+        finally:
+            if not settled:
+                await credit_wallet(ObjectId(user_id), service_price)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+async def submit_bulk_exam_row(user, service, service_price, clean, token_id):
+    try:
+        response = await vendor.post(
+            'exam',
+            LLR_EXAM_API_URL,
+            data=llr_exam_request(clean, LLR_API_KEY, LLR_CALLBACK_URL),
+            headers=LLR_VENDOR_HEADERS,
+            timeout=90,
+            fair_key=user['_id']
+        )
+        llr_response = response.json()
+    except (VendorUnavailable, httpx.HTTPError, ValueError) as e:
+        return {"success": False, "error": f"LLR API request failed: {str(e)}"}
+
+    if not isinstance(llr_response, dict):
+        return {"success": False, "error": "Unexpected response from LLR API"}
+    if llr_response.get('status') != '200':
+        payload, _ = llr_exam_error(llr_response)
+        return dict(payload, success=False)
+
+    token_doc = build_llr_token_doc(user, service, service_price, llr_response, clean)
+    token_doc['_id'] = token_id
+    try:
+        await llr_tokens_collection.insert_one(token_doc)
+    except Exception as e:
+        print(f"Error storing bulk LLR token {llr_response.get('token')}: {e}")
+        return {"success": False, "error": str(e)}
+    await record_order_created(llr_tokens_collection.name, token_doc)
+    payload = llr_exam_success_payload(llr_response, None)
+    payload.pop('newWalletBalance')
+    return payload
+
+@bp.route('/api/llr/submit-exam/bulk', methods=['POST'])
+async def submit_llr_exam_bulk():
+    try:
+        files = await request.files
+        form = await request.form
+        upload = files.get('file')
+        csv_text = upload.read().decode('utf-8-sig') if upload else form.get('csv', '')
+        user_id = form.get('userId')
+        service_id = form.get('serviceId')
+
+        if not user_id or not service_id:
+            return jsonify({"error": "User ID and Service ID are required"}), 400
+
+        rows, errors = parse_llr_bulk_csv(csv_text, LLR_BULK_MAX_ROWS)
+        if errors:
+            return jsonify({"error": "Invalid rows, nothing was submitted", "rows": errors}), 400
+
+        user = await get_request_user(user_id)
+        service = await services_collection.find_one({"_id": ObjectId(service_id), "deletedAt": None})
+
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        if user.get('isBlocked', False):
+            return jsonify({"error": BLOCKED_MESSAGE}), 403
+        if not service:
+            return jsonify({"error": "Service not found"}), 404
+
+        user_price = await user_service_prices_collection.find_one({
+            "userId": ObjectId(user_id),
+            "serviceId": ObjectId(service_id)
+        })
+        service_price = service_price_for(service, user_price)
+
+        if service_price <= 0:
+            return jsonify({"error": "Service price not set for your account. Please contact administrator."}), 400
+
+        items = [
+            (ObjectId(), service_price, f"Payment for {service['name']} service - Application: {clean['applno']}")
+            for _, clean in rows
+        ]
+        new_balance = await reserve_order_batch(user, items)
+        if new_balance is None:
+            return jsonify({"error": "Insufficient wallet balance"}), 400
+        metrics.inc('llr_bulk_rows', len(rows))
+
+        slots = asyncio.Semaphore(LLR_BULK_WORKERS)
+
+        async def run_row(line, clean, item):
+            async with slots:
+                try:
+                    result = await submit_bulk_exam_row(user, service, service_price, clean, item[0])
+                except Exception as e:
+                    result = {"success": False, "error": str(e)}
+                return line, clean, item, result
+
+        @stream_with_context
+        async def generate():
+            yield ndjson_line({"type": "accepted", "rows": len(rows),
+                               "reserved": service_price * len(rows), "newWalletBalance": new_balance})
+            tasks = [asyncio.ensure_future(run_row(line, clean, item)) for (line, clean), item in zip(rows, items)]
+            outcome = {}
+
+            async def finish():
+                done = await asyncio.gather(*tasks, return_exceptions=True)
+                failed = [
+                    (item[0], item[1], llr_refund_description(clean))
+                    for (_, clean), item, row in zip(rows, items, done)
+                    if isinstance(row, BaseException) or not row[3]['success']
+                ]
+                outcome['failed'] = failed
+                outcome['balance'] = await refund_order_batch(user['_id'], failed) if failed else new_balance
+
+            try:
+                for next_row in asyncio.as_completed(tasks):
+                    line, clean, _, result = await next_row
+                    yield ndjson_line(dict(result, type="row", row=line, applno=clean['applno']))
+            finally:
+                # Shielded so that a client going away does not stop the refunds
+                await asyncio.shield(asyncio.ensure_future(finish()))
+            yield ndjson_line({"type": "done", "submitted": len(rows) - len(outcome['failed']),
+                               "failed": len(outcome['failed']),
+                               "refunded": service_price * len(outcome['failed']),
+                               "newWalletBalance": outcome['balance']})
+
+        return generate(), 200, {"Content-Type": "application/x-ndjson"}
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+async def fetch_llr_status(token, user_id=None):
+    metrics.inc('llr_status_vendor_calls')
+    response = await vendor.post(
+        'status',
+        LLR_STATUS_API_URL,
+        data={"token": token},
+        headers=LLR_VENDOR_HEADERS,
+        timeout=30,
+        fair_key=user_id
+    )
+    return response.json()
+
+async def apply_llr_refund(token_doc, update_data):
+    """Mark a token refunded and credit its price back, at most once."""
+    return await settle_refund(
+        llr_tokens_collection,
+        {"_id": token_doc['_id'], "status": {"$ne": "refunded"}},
+        {"$set": update_data},
+        token_doc['userId'], token_doc['servicePrice'],
+        llr_refund_description(token_doc), str(token_doc['_id'])
+    )
+
+async def llr_status_change(token_doc, previous_status, update_data):
+    selector = {"_id": token_doc['_id']}
+    pdf_fields = {}
+    if update_data.get('status') == 'completed':
+        pdf_fields = await store_pdf(update_data.pop('pdfData'))
+        update_data.update(pdf_fields)
+        update_data['latestResponse'] = stored_vendor_response(update_data['latestResponse'], 'message', pdf_fields)
+        selector['status'] = {"$ne": "completed"}
+    return {"userId": token_doc['userId'], "previousStatus": previous_status,
+            "selector": selector, "update": update_data, "pdfFields": pdf_fields}
+
+async def write_llr_status_changes(changes):
+    result = await llr_tokens_collection.bulk_write(
+        [UpdateOne(change['selector'], {"$set": change['update']}) for change in changes],
+        ordered=False
+    )
+    applied = changes
+    if result.matched_count < len(changes):
+        cursor = llr_tokens_collection.find(
+            {"$or": [{"_id": change['selector']['_id'], "lastChecked": change['update']['lastChecked']}
+                     for change in changes]},
+            {"_id": 1}
+        )
+        written = {doc['_id'] for doc in await cursor.to_list(length=None)}
+        applied = [change for change in changes if change['selector']['_id'] in written]
+        for change in changes:
+            if change['selector']['_id'] not in written:
+                await release_pdf(change['pdfFields'])
+    await apply_summary_operations([
+        operation
+        for change in applied
+        for operation in order_status_operations(llr_tokens_collection.name, change['userId'],
+                                                 change['previousStatus'], change['update'].get('status'))
+    ])
+    return len(applied)
+
+async def llr_status_result(token_doc, status_response):
+    payload = llr_status_payload(status_response)
+    if payload['pdfAvailable'] and not payload['message']:
+        stored = await llr_tokens_collection.find_one({"_id": token_doc['_id']}, PDF_PROJECTION)
+        payload['message'] = await load_pdf(stored or {})
+    return payload
+
+def stored_llr_status(token_doc):
+    if not token_doc.get('latestResponse'):
+        return None
+    if token_doc.get('status') in LLR_TERMINAL_STATUSES:
+        metrics.inc('llr_status_cache_hits')
+        return token_doc['latestResponse']
+    if llr_recently_checked(token_doc, LLR_STATUS_MIN_RECHECK_SECONDS):
+        metrics.inc('llr_status_recheck_skips')
+        return token_doc['latestResponse']
+    return None
+
+async def refresh_llr_status(token_doc, changes=None):
+    async def refresh():
+        current = await llr_tokens_collection.find_one(
+            {"_id": token_doc['_id']},
+            {"status": 1, "queue": 1, "remarks": 1, "lastChecked": 1, "latestResponse": 1}
+        ) or {}
+        current.update(llr_status_writes.pending(token_doc['_id']))
+        stored = stored_llr_status(current)
+        if stored:
+            return stored
+
+        status_response = await fetch_llr_status(token_doc['token'], token_doc['userId'])
+
+        update_data = build_llr_status_update(status_response)
+        if update_data.get('status') in LLR_TERMINAL_STATUSES or llr_status_changed(current, update_data):
+            llr_status_writes.discard(token_doc['_id'])
+            if update_data.get('status') == 'refunded':
+                if await apply_llr_refund(token_doc, update_data) is not None:
+                    await record_order_status(llr_tokens_collection.name, token_doc['userId'],
+                                              current.get('status'), 'refunded')
+            else:
+                change = await llr_status_change(token_doc, current.get('status'), update_data)
+                if changes is None:
+                    await write_llr_status_changes([change])
+                else:
+                    changes.append(change)
+        else:
+            await llr_status_writes.set(token_doc['_id'], {"lastChecked": update_data['lastChecked']})
+        return status_response
+
+    return await llr_status_flights.do(token_doc['token'], refresh)
+
+@bp.route('/api/llr/check-status', methods=['POST'])
+async def check_llr_status():
+    try:
+        data = await request.get_json()
+        token = data.get('token')
+
+        if not token:
+            return jsonify({"error": "Token is required"}), 400
+
+        token_doc = await llr_tokens_collection.find_one({"token": token}, {"pdfData": 0})
+        if not token_doc:
+            return jsonify({"error": "Invalid token"}), 404
+
+        stored = stored_llr_status(token_doc)
+        if stored:
+            return jsonify(await llr_status_result(token_doc, stored))
+
+        try:
+            status_response = await refresh_llr_status(token_doc)
+            return jsonify(await llr_status_result(token_doc, status_response))
+
+        except VendorUnavailable as e:
+            return vendor_unavailable_response(e)
+        except httpx.HTTPError as e:
+            return jsonify({"error": f"Failed to connect to LLR status API: {str(e)}"}), 500
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/llr/check-status/batch', methods=['POST'])
+async def check_llr_status_batch():
+    try:
+        data = await request.get_json()
+        tokens = data.get('tokens')
+
+        if not isinstance(tokens, list) or not tokens or not all(isinstance(t, str) and t for t in tokens):
+            return jsonify({"error": "Tokens must be a non-empty array of strings"}), 400
+        if len(tokens) > LLR_BATCH_MAX_TOKENS:
+            return jsonify({"error": f"At most {LLR_BATCH_MAX_TOKENS} tokens can be checked at once"}), 400
+
+        tokens = list(dict.fromkeys(tokens))
+        cursor = llr_tokens_collection.find({"token": {"$in": tokens}}, {"pdfData": 0})
+        token_docs = {doc['token']: doc for doc in await cursor.to_list(length=None)}
+
+        results = {}
+        to_check = []
+        for token in tokens:
+            token_doc = token_docs.get(token)
+            stored = stored_llr_status(token_doc) if token_doc else None
+            if not token_doc:
+                results[token] = {"success": False, "error": "Invalid token"}
+            elif stored:
+                results[token] = llr_status_payload(stored)
+            else:
+                to_check.append(token_doc)
+
+        slots = asyncio.Semaphore(LLR_BATCH_WORKERS)
+        changes = []
+
+        async def check(token_doc):
+            async with slots:
+                try:
+                    status_response = await refresh_llr_status(token_doc, changes)
+                except (VendorUnavailable, httpx.HTTPError, ValueError) as e:
+                    results[token_doc['token']] = {"success": False, "error": str(e)}
+                    return
+            results[token_doc['token']] = llr_status_payload(status_response)
+
+        await asyncio.gather(*(check(token_doc) for token_doc in to_check))
+        if changes:
+            try:
+                await write_llr_status_changes(changes)
+            except Exception as e:
+                print(f"Error storing LLR status changes: {e}")
+
+        for result in results.values():
+            if result.get('pdfAvailable'):
+                result.pop('message', None)
+
+        return jsonify({
+            "success": True,
+            "results": [dict(results[token], token=token) for token in tokens]
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/llr/download-pdf', methods=['POST'])
+async def download_llr_pdf():
+    try:
+        data = await request.get_json()
+        token = data.get('token')
+
+        if not token:
+            return jsonify({"error": "Token is required"}), 400
+
+        token_doc = await llr_tokens_collection.find_one({"token": token})
+        if not token_doc:
+            return jsonify({"error": "Invalid token"}), 404
+
+        if token_doc.get('status') != 'completed':
+            return jsonify({"error": "PDF not available. Exam not completed yet."}), 400
+
+        pdf_data = await load_pdf(token_doc)
+        if not pdf_data:
+            return jsonify({"error": "PDF data not available"}), 404
+
+        return jsonify({
+            "success": True,
+            "pdfData": pdf_data,
+            "filename": token_doc.get('filename'),
+            "mimeType": "application/pdf"
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/llr/download-pdf/<token>/file', methods=['GET'])
+async def download_llr_pdf_file(token):
+    try:
+        token_doc = await llr_tokens_collection.find_one(
+            {"token": token},
+            dict(PDF_PROJECTION, _id=0, status=1, filename=1, applno=1)
+        )
+        if not token_doc:
+            return jsonify({"error": "Invalid token"}), 404
+
+        if token_doc.get('status') != 'completed':
+            return jsonify({"error": "PDF not available. Exam not completed yet."}), 400
+
+        if token_doc.get('pdfHash'):
+            not_modified = pdf_not_modified(token_doc['pdfHash'])
+            if not_modified:
+                return not_modified
+
+        data = await load_pdf_bytes(token_doc)
+        if not data:
+            return jsonify({"error": "PDF data not available"}), 404
+
+        filename = token_doc.get('filename') or f"{token_doc.get('applno') or token}.pdf"
+        return await pdf_file_response(data, token_doc.get('pdfHash') or pdf_hash(data), filename)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/llr/user-tokens/<user_id>', methods=['GET'])
+async def get_user_llr_tokens(user_id):
+    try:
+        cursor = llr_tokens_collection.find(
+            {"userId": ObjectId(user_id)},
+            list_projection(LLR_TOKEN_LIST_FIELDS, request.args.get('fields'), PDF_LIST_HIDDEN)
+        ).sort("createdAt", -1)
+        tokens = await cursor.to_list(length=None)
+        return jsonify({"tokens": [serialize_llr_token(token) for token in tokens]})
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,30 @@
+"""User refresh endpoint (asyncio stack)."""
+from bson.objectid import ObjectId
+from quart import Blueprint, jsonify
+
+from ...auth import issue_user_token
+from ...documents import BLOCKED_MESSAGE, user_payload
+from ..extensions import users_collection
+
+bp = Blueprint('user', __name__)
+
+
+@bp.route('/api/user/refresh/<user_id>', methods=['GET'])
+async def refresh_user_data(user_id):
+    try:
+        user = await users_collection.find_one({"_id": ObjectId(user_id)})
+
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+
+        if user.get('isBlocked', False):
+            return jsonify({"error": BLOCKED_MESSAGE}), 403
+
+        return jsonify({
+            "success": True,
+            "token": issue_user_token(user),
+            "user": user_payload(user)
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,92 @@
+"""Lazily created dependencies for the asyncio stack.
+
+Same shape as ``servicehub.extensions``: ``create_async_app`` stores an
+``AsyncServices`` container in ``app.extensions`` and the proxies below
+resolve against the current Quart app.  The Motor client, the httpx client
+and the stores are built on first use, inside the serving event loop.
+"""
+from quart import current_app
+from werkzeug.local import LocalProxy
+
+from .. import config
+from ..extensions import Services
+
+
+class AsyncServices(Services):
+
+    @property
+    def client(self):
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from pymongo.server_api import ServerApi
+        return self._lazy('client', lambda: AsyncIOMotorClient(
+            config.MONGO_URI,
+            maxPoolSize=config.ASYNC_MONGO_MAX_POOL_SIZE,
+            serverSelectionTimeoutMS=5000,
+            socketTimeoutMS=30000,
+            connectTimeoutMS=10000,
+            server_api=ServerApi('1')
+        ))
+
+    @property
+    def vendor(self):
+        from ..vendor import AsyncVendorClient
+        return self._lazy('vendor', AsyncVendorClient)
+
+    @property
+    def revoked_users(self):
+        from .auth import AsyncRevocationSet
+        return self._lazy('revoked_users', lambda: AsyncRevocationSet(self.db.users))
+
+    @property
+    def idempotency_store(self):
+        from .idempotency import AsyncIdempotencyStore
+        return self._lazy('idempotency_store', lambda: AsyncIdempotencyStore(self.db.idempotency))
+
+    @property
+    def llr_status_flights(self):
+        from ..singleflight import AsyncSingleFlight
+        return self._lazy('llr_status_flights', lambda: AsyncSingleFlight('llr_status'))
+
+    @property
+    def llr_status_writes(self):
+        from ..writebehind import AsyncWriteBehindBuffer
+        return self._lazy('llr_status_writes', lambda: AsyncWriteBehindBuffer('llr_status', self.db.llr_tokens))
+
+    async def close(self):
+        # Pending bookkeeping goes out before the Mongo client is closed
+        status_writes = self._instances.pop('llr_status_writes', None)
+        if status_writes is not None:
+            await status_writes.close()
+        vendor_client = self._instances.pop('vendor', None)
+        if vendor_client is not None:
+            await vendor_client.aclose()
+        mongo_client = self._instances.pop('client', None)
+        if mongo_client is not None:
+            mongo_client.close()
+
+
+def current_services():
+    return current_app.extensions['servicehub']
+
+
+def _collection(name):
+    return LocalProxy(lambda: current_services().db[name])
+
+
+client = LocalProxy(lambda: current_services().client)
+vendor = LocalProxy(lambda: current_services().vendor)
+revoked_users = LocalProxy(lambda: current_services().revoked_users)
+idempotency_store = LocalProxy(lambda: current_services().idempotency_store)
+llr_status_flights = LocalProxy(lambda: current_services().llr_status_flights)
+llr_status_writes = LocalProxy(lambda: current_services().llr_status_writes)
+
+# Collections
+users_collection = _collection('users')
+services_collection = _collection('services')
+user_service_prices_collection = _collection('user_service_prices')
+payment_history_collection = _collection('payment_history')
+ledger_buckets_collection = _collection('ledger_buckets')
+user_summaries_collection = _collection('user_summaries')
+llr_tokens_collection = _collection('llr_tokens')
+dl_pdfs_collection = _collection('dl_pdfs')
+pdf_blobs_collection = _collection('pdf_blobs')
@@ -0,0 +1,85 @@
+"""Request-scoped helpers for the asyncio stack: auth and wallet."""
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from quart import Response, g, jsonify, request
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+
+from ..auth import InvalidToken, bearer_token, decode_user_token
+from ..metrics import metrics
+from .extensions import revoked_users, users_collection
+
+
+async def load_auth_claims():
+    g.auth = None
+    token = bearer_token(request.headers)
+    if not token:
+        return None
+    try:
+        g.auth = decode_user_token(token)
+    except InvalidToken:
+        return jsonify({"error": "Invalid authentication token"}), 401
+
+async def get_request_user(user_id):
+    """Same contract as ``servicehub.helpers.get_request_user``."""
+    claims = g.get('auth')
+    if claims:
+        if claims['sub'] != str(user_id):
+            return None
+        return {
+            "_id": ObjectId(claims['sub']),
+            "name": claims['name'],
+            "mobile": claims['mobile'],
+            "isBlocked": await revoked_users.is_revoked(claims['sub'])
+        }
+    return await users_collection.find_one({"_id": ObjectId(user_id)})
+
+PDF_CACHE_MAX_AGE = 31536000
+
+def set_pdf_cache_headers(response, etag):
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = PDF_CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+def pdf_not_modified(etag):
+    if not request.if_none_match.contains(etag):
+        return None
+    metrics.inc('pdf_download_not_modified')
+    return set_pdf_cache_headers(Response(b'', status=304), etag)
+
+async def pdf_file_response(data, etag, filename):
+    response = Response(data, mimetype='application/pdf')
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    set_pdf_cache_headers(response, etag)
+    try:
+        return await response.make_conditional(request, accept_ranges=True, complete_length=len(data))
+    except RequestedRangeNotSatisfiable:
+        return Response(b'', status=416, headers={"Content-Range": f"bytes */{len(data)}"})
+
+def vendor_unavailable_response(error):
+    metrics.inc('vendor_fast_failures')
+    headers = {}
+    if error.retry_after is not None:
+        headers['Retry-After'] = str(error.retry_after)
+    return jsonify({"error": str(error)}), 503, headers
+
+async def debit_wallet(user_oid, amount, session=None):
+    user = await users_collection.find_one_and_update(
+        {"_id": user_oid, "walletBalance": {"$gte": amount}},
+        {"$inc": {"walletBalance": -amount}},
+        projection={"walletBalance": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    return user['walletBalance'] if user else None
+
+async def credit_wallet(user_oid, amount, session=None):
+    user = await users_collection.find_one_and_update(
+        {"_id": user_oid},
+        {"$inc": {"walletBalance": amount}},
+        projection={"walletBalance": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    return user['walletBalance'] if user else None
@@ -0,0 +1,100 @@
+"""Idempotency-Key support for the asyncio stack.
+
+Records have the same format as ``servicehub.idempotency``, so a key first
+used against one stack is honoured by the other.
+"""
+import asyncio
+import time
+from datetime import datetime
+from functools import wraps
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from quart import make_response, request
+
+from ..idempotency import (IDEMPOTENCY_POLL_SECONDS, IDEMPOTENCY_WAIT_SECONDS, completion_update,
+                           conflict_response, expired_lease_filter, in_progress_record,
+                           record_id_for, request_hash_for, should_store)
+
+
+class AsyncIdempotencyStore:
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def claim(self, record_id, request_hash):
+        now = datetime.utcnow()
+        record = in_progress_record(record_id, request_hash, now)
+        try:
+            await self.collection.insert_one(record)
+            return True, None
+        except DuplicateKeyError:
+            pass
+
+        taken = await self.collection.find_one_and_update(
+            expired_lease_filter(record_id, request_hash, now),
+            {"$set": {"leaseExpiresAt": record['leaseExpiresAt']}},
+            return_document=ReturnDocument.AFTER
+        )
+        if taken:
+            return True, None
+        return False, await self.collection.find_one({"_id": record_id})
+
+    async def wait(self, record_id, timeout=IDEMPOTENCY_WAIT_SECONDS):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            record = await self.collection.find_one({"_id": record_id})
+            if not record or record['state'] == 'completed':
+                return record
+            await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+        return None
+
+    async def complete(self, record_id, response):
+        body = await response.get_data(as_text=True)
+        await self.collection.update_one(
+            {"_id": record_id},
+            completion_update(response.status_code, body, response.mimetype)
+        )
+
+    async def release(self, record_id):
+        await self.collection.delete_one({"_id": record_id, "state": "in_progress"})
+
+
+async def replay(record):
+    response = await make_response(record['body'], record['statusCode'])
+    response.mimetype = record.get('mimetype', 'application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(store, scope):
+    """Async counterpart of ``servicehub.idempotency.idempotent``."""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if not key:
+                return await view(*args, **kwargs)
+
+            data = await request.get_json(silent=True) or {}
+            record_id = record_id_for(scope, data, key)
+            request_hash = request_hash_for(await request.get_data())
+
+            claimed, record = await store.claim(record_id, request_hash)
+            if not claimed:
+                if record and record.get('requestHash') == request_hash and record['state'] != 'completed':
+                    record = await store.wait(record_id)
+                return conflict_response(record, request_hash) or await replay(record)
+
+            try:
+                response = await make_response(await view(*args, **kwargs))
+            except Exception:
+                await store.release(record_id)
+                raise
+            if should_store(response.status_code):
+                await store.complete(record_id, response)
+            else:
+                await store.release(record_id)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,41 @@
+"""Content-addressed PDF storage for the asyncio stack; see ``servicehub.pdfstore``."""
+import base64
+
+from ..metrics import metrics
+from ..pdfstore import decode_pdf, pdf_blob_fields, reference_operation
+from .extensions import pdf_blobs_collection
+
+
+async def store_pdf(pdf_data):
+    fields, operation = pdf_blob_fields(pdf_data)
+    if operation is not None:
+        result = await pdf_blobs_collection.bulk_write([operation])
+        metrics.inc('pdf_blobs_created' if result.upserted_count else 'pdf_blobs_deduplicated')
+    return fields
+
+
+async def share_pdf(doc):
+    if doc.get('pdfHash'):
+        await pdf_blobs_collection.bulk_write([reference_operation(doc['pdfHash'], 1)])
+        metrics.inc('pdf_blobs_deduplicated')
+        return {"pdfHash": doc['pdfHash']}
+    return await store_pdf(doc.get('pdfData'))
+
+
+async def release_pdf(fields):
+    if fields.get('pdfHash'):
+        await pdf_blobs_collection.bulk_write([reference_operation(fields['pdfHash'], -1)])
+
+
+async def load_pdf_bytes(doc):
+    if doc.get('pdfHash'):
+        blob = await pdf_blobs_collection.find_one({"_id": doc['pdfHash']}, {"data": 1})
+        return bytes(blob['data']) if blob else None
+    return decode_pdf(doc['pdfData']) if doc.get('pdfData') else None
+
+
+async def load_pdf(doc):
+    if doc.get('pdfHash'):
+        data = await load_pdf_bytes(doc)
+        return base64.b64encode(data).decode() if data else None
+    return doc.get('pdfData')
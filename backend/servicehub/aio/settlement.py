@@ -0,0 +1,171 @@
+"""Order settlement for the asyncio stack; see ``servicehub.settlement``."""
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument, WriteConcern
+from pymongo.errors import OperationFailure
+from pymongo.read_concern import ReadConcern
+
+from .. import settlement
+from ..settlement import batch_ledger_docs
+from ..config import SETTLEMENT_TRANSACTIONS
+from ..helpers import build_payment_history_doc
+from ..ledger import ledger_operations
+from ..metrics import metrics
+from ..summary import (defer, defer_summary_operations, order_created_operations,
+                       order_status_operations, transaction_summary_operations)
+from .extensions import (client, users_collection, payment_history_collection, ledger_buckets_collection,
+                         user_summaries_collection)
+from .helpers import credit_wallet, debit_wallet
+
+
+async def run_settlement(work):
+    """Await ``work(session)`` in a transaction; same contract as the sync version."""
+    if SETTLEMENT_TRANSACTIONS == 'off' or settlement._transactions_supported is False:
+        return await work(None)
+
+    summary_operations = []
+
+    async def attempt(session):
+        metrics.inc('settlement_attempts')
+        del summary_operations[:]
+        with defer_summary_operations(summary_operations):
+            return await work(session)
+
+    try:
+        async with await client.start_session() as session:
+            result = await session.with_transaction(
+                attempt,
+                read_concern=ReadConcern('snapshot'),
+                write_concern=WriteConcern('majority')
+            )
+    except OperationFailure as e:
+        if e.code != settlement.ILLEGAL_OPERATION or settlement._transactions_supported:
+            raise
+        print("MongoDB deployment does not support transactions; settling without them")
+        settlement._transactions_supported = False
+        return await work(None)
+
+    settlement._transactions_supported = True
+    metrics.inc('settlement_transactions')
+    await apply_summary_operations(summary_operations)
+    return result
+
+
+async def append_entries(history_docs, session=None):
+    for doc in history_docs:
+        doc.setdefault('_id', ObjectId())
+    ledger_format, operations = ledger_operations(history_docs)
+    collection = ledger_buckets_collection if ledger_format == 'compact' else payment_history_collection
+    await collection.bulk_write(operations, ordered=False, session=session)
+    await apply_summary_operations(transaction_summary_operations(history_docs))
+
+
+async def apply_summary_operations(operations):
+    if not operations or defer(operations):
+        return
+    try:
+        await user_summaries_collection.bulk_write(operations, ordered=False)
+    except Exception as e:
+        print(f"Error updating user summary: {e}")
+
+
+async def record_order_created(collection_name, record):
+    await apply_summary_operations(order_created_operations(collection_name, [record]))
+
+
+async def record_order_status(collection_name, user_id, old_status, new_status):
+    await apply_summary_operations(order_status_operations(collection_name, user_id, old_status, new_status))
+
+
+async def insert_ledger_rows(history_docs, session):
+    if session is not None:
+        await append_entries(history_docs, session=session)
+        return
+    try:
+        await append_entries(history_docs)
+    except Exception as e:
+        print(f"Error adding payment history: {e}")
+
+
+async def insert_ledger_row(history_doc, session):
+    await insert_ledger_rows([history_doc], session)
+
+
+async def settle_order(user, amount, collection, record, description, reserved_balance=None):
+    record.setdefault('_id', ObjectId())
+
+    async def work(session):
+        new_balance = reserved_balance
+        if new_balance is None:
+            new_balance = await debit_wallet(user['_id'], amount, session=session)
+            if new_balance is None:
+                return None
+        try:
+            await collection.insert_one(record, session=session)
+        except Exception:
+            if session is None and reserved_balance is None:
+                await credit_wallet(user['_id'], amount)
+            raise
+        await insert_ledger_row(build_payment_history_doc(
+            user, "debit", amount, description, str(record['_id']), new_balance
+        ), session)
+        await record_order_created(collection.name, record)
+        return record['_id'], new_balance
+
+    return await run_settlement(work)
+
+
+async def credit_with_ledger(user_oid, amount, transaction_type, description, reference_id, session):
+    user = await users_collection.find_one_and_update(
+        {"_id": user_oid},
+        {"$inc": {"walletBalance": amount}},
+        projection={"name": 1, "mobile": 1, "walletBalance": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    if not user:
+        return None
+    await insert_ledger_row(build_payment_history_doc(
+        user, transaction_type, amount, description, reference_id, user['walletBalance']
+    ), session)
+    return user['walletBalance']
+
+
+async def reserve_order_batch(user, items):
+    total = sum(amount for _, amount, _ in items)
+
+    async def work(session):
+        new_balance = await debit_wallet(user['_id'], total, session=session)
+        if new_balance is None:
+            return None
+        await insert_ledger_rows(batch_ledger_docs(user, "debit", items, new_balance), session)
+        return new_balance
+
+    return await run_settlement(work)
+
+
+async def refund_order_batch(user_oid, items):
+    total = sum(amount for _, amount, _ in items)
+
+    async def work(session):
+        user = await users_collection.find_one_and_update(
+            {"_id": user_oid},
+            {"$inc": {"walletBalance": total}},
+            projection={"name": 1, "mobile": 1, "walletBalance": 1},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if not user:
+            return None
+        await insert_ledger_rows(batch_ledger_docs(user, "refund", items, user['walletBalance']), session)
+        return user['walletBalance']
+
+    return await run_settlement(work)
+
+
+async def settle_refund(collection, selector, update, user_oid, amount, description, reference_id):
+    async def work(session):
+        if (await collection.update_one(selector, update, session=session)).modified_count == 0:
+            return None
+        return await credit_with_ledger(user_oid, amount, "refund", description, reference_id, session)
+
+    return await run_settlement(work)
@@ -0,0 +1,45 @@
+"""Incremental ZIP output for streamed downloads.
+
+``ZipStream`` writes entries into an in-memory sink that is emptied after
+each entry, so a response can send every file as soon as it is added and
+only one file is held at a time.  Entries are stored, not deflated: the
+payloads are PDFs, which are compressed already.
+"""
+import zipfile
+
+
+class _Sink:
+    """Write-only file object whose contents are taken out with ``drain``."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ZipStream:
+
+    def __init__(self):
+        self._sink = _Sink()
+        # The sink cannot seek, so zipfile writes data descriptors after each entry
+        self._zip = zipfile.ZipFile(self._sink, 'w', zipfile.ZIP_STORED)
+
+    def add(self, name, data):
+        """Add a file and return the bytes to send for it."""
+        self._zip.writestr(name, data)
+        return self._sink.drain()
+
+    def close(self):
+        """Finish the archive and return the central directory bytes."""
+        self._zip.close()
+        return self._sink.drain()
@@ -0,0 +1,229 @@
+"""Wallet balance vs. ledger audit (``flask --app app audit-wallets``).
+
+``users.walletBalance`` is updated in place and the ledger (legacy
+``payment_history`` rows and ``ledger_buckets``) is written beside it, so
+the two can drift.  The audit recomputes each user's balance from the
+ledger -- credits and refunds minus debits, in paise -- and compares:
+
+* users are paged by ``_id``; each page is one ``userId`` range whose
+  ledger is summed with a ``$group`` over both formats, pages in parallel;
+* per-user sums are checkpointed in ``wallet_audit_sums`` up to the run's
+  high-water mark (its start minus ``WALLET_AUDIT_LAG_SECONDS``), so an
+  incremental run only reads entries written after the previous mark;
+* a mismatch is re-read through ``read_user_history`` and a fresh wallet
+  before it is reported, so an order settling mid-audit is not flagged.
+
+Runs are recorded in ``wallet_audits`` and what they find in
+``wallet_discrepancies``, keyed by run.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+
+from .config import WALLET_AUDIT_CHUNK_USERS, WALLET_AUDIT_LAG_SECONDS, WALLET_AUDIT_WORKERS
+from .extensions import (in_app_context, ledger_buckets_collection, payment_history_collection,
+                         users_collection, wallet_audit_sums_collection, wallet_audits_collection,
+                         wallet_discrepancies_collection)
+from .ledger import (BALANCE_SIGNS, TYPE_CODES, bucket_month, from_paise, history_balance,
+                     read_user_history, to_paise)
+from .metrics import metrics
+
+# Legacy rows hold float rupees, so allow for rounding
+TOLERANCE_PAISE = 1
+BUCKET_SIGNS = {TYPE_CODES[name]: sign for name, sign in BALANCE_SIGNS.items()}
+NO_ENTRIES = {"net": 0, "entries": 0, "tail": 0}
+
+
+def _ledger_group(user_field, type_field, amount_field, created_field, signs, high_water):
+    # Entries past the high-water mark are summed apart; they are not checkpointed yet
+    return {"$group": {
+        "_id": {"user": user_field, "tail": {"$gte": [created_field, high_water]}},
+        "net": {"$sum": {"$switch": {
+            "branches": [{"case": {"$eq": [type_field, code]}, "then": {"$multiply": [amount_field, sign]}}
+                         for code, sign in signs.items()],
+            "default": 0
+        }}},
+        "entries": {"$sum": 1}
+    }}
+
+
+def ledger_sums(user_match, since, high_water):
+    """``{userId: {"net", "entries", "tail"}}`` for ledger entries from ``since`` on.
+
+    ``net`` and ``entries`` cover ``[since, high_water)`` and ``tail`` the
+    entries after it; amounts are in paise.
+    """
+    legacy_match = {"userId": user_match}
+    bucket_match = {"u": user_match}
+    if since is not None:
+        legacy_match["createdAt"] = {"$gte": since}
+        bucket_match["m"] = {"$gte": bucket_month(since)}
+    bucket_pipeline = [{"$match": bucket_match}, {"$unwind": "$e"}]
+    if since is not None:
+        bucket_pipeline.append({"$match": {"e.c": {"$gte": since}}})
+    bucket_pipeline.append(_ledger_group("$u", "$e.t", "$e.a", "$e.c", BUCKET_SIGNS, high_water))
+
+    results = (
+        (payment_history_collection.aggregate([
+            {"$match": legacy_match},
+            _ledger_group("$userId", "$transactionType", "$amount", "$createdAt", BALANCE_SIGNS, high_water)
+        ]), to_paise),
+        (ledger_buckets_collection.aggregate(bucket_pipeline), int)
+    )
+    sums = {}
+    for rows, paise in results:
+        for row in rows:
+            user_sums = sums.setdefault(row['_id']['user'], dict(NO_ENTRIES))
+            if row['_id']['tail']:
+                user_sums['tail'] += paise(row['net'])
+            else:
+                user_sums['net'] += paise(row['net'])
+                user_sums['entries'] += row['entries']
+    return sums
+
+
+def recheck_user(user_oid):
+    """The discrepancy report for one user, read afresh, or None if the books agree."""
+    user = users_collection.find_one({"_id": user_oid}, {"name": 1, "mobile": 1, "walletBalance": 1})
+    history = read_user_history(user_oid)
+    ledger = history_balance(history)
+    wallet = to_paise(user.get('walletBalance')) if user else None
+    if abs((wallet or 0) - ledger) <= TOLERANCE_PAISE and (user or not history):
+        return None
+    return {
+        "userId": user_oid,
+        "userName": user.get('name') if user else None,
+        "userMobile": user.get('mobile') if user else None,
+        "walletBalance": from_paise(wallet) if user else None,
+        "ledgerBalance": from_paise(ledger),
+        "difference": from_paise((wallet or 0) - ledger),
+        "entries": len(history),
+        "lastEntryAt": history[0]['createdAt'] if history else None
+    }
+
+
+def audit_range(users, id_range, since, high_water):
+    """Audit one ``_id`` range; returns its discrepancy reports.
+
+    ``users`` are the accounts in the range; ledger entries in it whose user
+    no longer exists are reported too.
+    """
+    sums = ledger_sums(id_range, since, high_water)
+    checkpoints = {}
+    if since is not None:
+        checkpoints = {doc['_id']: doc for doc in wallet_audit_sums_collection.find({"_id": id_range})}
+        # No checkpoint at ``since`` (a new user, or a run that stopped part way): sum from scratch
+        stale = [user_oid for user_oid in {user['_id'] for user in users} | set(sums)
+                 if checkpoints.get(user_oid, {}).get('through') != since]
+        if stale:
+            fresh = ledger_sums({"$in": stale}, None, high_water)
+            for user_oid in stale:
+                checkpoints.pop(user_oid, None)
+                sums[user_oid] = fresh.get(user_oid, dict(NO_ENTRIES))
+
+    wallets = {user['_id']: to_paise(user.get('walletBalance')) for user in users}
+    operations = []
+    suspects = []
+    for user_oid in set(wallets) | set(sums):
+        user_sums = sums.get(user_oid, NO_ENTRIES)
+        checkpoint = checkpoints.get(user_oid)
+        net = user_sums['net'] + (checkpoint['net'] if checkpoint else 0)
+        if checkpoint is None or user_sums['entries']:
+            operations.append(UpdateOne(
+                {"_id": user_oid},
+                {"$set": {"net": net,
+                          "entries": user_sums['entries'] + (checkpoint['entries'] if checkpoint else 0),
+                          "through": high_water}},
+                upsert=True
+            ))
+        ledger = net + user_sums['tail']
+        if abs(wallets.get(user_oid, 0) - ledger) > TOLERANCE_PAISE or (user_oid not in wallets and ledger):
+            suspects.append(user_oid)
+
+    if operations:
+        wallet_audit_sums_collection.bulk_write(operations, ordered=False)
+    if since is not None:
+        # Users without new entries keep their sums; only the mark moves
+        wallet_audit_sums_collection.update_many(
+            {"_id": id_range, "through": since}, {"$set": {"through": high_water}}
+        )
+    return [report for report in map(recheck_user, suspects) if report]
+
+
+def audit_wallets(full=False, chunk_size=WALLET_AUDIT_CHUNK_USERS, workers=WALLET_AUDIT_WORKERS):
+    """Compare every wallet with its ledger; returns the run summary.
+
+    Incremental from the last finished run's high-water mark unless ``full``
+    or there is none.
+    """
+    started = time.monotonic()
+    now = datetime.utcnow()
+    high_water = now - timedelta(seconds=WALLET_AUDIT_LAG_SECONDS)
+    previous = None if full else wallet_audits_collection.find_one(
+        {"finishedAt": {"$ne": None}}, sort=[("finishedAt", -1)]
+    )
+    since = previous['highWater'] if previous else None
+    run = {
+        "mode": "incremental" if since else "full",
+        "since": since,
+        "highWater": high_water,
+        "startedAt": now,
+        "finishedAt": None
+    }
+    run_id = wallet_audits_collection.insert_one(run).inserted_id
+
+    summary = {"usersChecked": 0, "discrepancies": 0, "totalDifference": 0.0}
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            audit = in_app_context(audit_range)
+            pending = []
+            last = None
+            while True:
+                page = list(users_collection.find(
+                    {"_id": {"$gt": last}} if last is not None else {},
+                    {"walletBalance": 1}, sort=[("_id", 1)], limit=chunk_size
+                ))
+                # Ranges run from one page's last _id to the next's, and past the final page,
+                # so ledger entries of deleted users are covered too
+                id_range = {"$gt": last} if last is not None else {}
+                if page:
+                    id_range["$lte"] = page[-1]['_id']
+                pending.append(pool.submit(audit, page, id_range or {"$exists": True}, since, high_water))
+                summary['usersChecked'] += len(page)
+                if not page:
+                    break
+                last = page[-1]['_id']
+
+            for future in pending:
+                reports = future.result()
+                if not reports:
+                    continue
+                for report in reports:
+                    report.update(runId=run_id, createdAt=datetime.utcnow())
+                wallet_discrepancies_collection.insert_many(reports)
+                summary['discrepancies'] += len(reports)
+                summary['totalDifference'] += sum(abs(report['difference']) for report in reports)
+    except Exception as e:
+        wallet_audits_collection.update_one({"_id": run_id}, {"$set": {"error": str(e)}})
+        raise
+
+    summary['totalDifference'] = round(summary['totalDifference'], 2)
+    summary['seconds'] = round(time.monotonic() - started, 3)
+    wallet_audits_collection.update_one(
+        {"_id": run_id}, {"$set": dict(summary, finishedAt=datetime.utcnow())}
+    )
+    metrics.set('wallet_audit_discrepancies', summary['discrepancies'])
+    metrics.set('wallet_audit_last_run_seconds', summary['seconds'])
+    return dict(summary, runId=str(run_id), mode=run['mode'])
+
+
+def latest_audit(limit=500):
+    """The last finished run and what it found, largest differences first."""
+    run = wallet_audits_collection.find_one({"finishedAt": {"$ne": None}}, sort=[("finishedAt", -1)])
+    if not run:
+        return None
+    reports = list(wallet_discrepancies_collection.find({"runId": run['_id']}, {"runId": 0}).limit(limit))
+    reports.sort(key=lambda report: abs(report['difference']), reverse=True)
+    return run, reports
@@ -0,0 +1,110 @@
+"""Signed user tokens and the in-process revocation set.
+
+Users get a short-lived HS256 token at login (and on every refresh) that
+carries their id, name and mobile.  Endpoints that accept a ``userId`` trust
+the token for those instead of re-reading the user document; whether the
+user is blocked always comes from ``RevocationSet``, so blocks and unblocks
+take effect without waiting for the token to be refreshed.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import jwt
+
+DEVELOPMENT_SECRET_KEY = 'servicehub-development-secret-change-me'
+JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY') or DEVELOPMENT_SECRET_KEY
+JWT_ALGORITHM = 'HS256'
+JWT_EXPIRY_SECONDS = int(os.getenv('JWT_EXPIRY_SECONDS', 900))
+REVOCATION_REFRESH_SECONDS = int(os.getenv('REVOCATION_REFRESH_SECONDS', 30))
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def check_secret_key(debug):
+    """Refuse to start outside debug mode with the publicly known development key."""
+    if not debug and JWT_SECRET_KEY == DEVELOPMENT_SECRET_KEY:
+        raise RuntimeError("JWT_SECRET_KEY must be set unless FLASK_DEBUG is on")
+
+
+def issue_user_token(user):
+    now = datetime.utcnow()
+    claims = {
+        "sub": str(user['_id']),
+        "name": user['name'],
+        "mobile": user['mobile'],
+        "blk": bool(user.get('isBlocked', False)),
+        "iat": now,
+        "exp": now + timedelta(seconds=JWT_EXPIRY_SECONDS)
+    }
+    return jwt.encode(claims, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+
+
+def decode_user_token(token):
+    """Return the claims of a valid token, or None if it has expired.
+
+    Expired tokens are not an error: the caller falls back to reading the
+    user document, exactly as it did before tokens existed.
+    """
+    try:
+        return jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        return None
+    except jwt.InvalidTokenError as e:
+        raise InvalidToken(str(e))
+
+
+def bearer_token(headers):
+    auth_header = headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        return auth_header[len('Bearer '):].strip() or None
+    return None
+
+
+BLOCKED_USERS_QUERY = {"isBlocked": True}
+
+
+class RevocationSet:
+    """Ids of blocked users, cached per process.
+
+    The set is reloaded from ``users`` at most every ``refresh_seconds`` so
+    a block issued by another worker takes effect within that window; blocks
+    handled by this worker take effect immediately through ``block``/``unblock``.
+    """
+
+    def __init__(self, users_collection, refresh_seconds=REVOCATION_REFRESH_SECONDS):
+        self.users_collection = users_collection
+        self.refresh_seconds = refresh_seconds
+        self._blocked = set()
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_stale(self):
+        return time.monotonic() - self._loaded_at >= self.refresh_seconds
+
+    def _replace(self, users):
+        self._blocked = {str(user['_id']) for user in users}
+        self._loaded_at = time.monotonic()
+
+    def _reload_if_stale(self):
+        if not self._is_stale():
+            return
+        with self._lock:
+            if not self._is_stale():
+                return
+            self._replace(self.users_collection.find(BLOCKED_USERS_QUERY, {"_id": 1}))
+
+    def is_revoked(self, user_id):
+        self._reload_if_stale()
+        return str(user_id) in self._blocked
+
+    def block(self, user_id):
+        with self._lock:
+            self._blocked = self._blocked | {str(user_id)}
+
+    def unblock(self, user_id):
+        with self._lock:
+            self._blocked = self._blocked - {str(user_id)}
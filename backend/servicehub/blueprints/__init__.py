@@ -0,0 +1 @@
+"""API blueprints, one per area: admin, user, llr, dl and payment."""
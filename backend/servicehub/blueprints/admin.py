@@ -0,0 +1,978 @@
+"""Admin endpoints: users, pricing, wallets, services and the request queue."""
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+from flask import Blueprint, jsonify, request
+from pymongo import ReturnDocument, UpdateOne
+
+from ..audit import latest_audit
+from ..config import (ADMIN_SEARCH_LIMIT, ADMIN_SEARCH_MIN_LENGTH, REQUEST_CLAIM_LEASE_SECONDS,
+                      REQUEST_QUEUE_PAGE_SIZE)
+from ..documents import (DL_PDF_LIST_FIELDS, LLR_TOKEN_LIST_FIELDS, SERVICE_REQUEST_LIST_FIELDS,
+                         USER_LIST_FIELDS, USER_LIST_HIDDEN, admin_search_plan, list_projection)
+from ..extensions import (vendor, revoked_users, users_collection, admins_collection,
+                          services_collection, service_requests_collection,
+                          user_service_prices_collection, llr_tokens_collection, dl_pdfs_collection)
+from ..helpers import (build_payment_history_doc, add_payment_history, parse_object_id,
+                       validate_batch)
+from ..metrics import metrics
+from ..ledger import append_entries
+from ..purge import soft_delete_service
+from ..reconcile import pending_payment_stats
+from ..settlement import settle_refund
+from ..summary import apply_summary_operations, record_request_status, request_status_operations
+
+bp = Blueprint('admin', __name__)
+
+# Conditional wallet writes retried when a purchase lands between read and write
+WALLET_SET_ATTEMPTS = 3
+
+
+@bp.route('/api/admin/metrics', methods=['GET'])
+def get_metrics():
+    # Reconciliation lag is read from the payments index: the worker runs in its own process
+    payments = pending_payment_stats()
+    snapshot = metrics.snapshot()
+    snapshot['payments'] = payments
+    snapshot['dlCacheHitRate'] = metrics.ratio('dl_cache_hits', 'dl_cache_lookups')
+    snapshot['vendor'] = vendor.snapshot()
+    return jsonify(snapshot)
+
+@bp.route('/api/admin/login', methods=['POST'])
+def admin_login():
+    try:
+        data = request.get_json()
+        username = data.get('username')
+        password = data.get('password')
+        
+        if not username or not password:
+            return jsonify({"error": "Username and password are required"}), 400
+        
+        admin = admins_collection.find_one({
+            "username": username,
+            "password": password
+        })
+        
+        if not admin:
+            return jsonify({"error": "Invalid admin credentials"}), 401
+        
+        return jsonify({
+            "success": True,
+            "admin": {
+                "id": str(admin['_id']),
+                "username": admin['username']
+            }
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/admin/dashboard-stats', methods=['GET'])
+def get_dashboard_stats():
+    try:
+        # Get today's date range
+        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        today_end = today_start + timedelta(days=1)
+        
+        # Get today's requests
+        today_requests = list(service_requests_collection.find({
+            "createdAt": {
+                "$gte": today_start,
+                "$lt": today_end
+            }
+        }))
+        
+        # Get today's LLR requests
+        today_llr_requests = list(llr_tokens_collection.find({
+            "createdAt": {
+                "$gte": today_start,
+                "$lt": today_end
+            }
+        }))
+        
+        # Calculate today's total amount
+        today_amount = sum(req['servicePrice'] for req in today_requests if req.get('status') == 'success')
+        today_amount += sum(req['servicePrice'] for req in today_llr_requests)
+        
+        # Get all time stats
+        all_requests = list(service_requests_collection.find({}))
+        all_llr_requests = list(llr_tokens_collection.find({}))
+        total_users = users_collection.count_documents({})
+        total_services = services_collection.count_documents({"deletedAt": None})
+        
+        queue_stats = get_request_queue_stats()
+        
+        total_requests_count = len(all_requests) + len(all_llr_requests)
+        today_requests_count = len(today_requests) + len(today_llr_requests)
+        
+        return jsonify({
+            "todayRequests": today_requests_count,
+            "todayAmount": today_amount,
+            "totalRequests": total_requests_count,
+            "totalUsers": total_users,
+            "totalServices": total_services,
+            "pendingRequests": queue_stats['queueDepth'],
+            "queueDepth": queue_stats['queueDepth'],
+            "claimedRequests": queue_stats['claimedRequests'],
+            "oldestPendingAgeSeconds": queue_stats['oldestPendingAgeSeconds'],
+            "successRequests": len([req for req in all_requests if req.get('status') == 'success']) + len([req for req in all_llr_requests if req.get('status') == 'completed'])
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/admin/create-user', methods=['POST'])
+def create_user():
+    try:
+        data = request.get_json()
+        name = data.get('name')
+        mobile = data.get('mobile')
+        password = data.get('password')
+        
+        if not name or not mobile or not password:
+            return jsonify({"error": "Name, mobile number, and password are required"}), 400
+        
+        # Validate mobile number (should be 10 digits)
+        if not mobile.isdigit() or len(mobile) != 10:
+            return jsonify({"error": "Mobile number must be exactly 10 digits"}), 400
+        
+        # Check if mobile number already exists
+        existing_user = users_collection.find_one({"mobile": mobile})
+        if existing_user:
+            return jsonify({"error": "User with this mobile number already exists"}), 400
+        
+        # Create user document
+        user_doc = {
+            "name": name,
+            "mobile": mobile,
+            "password": password,
+            "walletBalance": 0.0,
+            "isBlocked": False,
+            "createdAt": datetime.utcnow()
+        }
+        
+        result = users_collection.insert_one(user_doc)
+        user_id = result.inserted_id
+        
+        # Set default prices for all existing services
+        services = list(services_collection.find({"deletedAt": None}))
+        for service in services:
+            if service.get('defaultPrice', 0) > 0:
+                user_service_prices_collection.insert_one({
+                    "userId": user_id,
+                    "serviceId": service['_id'],
+                    "price": service['defaultPrice'],
+                    "createdAt": datetime.utcnow()
+                })
+        
+        return jsonify({
+            "success": True,
+            "user": {
+                "id": str(user_id),
+                "name": name,
+                "mobile": mobile,
+                "password": password,
+                "walletBalance": 0.0,
+                "isBlocked": False
+            }
+        })
+    
+    except Exception as e:
+        print(f"Error creating user: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/admin/toggle-user-status', methods=['PUT'])
+def toggle_user_status():
+    try:
+        data = request.get_json()
+        user_id = data.get('userId')
+        is_blocked = data.get('isBlocked')
+        
+        if not user_id or is_blocked is None:
+            return jsonify({"error": "User ID and block status are required"}), 400
+        
+        result = users_collection.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$set": {"isBlocked": is_blocked}}
+        )
+        
+        if result.matched_count == 0:
+            return jsonify({"error": "User not found"}), 404
+        
+        # Tokens already issued to this user are enforced through the revocation set
+        if is_blocked:
+            revoked_users.block(user_id)
+        else:
+            revoked_users.unblock(user_id)
+        
+        status = "blocked" if is_blocked else "unblocked"
+        return jsonify({"success": True, "message": f"User {status} successfully"})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/admin/set-service-price', methods=['PUT'])
+def set_service_price():
+    try:
+        data = request.get_json()
+        user_id = data.get('userId')
+        service_id = data.get('serviceId')
+        price = data.get('price')
+        
+        if not user_id or not service_id or price is None:
+            return jsonify({"error": "User ID, Service ID, and price are required"}), 400
+        
+        # Validate price
+        try:
+            price = float(price)
+        except ValueError:
+            return jsonify({"error": "Price must be a valid number"}), 400
+        
+        # Update or create user-specific service price
+        user_service_prices_collection.update_one(
+            {"userId": ObjectId(user_id), "serviceId": ObjectId(service_id)},
+            {"$set": {
+                "userId": ObjectId(user_id),
+                "serviceId": ObjectId(service_id),
+                "price": price,
+                "updatedAt": datetime.utcnow()
+            }},
+            upsert=True
+        )
+        
+        return jsonify({"success": True, "message": "Service price updated successfully"})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/admin/update-wallet', methods=['PUT'])
+def update_wallet():
+    try:
+        data = request.get_json()
+        user_id = data.get('userId')
+        wallet_balance = data.get('walletBalance')
+        
+        if not user_id or wallet_balance is None:
+            return jsonify({"error": "User ID and wallet balance are required"}), 400
+        
+        # Validate wallet balance is a number
+        try:
+            wallet_balance = float(wallet_balance)
+        except ValueError:
+            return jsonify({"error": "Wallet balance must be a valid number"}), 400
+        
+        # Get current balance to calculate difference
+        user = users_collection.find_one({"_id": ObjectId(user_id)})
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        
+        current_balance = user.get('walletBalance', 0)
+        difference = wallet_balance - current_balance
+        
+        # Update wallet balance
+        result = users_collection.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$set": {"walletBalance": wallet_balance}}
+        )
+        
+        if result.matched_count == 0:
+            return jsonify({"error": "User not found"}), 404
+        
+        # Add payment history entry
+        if difference != 0:
+            transaction_type = "credit" if difference > 0 else "debit"
+            description = f"Wallet {transaction_type} by admin: ₹{abs(difference)}"
+            add_payment_history(user_id, transaction_type, abs(difference), description)
+        
+        return jsonify({"success": True, "message": "Wallet balance updated successfully"})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/admin/set-service-price/batch', methods=['PUT'])
+def set_service_prices_batch():
+    try:
+        data = request.get_json()
+        items = data.get('prices')
+        error = validate_batch(items, 'prices')
+        if error:
+            return error
+        
+        results = []
+        operations = []
+        for index, item in enumerate(items):
+            user_oid = parse_object_id(item.get('userId'))
+            service_oid = parse_object_id(item.get('serviceId'))
+            try:
+                price = float(item.get('price'))
+            except (TypeError, ValueError):
+                price = None
+            
+            if not user_oid or not service_oid:
+                results.append({"index": index, "success": False, "error": "Invalid ID format"})
+            elif price is None:
+                results.append({"index": index, "success": False, "error": "Price must be a valid number"})
+            else:
+                operations.append(UpdateOne(
+                    {"userId": user_oid, "serviceId": service_oid},
+                    {"$set": {
+                        "userId": user_oid,
+                        "serviceId": service_oid,
+                        "price": price,
+                        "updatedAt": datetime.utcnow()
+                    }},
+                    upsert=True
+                ))
+                results.append({"index": index, "success": True})
+        
+        if operations:
+            user_service_prices_collection.bulk_write(operations, ordered=False)
+        
+        return jsonify({"success": True, "results": results})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def set_wallet_balance(user, wallet_balance, history_docs):
+    """Set a wallet to ``wallet_balance`` as the single update does, with a ledger row.
+
+    The write is conditional on the balance it was computed from, so a
+    purchase landing in between makes it read again instead of leaving a
+    ledger row that does not explain the balance.
+    """
+    current_balance = user.get('walletBalance', 0)
+    for _ in range(WALLET_SET_ATTEMPTS):
+        difference = wallet_balance - current_balance
+        if difference == 0:
+            return {"success": True, "difference": 0}
+        updated = users_collection.find_one_and_update(
+            {"_id": user['_id'], "walletBalance": current_balance},
+            {"$set": {"walletBalance": wallet_balance}},
+            projection={"walletBalance": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if updated:
+            transaction_type = "credit" if difference > 0 else "debit"
+            description = f"Wallet {transaction_type} by admin: ₹{abs(difference)}"
+            history_docs.append(build_payment_history_doc(
+                user, transaction_type, abs(difference), description, balance_after=updated['walletBalance']
+            ))
+            # Later entries for the same user build on this one
+            user['walletBalance'] = updated['walletBalance']
+            return {"success": True, "difference": difference}
+        current = users_collection.find_one({"_id": user['_id']}, {"walletBalance": 1})
+        if not current:
+            return {"success": False, "error": "User not found"}
+        current_balance = current.get('walletBalance', 0)
+    return {"success": False, "error": "Wallet balance kept changing, retry"}
+
+@bp.route('/api/admin/update-wallet/batch', methods=['PUT'])
+def update_wallets_batch():
+    try:
+        data = request.get_json()
+        items = data.get('wallets')
+        error = validate_batch(items, 'wallets')
+        if error:
+            return error
+        
+        user_oids = [parse_object_id(item.get('userId')) for item in items]
+        users = {
+            user['_id']: user
+            for user in users_collection.find(
+                {"_id": {"$in": [oid for oid in user_oids if oid]}},
+                {"name": 1, "mobile": 1, "walletBalance": 1}
+            )
+        }
+        
+        results = []
+        history_docs = []
+        for index, (item, user_oid) in enumerate(zip(items, user_oids)):
+            try:
+                wallet_balance = float(item.get('walletBalance'))
+            except (TypeError, ValueError):
+                results.append({"index": index, "success": False, "error": "Wallet balance must be a valid number"})
+                continue
+            user = users.get(user_oid)
+            if not user:
+                results.append({"index": index, "success": False, "error": "User not found"})
+                continue
+            
+            result = set_wallet_balance(user, wallet_balance, history_docs)
+            results.append(dict(result, index=index))
+        
+        if history_docs:
+            append_entries(history_docs)
+        
+        return jsonify({"success": True, "results": results})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/admin/toggle-user-status/batch', methods=['PUT'])
+def toggle_user_status_batch():
+    try:
+        data = request.get_json()
+        items = data.get('users')
+        error = validate_batch(items, 'users')
+        if error:
+            return error
+        
+        user_oids = [parse_object_id(item.get('userId')) for item in items]
+        existing = {
+            user['_id']
+            for user in users_collection.find({"_id": {"$in": [oid for oid in user_oids if oid]}}, {"_id": 1})
+        }
+        
+        results = []
+        operations = []
+        changes = []
+        for index, (item, user_oid) in enumerate(zip(items, user_oids)):
+            is_blocked = item.get('isBlocked')
+            if not isinstance(is_blocked, bool):
+                results.append({"index": index, "success": False, "error": "Block status must be true or false"})
+            elif user_oid not in existing:
+                results.append({"index": index, "success": False, "error": "User not found"})
+            else:
+                operations.append(UpdateOne({"_id": user_oid}, {"$set": {"isBlocked": is_blocked}}))
+                changes.append((user_oid, is_blocked))
+                results.append({"index": index, "success": True})
+        
+        if operations:
+            users_collection.bulk_write(operations, ordered=True)
+        for user_oid, is_blocked in changes:
+            if is_blocked:
+                revoked_users.block(user_oid)
+            else:
+                revoked_users.unblock(user_oid)
+        
+        return jsonify({"success": True, "results": results})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/admin/users', methods=['GET'])
+def get_all_users():
+    try:
+        projection = list_projection(USER_LIST_FIELDS, request.args.get('fields'), USER_LIST_HIDDEN)
+        users = list(users_collection.find({}, projection))
+        for user in users:
+            user['_id'] = str(user['_id'])
+        
+        return jsonify({"users": users})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Collection name -> (collection, result key, fields returned)
+SEARCH_TARGETS = {
+    'users': (users_collection, 'users', USER_LIST_FIELDS),
+    'service_requests': (service_requests_collection, 'serviceRequests', SERVICE_REQUEST_LIST_FIELDS),
+    'llr_tokens': (llr_tokens_collection, 'llrTokens', LLR_TOKEN_LIST_FIELDS),
+    'dl_pdfs': (dl_pdfs_collection, 'dlPdfs', DL_PDF_LIST_FIELDS)
+}
+
+@bp.route('/api/admin/search', methods=['GET'])
+def admin_search():
+    try:
+        query = (request.args.get('q') or '').strip()
+        if len(query) < ADMIN_SEARCH_MIN_LENGTH:
+            return jsonify({"error": f"Search query must be at least {ADMIN_SEARCH_MIN_LENGTH} characters"}), 400
+        try:
+            limit = max(1, min(int(request.args.get('limit', ADMIN_SEARCH_LIMIT)), ADMIN_SEARCH_LIMIT))
+        except ValueError:
+            return jsonify({"error": "Limit must be a number"}), 400
+        
+        # Each lookup is an _id, exact or anchored prefix match on an indexed field
+        results = {key: [] for _, key, _ in SEARCH_TARGETS.values()}
+        matched_by = []
+        seen = set()
+        for kind, name, query_filter in admin_search_plan(query):
+            collection, key, fields = SEARCH_TARGETS[name]
+            docs = list(collection.find(query_filter, list_projection(fields)).limit(limit))
+            if docs and kind not in matched_by:
+                matched_by.append(kind)
+            for doc in docs:
+                if doc['_id'] in seen or len(results[key]) >= limit:
+                    continue
+                seen.add(doc['_id'])
+                for field in ('_id', 'userId', 'serviceId'):
+                    if field in doc:
+                        doc[field] = str(doc[field])
+                results[key].append(doc)
+        
+        metrics.inc('admin_searches')
+        return jsonify({"query": query, "matchedBy": matched_by, "results": results})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/admin/wallet-audit', methods=['GET'])
+def get_wallet_audit():
+    try:
+        audit = latest_audit()
+        if audit is None:
+            return jsonify({"error": "No wallet audit has finished yet"}), 404
+        run, reports = audit
+        run['_id'] = str(run['_id'])
+        for report in reports:
+            report['_id'] = str(report['_id'])
+            report['userId'] = str(report['userId'])
+        
+        return jsonify({"run": run, "discrepancies": reports})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Service Management APIs
+@bp.route('/api/admin/services', methods=['POST'])
+def create_service():
+    try:
+        data = request.get_json()
+        name = data.get('name')
+        description = data.get('description')
+        default_price = data.get('defaultPrice', 0)
+        fields = data.get('fields', [])
+        
+        if not name or not description:
+            return jsonify({"error": "Name and description are required"}), 400
+        
+        # Validate default price
+        try:
+            default_price = float(default_price)
+        except ValueError:
+            return jsonify({"error": "Default price must be a valid number"}), 400
+        
+        # Validate fields
+        if not isinstance(fields, list):
+            return jsonify({"error": "Fields must be an array"}), 400
+        
+        service_doc = {
+            "name": name,
+            "description": description,
+            "defaultPrice": default_price,
+            "fields": fields,
+            "isActive": True,
+            "createdAt": datetime.utcnow()
+        }
+        
+        result = services_collection.insert_one(service_doc)
+        service_id = result.inserted_id
+        
+        # Set default price for all existing users
+        if default_price > 0:
+            users = list(users_collection.find({}))
+            for user in users:
+                user_service_prices_collection.insert_one({
+                    "userId": user['_id'],
+                    "serviceId": service_id,
+                    "price": default_price,
+                    "createdAt": datetime.utcnow()
+                })
+        
+        return jsonify({
+            "success": True,
+            "service": {
+                "id": str(service_id),
+                "name": name,
+                "description": description,
+                "defaultPrice": default_price,
+                "fields": fields,
+                "isActive": True
+            }
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/admin/services', methods=['GET'])
+def get_all_services():
+    try:
+        services = list(services_collection.find({"deletedAt": None}))
+        for service in services:
+            service['_id'] = str(service['_id'])
+        
+        return jsonify({"services": services})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/admin/services/<service_id>/toggle', methods=['PUT'])
+def toggle_service_status(service_id):
+    try:
+        data = request.get_json()
+        is_active = data.get('isActive')
+        
+        if is_active is None:
+            return jsonify({"error": "Service status is required"}), 400
+        
+        result = services_collection.update_one(
+            {"_id": ObjectId(service_id), "deletedAt": None},
+            {"$set": {"isActive": is_active}}
+        )
+        
+        if result.matched_count == 0:
+            return jsonify({"error": "Service not found"}), 404
+        
+        status = "activated" if is_active else "deactivated"
+        return jsonify({"success": True, "message": f"Service {status} successfully"})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/admin/services/<service_id>', methods=['DELETE'])
+def delete_service(service_id):
+    try:
+        service_oid = ObjectId(service_id)
+        
+        # Hidden now; the record stays for the requests that name it, and the
+        # purge-services worker removes its user-specific prices
+        if not soft_delete_service(service_oid):
+            return jsonify({"error": "Service not found"}), 404
+        
+        return jsonify({"success": True, "message": "Service deleted successfully"})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/admin/services/<service_id>/deletion', methods=['GET'])
+def get_service_deletion(service_id):
+    try:
+        service = services_collection.find_one(
+            {"_id": ObjectId(service_id)}, {"name": 1, "deletedAt": 1, "deletion": 1}
+        )
+        
+        if not service or not service.get('deletedAt'):
+            return jsonify({"error": "Service not found or not deleted"}), 404
+        
+        return jsonify({
+            "serviceId": service_id,
+            "name": service.get('name'),
+            "deletedAt": service['deletedAt'],
+            "deletion": service.get('deletion')
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route('/api/admin/service-requests', methods=['GET'])
+def get_service_requests():
+    try:
+        projection = list_projection(SERVICE_REQUEST_LIST_FIELDS, request.args.get('fields'))
+        requests = list(service_requests_collection.find({}, projection).sort("createdAt", -1))
+        for req in requests:
+            req['_id'] = str(req['_id'])
+            req['userId'] = str(req['userId'])
+            req['serviceId'] = str(req['serviceId'])
+        
+        return jsonify({"requests": requests})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def unclaimed_filter(now):
+    return {"$or": [{"claimExpiresAt": {"$exists": False}}, {"claimExpiresAt": {"$lt": now}}]}
+
+def claim_holder_filter(admin_id, now):
+    """Requests ``admin_id`` may act on: unclaimed, claimed by them, or with a lapsed lease."""
+    return {"$or": [{"claimedBy": {"$in": [None, admin_id]}}, unclaimed_filter(now)]}
+
+def claimed_by_other(request_doc, admin_id, now):
+    claim_expires = request_doc.get('claimExpiresAt')
+    return (request_doc.get('claimedBy') not in (None, admin_id)
+            and claim_expires is not None and claim_expires >= now)
+
+def serialize_service_request(req):
+    req['_id'] = str(req['_id'])
+    req['userId'] = str(req['userId'])
+    req['serviceId'] = str(req['serviceId'])
+    return req
+
+def get_request_queue_stats():
+    now = datetime.utcnow()
+    depth = service_requests_collection.count_documents({"status": "pending"})
+    claimed = service_requests_collection.count_documents(
+        {"status": "pending", "claimExpiresAt": {"$gte": now}}
+    )
+    oldest = service_requests_collection.find_one(
+        {"status": "pending"},
+        {"createdAt": 1},
+        sort=[("createdAt", 1)]
+    )
+    oldest_age = (now - oldest['createdAt']).total_seconds() if oldest else 0
+    
+    metrics.set('request_queue_depth', depth)
+    metrics.set('request_queue_oldest_age_seconds', oldest_age)
+    return {
+        "queueDepth": depth,
+        "claimedRequests": claimed,
+        "oldestPendingAt": oldest['createdAt'].isoformat() if oldest else None,
+        "oldestPendingAgeSeconds": oldest_age
+    }
+
+@bp.route('/api/admin/service-requests/queue', methods=['GET'])
+def get_request_queue():
+    try:
+        limit = min(int(request.args.get('limit', REQUEST_QUEUE_PAGE_SIZE)), 500)
+        
+        # Oldest first, served from the partial pending_queue index
+        queue = list(service_requests_collection.find({"status": "pending"})
+                     .sort("createdAt", 1)
+                     .limit(limit))
+        
+        return jsonify({
+            "requests": [serialize_service_request(req) for req in queue],
+            "stats": get_request_queue_stats()
+        })
+    
+    except ValueError:
+        return jsonify({"error": "Limit must be a number"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/admin/service-requests/queue/stats', methods=['GET'])
+def get_request_queue_stats_route():
+    try:
+        return jsonify(get_request_queue_stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/admin/service-requests/claim', methods=['POST'])
+def claim_service_request():
+    """Claim the oldest unclaimed pending request, or the one named by ``requestId``.
+
+    Claiming a request the admin already holds renews the lease.
+    """
+    try:
+        data = request.get_json()
+        admin_id = data.get('adminId')
+        request_id = data.get('requestId')
+        
+        if not admin_id:
+            return jsonify({"error": "Admin ID is required"}), 400
+        
+        now = datetime.utcnow()
+        if request_id:
+            request_oid = parse_object_id(request_id)
+            if not request_oid:
+                return jsonify({"error": "Invalid ID format"}), 400
+            selector = {"_id": request_oid, "status": "pending", **claim_holder_filter(admin_id, now)}
+        else:
+            selector = {"status": "pending", **unclaimed_filter(now)}
+        claimed = service_requests_collection.find_one_and_update(
+            selector,
+            {"$set": {
+                "claimedBy": admin_id,
+                "claimedAt": now,
+                "claimExpiresAt": now + timedelta(seconds=REQUEST_CLAIM_LEASE_SECONDS)
+            }},
+            sort=[("createdAt", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        
+        if not claimed and request_id:
+            request_doc = service_requests_collection.find_one({"_id": request_oid}, {"status": 1})
+            if not request_doc:
+                return jsonify({"error": "Request not found"}), 404
+            if request_doc.get('status') != 'pending':
+                return jsonify({"error": "Request already processed"}), 409
+            return jsonify({"error": "Request is being handled by another admin"}), 409
+        if not claimed:
+            return jsonify({"success": True, "request": None, "message": "No pending requests"})
+        
+        return jsonify({"success": True, "request": serialize_service_request(claimed)})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/admin/service-request/<request_id>/release', methods=['POST'])
+def release_service_request(request_id):
+    try:
+        data = request.get_json()
+        admin_id = data.get('adminId')
+        
+        if not admin_id:
+            return jsonify({"error": "Admin ID is required"}), 400
+        
+        result = service_requests_collection.update_one(
+            {"_id": ObjectId(request_id), "status": "pending", "claimedBy": admin_id},
+            {"$unset": {"claimedBy": "", "claimedAt": "", "claimExpiresAt": ""}}
+        )
+        
+        if result.matched_count == 0:
+            return jsonify({"error": "Request is not claimed by this admin"}), 409
+        
+        return jsonify({"success": True, "message": "Request released"})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/admin/service-request/<request_id>/respond', methods=['PUT'])
+def respond_to_request(request_id):
+    try:
+        data = request.get_json()
+        status = data.get('status')
+        admin_message = data.get('adminMessage', '')
+        
+        if not status or status not in ['success', 'failed']:
+            return jsonify({"error": "Status must be 'success' or 'failed'"}), 400
+        
+        # Get request details
+        request_doc = service_requests_collection.find_one({"_id": ObjectId(request_id)})
+        if not request_doc:
+            return jsonify({"error": "Request not found"}), 404
+        
+        # Another admin's live claim from the work queue wins, whether or not adminId was sent
+        admin_id = data.get('adminId')
+        now = datetime.utcnow()
+        if claimed_by_other(request_doc, admin_id, now):
+            return jsonify({"error": "Request is being handled by another admin"}), 409
+        
+        # Update request
+        update = {
+            "$set": {
+                "status": status,
+                "adminMessage": admin_message,
+                "updatedAt": now
+            },
+            "$unset": {"claimedBy": "", "claimedAt": "", "claimExpiresAt": ""}
+        }
+        # Re-checked by the write, in case the request was claimed since the read
+        selector = {"_id": ObjectId(request_id), **claim_holder_filter(admin_id, now)}
+        
+        # If failed, refund the amount together with the status change, and only once
+        if status == 'failed':
+            description = f"Refund for failed {request_doc['serviceName']} service"
+            refunded = settle_refund(
+                service_requests_collection,
+                dict(selector, status={"$ne": "failed"}),
+                update,
+                request_doc['userId'], request_doc['servicePrice'], description, request_id
+            )
+            if refunded is not None:
+                record_request_status(request_doc, status, admin_message)
+                return jsonify({"success": True, "message": "Response sent successfully"})
+        
+        result = service_requests_collection.update_one(selector, update)
+        
+        if result.matched_count == 0:
+            return jsonify({"error": "Request is being handled by another admin"}), 409
+        
+        record_request_status(request_doc, status, admin_message)
+        return jsonify({"success": True, "message": "Response sent successfully"})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/admin/service-request/respond/batch', methods=['PUT'])
+def respond_to_requests_batch():
+    try:
+        data = request.get_json()
+        items = data.get('responses')
+        error = validate_batch(items, 'responses')
+        if error:
+            return error
+        
+        admin_id = data.get('adminId')
+        now = datetime.utcnow()
+        request_oids = [parse_object_id(item.get('requestId')) for item in items]
+        request_docs = {
+            doc['_id']: doc
+            for doc in service_requests_collection.find(
+                {"_id": {"$in": [oid for oid in request_oids if oid]}},
+                {"userId": 1, "serviceName": 1, "servicePrice": 1, "status": 1,
+                 "claimedBy": 1, "claimExpiresAt": 1}
+            )
+        }
+        
+        results = [None] * len(items)
+        operations = []
+        applied = []
+        refunds = []
+        seen = set()
+        for index, (item, request_oid) in enumerate(zip(items, request_oids)):
+            status = item.get('status')
+            request_doc = request_docs.get(request_oid)
+            if status not in ['success', 'failed']:
+                results[index] = {"index": index, "success": False, "error": "Status must be 'success' or 'failed'"}
+            elif not request_doc:
+                results[index] = {"index": index, "success": False, "error": "Request not found"}
+            elif request_doc.get('status') != 'pending' or request_oid in seen:
+                results[index] = {"index": index, "success": False, "error": "Request already processed"}
+            elif claimed_by_other(request_doc, admin_id, now):
+                results[index] = {"index": index, "success": False, "error": "Request is being handled by another admin"}
+            else:
+                seen.add(request_oid)
+                # Re-checked by the write: still pending and not claimed by someone else since the read
+                selector = {"_id": request_oid, "status": "pending", **claim_holder_filter(admin_id, now)}
+                update = {"$set": {
+                    "status": status,
+                    "adminMessage": item.get('adminMessage', ''),
+                    "updatedAt": now
+                }, "$unset": {"claimedBy": "", "claimedAt": "", "claimExpiresAt": ""}}
+                if status == 'failed':
+                    refunds.append((index, item, request_doc, selector, update))
+                else:
+                    operations.append(UpdateOne(selector, update))
+                    applied.append((index, item, request_doc))
+        
+        summary_operations = []
+        if operations:
+            result = service_requests_collection.bulk_write(operations, ordered=False)
+            if result.matched_count < len(operations):
+                # Some changed under us; keep only the ones this batch wrote
+                written = {doc['_id'] for doc in service_requests_collection.find(
+                    {"_id": {"$in": [doc['_id'] for _, _, doc in applied]}, "status": "success", "updatedAt": now},
+                    {"_id": 1}
+                )}
+            else:
+                written = {doc['_id'] for _, _, doc in applied}
+            for index, item, request_doc in applied:
+                if request_doc['_id'] in written:
+                    summary_operations.extend(request_status_operations(request_doc, 'success', item.get('adminMessage', '')))
+                    results[index] = {"index": index, "success": True}
+                else:
+                    results[index] = {"index": index, "success": False, "error": "Request already processed"}
+        
+        # Each refund is settled with its own status change, so only requests this batch moved are credited
+        for index, item, request_doc, selector, update in refunds:
+            refunded = settle_refund(
+                service_requests_collection, selector, update,
+                request_doc['userId'], request_doc['servicePrice'],
+                f"Refund for failed {request_doc['serviceName']} service", str(request_doc['_id'])
+            )
+            if refunded is None:
+                results[index] = {"index": index, "success": False, "error": "Request already processed"}
+                continue
+            summary_operations.extend(request_status_operations(request_doc, 'failed', item.get('adminMessage', '')))
+            results[index] = {"index": index, "success": True}
+        
+        apply_summary_operations(summary_operations)
+        return jsonify({"success": True, "results": results})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route('/api/admin/user-service-prices/<user_id>', methods=['GET'])
+def get_user_service_prices(user_id):
+    try:
+        # Get all services
+        services = list(services_collection.find({"deletedAt": None}))
+        
+        # Get user-specific prices
+        user_prices = list(user_service_prices_collection.find({"userId": ObjectId(user_id)}))
+        price_map = {str(price['serviceId']): price['price'] for price in user_prices}
+        
+        service_prices = []
+        for service in services:
+            service_prices.append({
+                "serviceId": str(service['_id']),
+                "serviceName": service['name'],
+                "price": price_map.get(str(service['_id']), service.get('defaultPrice', 0))
+            })
+        
+        return jsonify({"servicePrices": service_prices})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
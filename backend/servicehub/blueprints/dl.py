@@ -0,0 +1,425 @@
+"""DL PDF generation and download endpoints."""
+import json
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+from bson.objectid import ObjectId
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+
+from ..archive import ZipStream
+from ..config import (DL_PDF_API_URL, DL_API_KEY, DL_CACHE_TTL_SECONDS, DL_CACHE_CHARGE_POLICY,
+                      DL_BULK_MAX_ITEMS, DL_BULK_WORKERS)
+from ..documents import (DL_PDF_LIST_FIELDS, DL_REQUIRED_FIELDS, DL_VENDOR_HEADERS, PDF_LIST_HIDDEN,
+                         build_dl_pdf_record, clean_dl_bulk_input, clean_dl_input, dl_bulk_filename,
+                         dl_cache_filter, dl_generation_description, dl_pdf_request,
+                         dl_refund_description, dl_success_payload, list_projection,
+                         serialize_dl_pdf, service_price_for, stored_vendor_response)
+from ..extensions import (vendor, idempotency_store, in_app_context, users_collection,
+                          services_collection, user_service_prices_collection, dl_pdfs_collection)
+from ..helpers import (get_request_user, vendor_unavailable_response, debit_wallet, credit_wallet,
+                       pdf_file_response, pdf_not_modified)
+from ..idempotency import idempotent
+from ..metrics import metrics
+from ..pdfstore import PDF_PROJECTION, load_pdf, load_pdf_bytes, pdf_hash, release_pdf, share_pdf, store_pdf
+from ..settlement import refund_order_batch, reserve_order_batch, settle_order
+from ..summary import record_order_created
+from ..vendor import VendorUnavailable
+
+bp = Blueprint('dl', __name__)
+
+
+def find_cached_dl_pdf(clean, with_pdf=True):
+    if DL_CACHE_TTL_SECONDS <= 0:
+        return None
+    metrics.inc('dl_cache_lookups')
+    cached = dl_pdfs_collection.find_one(
+        dl_cache_filter(clean, datetime.utcnow() - timedelta(seconds=DL_CACHE_TTL_SECONDS)),
+        dict(PDF_PROJECTION, name=1, dob=1) if with_pdf else {"_id": 1},
+        sort=[("createdAt", -1)]
+    )
+    if cached:
+        metrics.inc('dl_cache_hits')
+        return cached
+    return None
+
+# DL PDF Services
+@bp.route('/api/dl/generate-pdf', methods=['POST'])
+@idempotent(idempotency_store, 'dl-generate-pdf')
+def generate_dl_pdf():
+    try:
+        data = request.get_json()
+        
+        # Validate required fields
+        missing_fields = [field for field in DL_REQUIRED_FIELDS if field not in data]
+        if missing_fields:
+            return jsonify({
+                "error": f"Missing required fields: {', '.join(missing_fields)}",
+                "required_fields": DL_REQUIRED_FIELDS
+            }), 400
+
+        # Extract and clean data
+        user_id = data['userId']
+        service_id = data['serviceId']
+        clean = clean_dl_input(data)
+
+        # Validate ObjectIDs
+        try:
+            user_oid = ObjectId(user_id)
+            service_oid = ObjectId(service_id)
+        except:
+            return jsonify({"error": "Invalid ID format"}), 400
+
+        # Get user and service
+        user = get_request_user(user_oid)
+        service = services_collection.find_one({"_id": service_oid, "deletedAt": None})
+
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        if user.get('isBlocked'):
+            return jsonify({"error": "Account blocked"}), 403
+        if not service:
+            return jsonify({"error": "Service not found"}), 404
+        if not service.get('isActive', True):
+            return jsonify({"error": "Service unavailable"}), 400
+
+        # Get service price
+        user_price = user_service_prices_collection.find_one({
+            "userId": user_oid,
+            "serviceId": service_oid
+        })
+        service_price = service_price_for(service, user_price)
+        
+        if service_price <= 0:
+            return jsonify({"error": "Service price not configured"}), 400
+
+        cached = find_cached_dl_pdf(clean)
+        if cached:
+            charge = service_price if DL_CACHE_CHARGE_POLICY == 'full' else 0
+            pdf_fields = share_pdf(cached)
+            pdf_record = build_dl_pdf_record(
+                user, service, charge, clean, cached.get('name'), cached.get('dob'), pdf_fields,
+                cachedFrom=cached['_id']
+            )
+            stored = False
+            try:
+                if charge:
+                    settled = settle_order(user, charge, dl_pdfs_collection, pdf_record,
+                                           dl_generation_description(clean))
+                    if settled is None:
+                        return jsonify({"error": "Insufficient wallet balance"}), 400
+                    new_balance = settled[1]
+                else:
+                    dl_pdfs_collection.insert_one(pdf_record)
+                    record_order_created(dl_pdfs_collection.name, pdf_record)
+                    wallet = users_collection.find_one({"_id": user_oid}, {"walletBalance": 1})
+                    new_balance = (wallet or {}).get('walletBalance', 0)
+                stored = True
+            finally:
+                if not stored:
+                    release_pdf(pdf_fields)
+
+            return jsonify(dict(
+                dl_success_payload(cached.get('name'), cached.get('dob'), load_pdf(cached), new_balance),
+                cached=True
+            ))
+
+        # Reserve the price up front; released again unless the PDF is delivered
+        new_balance = debit_wallet(user_oid, service_price)
+        if new_balance is None:
+            return jsonify({"error": "Insufficient wallet balance"}), 400
+        settled = False
+
+        # Call DL PDF API
+        metrics.inc('dl_vendor_calls')
+
+        try:
+            response = vendor.post(
+                'dl',
+                DL_PDF_API_URL,
+                data=dl_pdf_request(clean, DL_API_KEY),
+                headers=DL_VENDOR_HEADERS,
+                timeout=60,
+                fair_key=user_oid
+            )
+            response.raise_for_status()
+            
+            api_response = response.json()
+            if api_response.get('status') != '200':
+                return jsonify({
+                    "error": api_response.get('message', 'API request failed'),
+                    "api_status": api_response.get('status')
+                }), 400
+
+            # Store PDF record
+            pdf_fields = store_pdf(api_response.get('pdf'))
+            pdf_record = build_dl_pdf_record(
+                user, service, service_price, clean,
+                api_response.get('name'), api_response.get('dob'), pdf_fields,
+                apiResponse=stored_vendor_response(api_response, 'pdf', pdf_fields)
+            )
+            
+            # Record and transaction are written together against the reserved funds
+            try:
+                settle_order(user, service_price, dl_pdfs_collection, pdf_record,
+                             dl_generation_description(clean), reserved_balance=new_balance)
+            except Exception:
+                release_pdf(pdf_fields)
+                raise
+            settled = True
+            
+            return jsonify(dl_success_payload(
+                api_response.get('name'), api_response.get('dob'), api_response.get('pdf'), new_balance
+            ))
+
+        except VendorUnavailable as e:
+            return vendor_unavailable_response(e)
+        except requests.exceptions.RequestException as e:
+            return jsonify({
+                "error": "DL API service unavailable",
+                "details": str(e)
+            }), 503
+        except ValueError as e:
+            return jsonify({
+                "error": "Invalid API response",
+                "details": str(e)
+            }), 502
+        finally:
+            if not settled:
+                credit_wallet(user_oid, service_price)
+
+    except Exception as e:
+        current_app.logger.error(f"DL PDF Generation Error: {str(e)}")
+        return jsonify({
+            "error": "Internal server error",
+            "details": str(e)
+        }), 500
+
+def generate_bulk_dl_item(user, service, job):
+    """Produce and store one PDF of a bulk job; returns its manifest fields without the PDF."""
+    clean = job['clean']
+    if job['cachedFrom']:
+        cached = dl_pdfs_collection.find_one({"_id": job['cachedFrom']}, dict(PDF_PROJECTION, name=1, dob=1))
+        if not cached or not (cached.get('pdfHash') or cached.get('pdfData')):
+            return {"success": False, "error": "Cached PDF is no longer available"}
+        name, dob = cached.get('name'), cached.get('dob')
+        pdf_fields = share_pdf(cached)
+        extra = {"cachedFrom": cached['_id']}
+    else:
+        metrics.inc('dl_vendor_calls')
+        try:
+            response = vendor.post(
+                'dl',
+                DL_PDF_API_URL,
+                data=dl_pdf_request(clean, DL_API_KEY),
+                headers=DL_VENDOR_HEADERS,
+                timeout=60,
+                fair_key=user['_id']
+            )
+            response.raise_for_status()
+            api_response = response.json()
+        except (VendorUnavailable, requests.exceptions.RequestException, ValueError) as e:
+            return {"success": False, "error": f"DL API request failed: {str(e)}"}
+        if api_response.get('status') != '200' or not api_response.get('pdf'):
+            return {"success": False, "error": api_response.get('message', 'API request failed'),
+                    "api_status": api_response.get('status')}
+        name, dob = api_response.get('name'), api_response.get('dob')
+        pdf_fields = store_pdf(api_response['pdf'])
+        if 'pdfHash' not in pdf_fields:
+            return {"success": False, "error": "Invalid PDF in API response"}
+        extra = {"apiResponse": stored_vendor_response(api_response, 'pdf', pdf_fields)}
+
+    pdf_record = build_dl_pdf_record(user, service, job['charge'], clean, name, dob, pdf_fields, **extra)
+    pdf_record['_id'] = job['recordId']
+    try:
+        dl_pdfs_collection.insert_one(pdf_record)
+    except Exception:
+        release_pdf(pdf_fields)
+        raise
+    record_order_created(dl_pdfs_collection.name, pdf_record)
+    return {"success": True, "name": name, "dob": dob, "cached": bool(job['cachedFrom'])}
+
+@bp.route('/api/dl/generate-pdf/bulk', methods=['POST'])
+def generate_dl_pdf_bulk():
+    """Generate PDFs for a list of ``dlnos`` sharing ``type``/``blood``/``addrtype``.
+
+    The whole price is reserved before any vendor call.  The response is a
+    ZIP streamed as PDFs arrive, one ``<dlno>.pdf`` per delivered licence,
+    ending with ``manifest.json`` that lists every dlno's outcome and the
+    wallet balance after failed items have been refunded.
+    """
+    try:
+        data = request.get_json()
+        user_id = data.get('userId')
+        service_id = data.get('serviceId')
+        
+        if not user_id or not service_id:
+            return jsonify({"error": "User ID and Service ID are required"}), 400
+        
+        cleans, error = clean_dl_bulk_input(data, DL_BULK_MAX_ITEMS)
+        if error:
+            return jsonify({"error": error}), 400
+        
+        try:
+            user_oid = ObjectId(user_id)
+            service_oid = ObjectId(service_id)
+        except:
+            return jsonify({"error": "Invalid ID format"}), 400
+        
+        user = get_request_user(user_oid)
+        service = services_collection.find_one({"_id": service_oid, "deletedAt": None})
+        
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        if user.get('isBlocked'):
+            return jsonify({"error": "Account blocked"}), 403
+        if not service:
+            return jsonify({"error": "Service not found"}), 404
+        if not service.get('isActive', True):
+            return jsonify({"error": "Service unavailable"}), 400
+        
+        user_price = user_service_prices_collection.find_one({
+            "userId": user_oid,
+            "serviceId": service_oid
+        })
+        service_price = service_price_for(service, user_price)
+        
+        if service_price <= 0:
+            return jsonify({"error": "Service price not configured"}), 400
+        
+        jobs = []
+        for clean in cleans:
+            cached = find_cached_dl_pdf(clean, with_pdf=False)
+            charge = service_price if not cached or DL_CACHE_CHARGE_POLICY == 'full' else 0
+            jobs.append({"clean": clean, "recordId": ObjectId(), "charge": charge,
+                         "cachedFrom": cached['_id'] if cached else None})
+        
+        # One debit for every charged item, with a ledger row each
+        items = [(job['recordId'], job['charge'], dl_generation_description(job['clean']))
+                 for job in jobs if job['charge']]
+        if items:
+            new_balance = reserve_order_batch(user, items)
+            if new_balance is None:
+                return jsonify({"error": "Insufficient wallet balance"}), 400
+        else:
+            wallet = users_collection.find_one({"_id": user_oid}, {"walletBalance": 1})
+            new_balance = (wallet or {}).get('walletBalance', 0)
+        metrics.inc('dl_bulk_items', len(jobs))
+        
+        def generate():
+            archive = ZipStream()
+            results = queue.Queue()
+            produce = in_app_context(generate_bulk_dl_item)
+            
+            def work(job):
+                try:
+                    result = produce(user, service, job)
+                except Exception as e:
+                    result = {"success": False, "error": str(e)}
+                results.put((job, result))
+            
+            pool = ThreadPoolExecutor(max_workers=min(DL_BULK_WORKERS, len(jobs)))
+            for job in jobs:
+                pool.submit(work, job)
+            manifest = []
+            outcome = {}
+            try:
+                # Only the PDF being written is in memory; the rest wait in dl_pdfs
+                for _ in jobs:
+                    job, result = results.get()
+                    entry = dict(result, dlno=job['clean']['dlno'])
+                    if result['success']:
+                        pdf = dl_pdfs_collection.find_one({"_id": job['recordId']}, PDF_PROJECTION)
+                        entry['file'] = dl_bulk_filename(job['clean'])
+                        yield archive.add(entry['file'], load_pdf_bytes(pdf))
+                    manifest.append((job, entry))
+            finally:
+                # Also runs when the client goes away: items still in flight are
+                # stored and every failed charged item is refunded
+                pool.shutdown(wait=True)
+                while not results.empty():
+                    job, result = results.get_nowait()
+                    manifest.append((job, dict(result, dlno=job['clean']['dlno'])))
+                failed = [
+                    (job['recordId'], job['charge'], dl_refund_description(job['clean']))
+                    for job, entry in manifest if not entry['success'] and job['charge']
+                ]
+                outcome['failed'] = sum(1 for _, entry in manifest if not entry['success'])
+                outcome['refunded'] = sum(amount for _, amount, _ in failed)
+                outcome['balance'] = refund_order_batch(user_oid, failed) if failed else new_balance
+            yield archive.add('manifest.json', json.dumps({
+                "submitted": len(jobs),
+                "generated": len(jobs) - outcome['failed'],
+                "failed": outcome['failed'],
+                "refunded": outcome['refunded'],
+                "newWalletBalance": outcome['balance'],
+                "items": [entry for _, entry in manifest]
+            }, indent=2))
+            yield archive.close()
+        
+        filename = f"dl-pdfs-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.zip"
+        return Response(stream_with_context(generate()), mimetype='application/zip',
+                        headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+    
+    except Exception as e:
+        current_app.logger.error(f"DL PDF Bulk Generation Error: {str(e)}")
+        return jsonify({
+            "error": "Internal server error",
+            "details": str(e)
+        }), 500
+
+@bp.route('/api/dl/user-pdfs/<user_id>', methods=['GET'])
+def get_user_dl_pdfs(user_id):
+    try:
+        pdfs = list(dl_pdfs_collection.find(
+            {"userId": ObjectId(user_id)},
+            list_projection(DL_PDF_LIST_FIELDS, request.args.get('fields'), PDF_LIST_HIDDEN)
+        ).sort("createdAt", -1))
+        
+        return jsonify({"pdfs": [serialize_dl_pdf(pdf) for pdf in pdfs]})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/dl/download-pdf/<pdf_id>', methods=['GET'])
+def download_dl_pdf(pdf_id):
+    try:
+        pdf = dl_pdfs_collection.find_one(
+            {"_id": ObjectId(pdf_id)},
+            dict(PDF_PROJECTION, _id=0, name=1, dob=1, dlno=1)
+        )
+        pdf_data = load_pdf(pdf) if pdf else None
+        
+        if not pdf_data:
+            return jsonify({"error": "PDF not found"}), 404
+            
+        return jsonify({
+            "success": True,
+            "name": pdf.get('name'),
+            "dob": pdf.get('dob'),
+            "dlno": pdf.get('dlno'),
+            "pdfData": pdf_data
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/dl/download-pdf/<pdf_id>/file', methods=['GET'])
+def download_dl_pdf_file(pdf_id):
+    try:
+        pdf = dl_pdfs_collection.find_one({"_id": ObjectId(pdf_id)}, dict(PDF_PROJECTION, _id=0, dlno=1))
+        if not pdf:
+            return jsonify({"error": "PDF not found"}), 404
+        
+        # Blob-backed records revalidate without reading the PDF
+        if pdf.get('pdfHash'):
+            not_modified = pdf_not_modified(pdf['pdfHash'])
+            if not_modified:
+                return not_modified
+        
+        data = load_pdf_bytes(pdf)
+        if not data:
+            return jsonify({"error": "PDF not found"}), 404
+        
+        return pdf_file_response(data, pdf.get('pdfHash') or pdf_hash(data), f"{pdf.get('dlno') or pdf_id}.pdf")
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,538 @@
+"""LLR exam submission and status endpoints."""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from bson.objectid import ObjectId
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from pymongo import UpdateOne
+
+from ..config import (LLR_API_KEY, LLR_EXAM_API_URL, LLR_STATUS_API_URL, LLR_CALLBACK_URL,
+                      LLR_TERMINAL_STATUSES, LLR_STATUS_MIN_RECHECK_SECONDS, LLR_BATCH_MAX_TOKENS,
+                      LLR_BATCH_WORKERS, LLR_BULK_MAX_ROWS, LLR_BULK_WORKERS)
+from ..documents import (BLOCKED_MESSAGE, LLR_TOKEN_LIST_FIELDS, LLR_VENDOR_HEADERS,
+                         PDF_LIST_HIDDEN, build_llr_status_update, build_llr_token_doc,
+                         clean_llr_exam_input, list_projection, llr_exam_error, llr_exam_request,
+                         llr_exam_success_payload, llr_recently_checked, llr_refund_description,
+                         llr_status_changed, llr_status_payload,
+                         missing_llr_exam_fields, ndjson_line, parse_llr_bulk_csv,
+                         serialize_llr_token, service_price_for, stored_vendor_response)
+from ..extensions import (vendor, idempotency_store, in_app_context, llr_status_flights,
+                          llr_status_writes, services_collection, user_service_prices_collection,
+                          llr_tokens_collection)
+from ..helpers import (get_request_user, vendor_unavailable_response, debit_wallet, credit_wallet,
+                       pdf_file_response, pdf_not_modified)
+from ..idempotency import idempotent
+from ..metrics import metrics
+from ..pdfstore import PDF_PROJECTION, load_pdf, load_pdf_bytes, pdf_hash, release_pdf, store_pdf
+from ..settlement import refund_order_batch, reserve_order_batch, settle_order, settle_refund
+from ..summary import (apply_summary_operations, order_status_operations, record_order_created,
+                       record_order_status)
+from ..vendor import VendorUnavailable
+
+bp = Blueprint('llr', __name__)
+
+
+# LLR Service APIs
+@bp.route('/api/llr/submit-exam', methods=['POST'])
+@idempotent(idempotency_store, 'llr-submit-exam')
+def submit_llr_exam():
+    try:
+        data = request.get_json()
+        user_id = data.get('userId')
+        service_id = data.get('serviceId')
+        
+        missing_fields = missing_llr_exam_fields(data)
+        if missing_fields:
+            return jsonify({"error": f"Missing required fields: {', '.join(missing_fields)}"}), 400
+        
+        # Get user and service details
+        user = get_request_user(user_id)
+        service = services_collection.find_one({"_id": ObjectId(service_id), "deletedAt": None})
+        
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        
+        if user.get('isBlocked', False):
+            return jsonify({"error": BLOCKED_MESSAGE}), 403
+        
+        if not service:
+            return jsonify({"error": "Service not found"}), 404
+        
+        # Get user-specific price
+        user_price = user_service_prices_collection.find_one({
+            "userId": ObjectId(user_id),
+            "serviceId": ObjectId(service_id)
+        })
+        
+        service_price = service_price_for(service, user_price)
+        
+        if service_price <= 0:
+            return jsonify({"error": "Service price not set for your account. Please contact administrator."}), 400
+        
+        # Clean and format data for LLR API
+        clean = clean_llr_exam_input(data)
+        
+        # Reserve the price up front; released again unless the exam is accepted
+        new_balance = debit_wallet(ObjectId(user_id), service_price)
+        if new_balance is None:
+            return jsonify({"error": "Insufficient wallet balance"}), 400
+        settled = False
+        
+        try:
+            # Call LLR API
+            response = vendor.post(
+                'exam',
+                LLR_EXAM_API_URL,
+                data=llr_exam_request(clean, LLR_API_KEY, LLR_CALLBACK_URL),
+                headers=LLR_VENDOR_HEADERS,
+                timeout=90,
+                fair_key=user_id
+            )
+            
+            llr_response = response.json()
+            
+            if llr_response.get('status') != '200':
+                payload, status_code = llr_exam_error(llr_response)
+                return jsonify(payload), status_code
+            
+            # Store LLR token and response
+            # Store LLR token and its ledger row against the reserved funds
+            token_doc = build_llr_token_doc(user, service, service_price, llr_response, clean)
+            description = f"Payment for {service['name']} service - Application: {clean['applno']}"
+            settle_order(user, service_price, llr_tokens_collection, token_doc, description,
+                         reserved_balance=new_balance)
+            settled = True
+            
+            return jsonify(llr_exam_success_payload(llr_response, new_balance))
+                
+        except VendorUnavailable as e:
+            return vendor_unavailable_response(e)
+        except requests.exceptions.RequestException as e:
+            return jsonify({
+                "error": f"LLR API request failed: {str(e)}"
+            }), 500
+        finally:
+            if not settled:
+                credit_wallet(ObjectId(user_id), service_price)
+            
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def submit_bulk_exam_row(user, service, service_price, clean, token_id):
+    """Submit one CSV row whose price is already reserved; returns its result line."""
+    try:
+        response = vendor.post(
+            'exam',
+            LLR_EXAM_API_URL,
+            data=llr_exam_request(clean, LLR_API_KEY, LLR_CALLBACK_URL),
+            headers=LLR_VENDOR_HEADERS,
+            timeout=90,
+            fair_key=user['_id']
+        )
+        llr_response = response.json()
+    except (VendorUnavailable, requests.exceptions.RequestException, ValueError) as e:
+        return {"success": False, "error": f"LLR API request failed: {str(e)}"}
+
+    if not isinstance(llr_response, dict):
+        return {"success": False, "error": "Unexpected response from LLR API"}
+    if llr_response.get('status') != '200':
+        payload, _ = llr_exam_error(llr_response)
+        return dict(payload, success=False)
+
+    token_doc = build_llr_token_doc(user, service, service_price, llr_response, clean)
+    token_doc['_id'] = token_id
+    try:
+        llr_tokens_collection.insert_one(token_doc)
+    except Exception as e:
+        print(f"Error storing bulk LLR token {llr_response.get('token')}: {e}")
+        return {"success": False, "error": str(e)}
+    record_order_created(llr_tokens_collection.name, token_doc)
+    payload = llr_exam_success_payload(llr_response, None)
+    payload.pop('newWalletBalance')
+    return payload
+
+@bp.route('/api/llr/submit-exam/bulk', methods=['POST'])
+def submit_llr_exam_bulk():
+    """Submit an exam-day CSV (multipart ``file`` or ``csv`` field) for one retailer.
+
+    Every row is validated and the whole price reserved before anything is
+    sent.  The response is NDJSON: an ``accepted`` line, one ``row`` line
+    per applicant as the vendor answers, and a ``done`` line after failed
+    rows have been refunded.
+    """
+    try:
+        upload = request.files.get('file')
+        csv_text = upload.read().decode('utf-8-sig') if upload else request.form.get('csv', '')
+        user_id = request.form.get('userId')
+        service_id = request.form.get('serviceId')
+        
+        if not user_id or not service_id:
+            return jsonify({"error": "User ID and Service ID are required"}), 400
+        
+        rows, errors = parse_llr_bulk_csv(csv_text, LLR_BULK_MAX_ROWS)
+        if errors:
+            return jsonify({"error": "Invalid rows, nothing was submitted", "rows": errors}), 400
+        
+        user = get_request_user(user_id)
+        service = services_collection.find_one({"_id": ObjectId(service_id), "deletedAt": None})
+        
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        
+        if user.get('isBlocked', False):
+            return jsonify({"error": BLOCKED_MESSAGE}), 403
+        
+        if not service:
+            return jsonify({"error": "Service not found"}), 404
+        
+        user_price = user_service_prices_collection.find_one({
+            "userId": ObjectId(user_id),
+            "serviceId": ObjectId(service_id)
+        })
+        service_price = service_price_for(service, user_price)
+        
+        if service_price <= 0:
+            return jsonify({"error": "Service price not set for your account. Please contact administrator."}), 400
+        
+        # One debit for the whole file, with a ledger row per applicant
+        items = [
+            (ObjectId(), service_price, f"Payment for {service['name']} service - Application: {clean['applno']}")
+            for _, clean in rows
+        ]
+        new_balance = reserve_order_batch(user, items)
+        if new_balance is None:
+            return jsonify({"error": "Insufficient wallet balance"}), 400
+        metrics.inc('llr_bulk_rows', len(rows))
+        
+        def generate():
+            yield ndjson_line({"type": "accepted", "rows": len(rows),
+                               "reserved": service_price * len(rows), "newWalletBalance": new_balance})
+            pool = ThreadPoolExecutor(max_workers=min(LLR_BULK_WORKERS, len(rows)))
+            submit = in_app_context(submit_bulk_exam_row)
+
+            def work(clean, token_id):
+                try:
+                    return submit(user, service, service_price, clean, token_id)
+                except Exception as e:
+                    return {"success": False, "error": str(e)}
+
+            futures = {
+                pool.submit(work, clean, item[0]): (line, clean, item)
+                for (line, clean), item in zip(rows, items)
+            }
+            outcome = {}
+            try:
+                for future in as_completed(futures):
+                    line, clean, _ = futures[future]
+                    yield ndjson_line(dict(future.result(), type="row", row=line, applno=clean['applno']))
+            finally:
+                # Also runs when the client goes away: rows still in flight finish and
+                # every failed row is refunded
+                pool.shutdown(wait=True)
+                failed = [
+                    (item[0], item[1], llr_refund_description(clean))
+                    for future, (_, clean, item) in futures.items() if not future.result()['success']
+                ]
+                outcome['failed'] = failed
+                outcome['balance'] = refund_order_batch(user['_id'], failed) if failed else new_balance
+            yield ndjson_line({"type": "done", "submitted": len(rows) - len(outcome['failed']),
+                               "failed": len(outcome['failed']),
+                               "refunded": service_price * len(outcome['failed']),
+                               "newWalletBalance": outcome['balance']})
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def fetch_llr_status(token, user_id=None):
+    metrics.inc('llr_status_vendor_calls')
+    response = vendor.post(
+        'status',
+        LLR_STATUS_API_URL,
+        data={"token": token},
+        headers=LLR_VENDOR_HEADERS,
+        timeout=30,
+        fair_key=user_id
+    )
+    return response.json()
+
+def apply_llr_refund(token_doc, update_data):
+    """Mark a token refunded and credit its price back, at most once."""
+    return settle_refund(
+        llr_tokens_collection,
+        {"_id": token_doc['_id'], "status": {"$ne": "refunded"}},
+        {"$set": update_data},
+        token_doc['userId'], token_doc['servicePrice'],
+        llr_refund_description(token_doc), str(token_doc['_id'])
+    )
+
+def llr_status_change(token_doc, previous_status, update_data):
+    """The write for a status change other than a refund, for ``write_llr_status_changes``.
+
+    A completion moves its PDF into pdf_blobs now and applies only once.
+    """
+    selector = {"_id": token_doc['_id']}
+    pdf_fields = {}
+    if update_data.get('status') == 'completed':
+        pdf_fields = store_pdf(update_data.pop('pdfData'))
+        update_data.update(pdf_fields)
+        update_data['latestResponse'] = stored_vendor_response(update_data['latestResponse'], 'message', pdf_fields)
+        selector['status'] = {"$ne": "completed"}
+    return {"userId": token_doc['userId'], "previousStatus": previous_status,
+            "selector": selector, "update": update_data, "pdfFields": pdf_fields}
+
+def write_llr_status_changes(changes):
+    """Write token status changes in one unordered bulk write; returns how many applied."""
+    result = llr_tokens_collection.bulk_write(
+        [UpdateOne(change['selector'], {"$set": change['update']}) for change in changes],
+        ordered=False
+    )
+    applied = changes
+    if result.matched_count < len(changes):
+        # Some completion lost to another one; each write is told apart by its lastChecked
+        written = {doc['_id'] for doc in llr_tokens_collection.find(
+            {"$or": [{"_id": change['selector']['_id'], "lastChecked": change['update']['lastChecked']}
+                     for change in changes]},
+            {"_id": 1}
+        )}
+        applied = [change for change in changes if change['selector']['_id'] in written]
+        for change in changes:
+            if change['selector']['_id'] not in written:
+                release_pdf(change['pdfFields'])
+    apply_summary_operations([
+        operation
+        for change in applied
+        for operation in order_status_operations(llr_tokens_collection.name, change['userId'],
+                                                 change['previousStatus'], change['update'].get('status'))
+    ])
+    return len(applied)
+
+def llr_status_result(token_doc, status_response):
+    """Status payload; a completed token's PDF is read back from pdf_blobs when needed."""
+    payload = llr_status_payload(status_response)
+    if payload['pdfAvailable'] and not payload['message']:
+        stored = llr_tokens_collection.find_one({"_id": token_doc['_id']}, PDF_PROJECTION)
+        payload['message'] = load_pdf(stored or {})
+    return payload
+
+def stored_llr_status(token_doc):
+    """The stored vendor response if it can answer a status check, else None."""
+    if not token_doc.get('latestResponse'):
+        return None
+    # Completed and refunded tokens never change again; answer from the
+    # stored vendor response instead of calling the status API (and, for
+    # refunds, instead of crediting the wallet a second time)
+    if token_doc.get('status') in LLR_TERMINAL_STATUSES:
+        metrics.inc('llr_status_cache_hits')
+        return token_doc['latestResponse']
+    if llr_recently_checked(token_doc, LLR_STATUS_MIN_RECHECK_SECONDS):
+        metrics.inc('llr_status_recheck_skips')
+        return token_doc['latestResponse']
+    return None
+
+def refresh_llr_status(token_doc, changes=None):
+    """Fetch and store the vendor status of a pending token.
+
+    Concurrent refreshes of one token share a single vendor call and write.
+    A check that changes nothing only buffers its ``lastChecked``.  Given a
+    ``changes`` list, a change other than a refund is appended to it for the
+    caller to write with ``write_llr_status_changes``.
+    """
+    def refresh():
+        # Another request may have stored a fresh status since token_doc was read
+        current = llr_tokens_collection.find_one(
+            {"_id": token_doc['_id']},
+            {"status": 1, "queue": 1, "remarks": 1, "lastChecked": 1, "latestResponse": 1}
+        ) or {}
+        current.update(llr_status_writes.pending(token_doc['_id']))
+        stored = stored_llr_status(current)
+        if stored:
+            return stored
+        
+        status_response = fetch_llr_status(token_doc['token'], token_doc['userId'])
+        
+        # Update token document with latest status
+        update_data = build_llr_status_update(status_response)
+        if update_data.get('status') in LLR_TERMINAL_STATUSES or llr_status_changed(current, update_data):
+            llr_status_writes.discard(token_doc['_id'])
+            if update_data.get('status') == 'refunded':
+                if apply_llr_refund(token_doc, update_data) is not None:
+                    record_order_status(llr_tokens_collection.name, token_doc['userId'],
+                                        current.get('status'), 'refunded')
+            else:
+                change = llr_status_change(token_doc, current.get('status'), update_data)
+                if changes is None:
+                    write_llr_status_changes([change])
+                else:
+                    changes.append(change)
+        else:
+            llr_status_writes.set(token_doc['_id'], {"lastChecked": update_data['lastChecked']})
+        return status_response
+    
+    return llr_status_flights.do(token_doc['token'], refresh)
+
+@bp.route('/api/llr/check-status', methods=['POST'])
+def check_llr_status():
+    try:
+        data = request.get_json()
+        token = data.get('token')
+        
+        if not token:
+            return jsonify({"error": "Token is required"}), 400
+        
+        # Check token exists in our database
+        token_doc = llr_tokens_collection.find_one({"token": token}, {"pdfData": 0})
+        if not token_doc:
+            return jsonify({"error": "Invalid token"}), 404
+        
+        stored = stored_llr_status(token_doc)
+        if stored:
+            return jsonify(llr_status_result(token_doc, stored))
+        
+        try:
+            status_response = refresh_llr_status(token_doc)
+            return jsonify(llr_status_result(token_doc, status_response))
+            
+        except VendorUnavailable as e:
+            return vendor_unavailable_response(e)
+        except requests.exceptions.RequestException as e:
+            return jsonify({"error": f"Failed to connect to LLR status API: {str(e)}"}), 500
+            
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/llr/check-status/batch', methods=['POST'])
+def check_llr_status_batch():
+    try:
+        data = request.get_json()
+        tokens = data.get('tokens')
+        
+        if not isinstance(tokens, list) or not tokens or not all(isinstance(t, str) and t for t in tokens):
+            return jsonify({"error": "Tokens must be a non-empty array of strings"}), 400
+        if len(tokens) > LLR_BATCH_MAX_TOKENS:
+            return jsonify({"error": f"At most {LLR_BATCH_MAX_TOKENS} tokens can be checked at once"}), 400
+        
+        tokens = list(dict.fromkeys(tokens))
+        token_docs = {
+            doc['token']: doc
+            for doc in llr_tokens_collection.find({"token": {"$in": tokens}}, {"pdfData": 0})
+        }
+        
+        results = {}
+        to_check = []
+        for token in tokens:
+            token_doc = token_docs.get(token)
+            stored = stored_llr_status(token_doc) if token_doc else None
+            if not token_doc:
+                results[token] = {"success": False, "error": "Invalid token"}
+            elif stored:
+                results[token] = llr_status_payload(stored)
+            else:
+                to_check.append(token_doc)
+        
+        changes = []
+        if to_check:
+            with ThreadPoolExecutor(max_workers=min(LLR_BATCH_WORKERS, len(to_check))) as pool:
+                refresh = in_app_context(refresh_llr_status)
+                futures = {pool.submit(refresh, doc, changes): doc for doc in to_check}
+                for future in as_completed(futures):
+                    token_doc = futures[future]
+                    try:
+                        results[token_doc['token']] = llr_status_payload(future.result())
+                    except (VendorUnavailable, requests.exceptions.RequestException, ValueError) as e:
+                        results[token_doc['token']] = {"success": False, "error": str(e)}
+        
+        # Every change but the refunds, which were settled one by one
+        if changes:
+            try:
+                write_llr_status_changes(changes)
+            except Exception as e:
+                print(f"Error storing LLR status changes: {e}")
+        
+        # PDFs are fetched through /api/llr/download-pdf, not returned in bulk
+        for result in results.values():
+            if result.get('pdfAvailable'):
+                result.pop('message', None)
+        
+        return jsonify({
+            "success": True,
+            "results": [dict(results[token], token=token) for token in tokens]
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/llr/download-pdf', methods=['POST'])
+def download_llr_pdf():
+    try:
+        data = request.get_json()
+        token = data.get('token')
+        
+        if not token:
+            return jsonify({"error": "Token is required"}), 400
+        
+        # Get token document
+        token_doc = llr_tokens_collection.find_one({"token": token})
+        if not token_doc:
+            return jsonify({"error": "Invalid token"}), 404
+        
+        if token_doc.get('status') != 'completed':
+            return jsonify({"error": "PDF not available. Exam not completed yet."}), 400
+        
+        pdf_data = load_pdf(token_doc)
+        filename = token_doc.get('filename')
+        
+        if not pdf_data:
+            return jsonify({"error": "PDF data not available"}), 404
+        
+        return jsonify({
+            "success": True,
+            "pdfData": pdf_data,
+            "filename": filename,
+            "mimeType": "application/pdf"
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/llr/download-pdf/<token>/file', methods=['GET'])
+def download_llr_pdf_file(token):
+    try:
+        token_doc = llr_tokens_collection.find_one(
+            {"token": token},
+            dict(PDF_PROJECTION, _id=0, status=1, filename=1, applno=1)
+        )
+        if not token_doc:
+            return jsonify({"error": "Invalid token"}), 404
+        
+        if token_doc.get('status') != 'completed':
+            return jsonify({"error": "PDF not available. Exam not completed yet."}), 400
+        
+        # Blob-backed tokens revalidate without reading the PDF
+        if token_doc.get('pdfHash'):
+            not_modified = pdf_not_modified(token_doc['pdfHash'])
+            if not_modified:
+                return not_modified
+        
+        data = load_pdf_bytes(token_doc)
+        if not data:
+            return jsonify({"error": "PDF data not available"}), 404
+        
+        filename = token_doc.get('filename') or f"{token_doc.get('applno') or token}.pdf"
+        return pdf_file_response(data, token_doc.get('pdfHash') or pdf_hash(data), filename)
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/llr/user-tokens/<user_id>', methods=['GET'])
+def get_user_llr_tokens(user_id):
+    try:
+        tokens = list(llr_tokens_collection.find(
+            {"userId": ObjectId(user_id)},
+            list_projection(LLR_TOKEN_LIST_FIELDS, request.args.get('fields'), PDF_LIST_HIDDEN)
+        ).sort("createdAt", -1))
+        return jsonify({"tokens": [serialize_llr_token(token) for token in tokens]})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,196 @@
+"""Payment gateway endpoints."""
+import uuid
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from flask import Blueprint, current_app, jsonify, request
+
+from ..extensions import users_collection, payments_collection
+from ..helpers import vendor_unavailable_response, add_payment_history
+from ..reconcile import PAYMENT_SUCCESS_STATUS, check_payment_status, settle_payment
+from ..vendor import VendorUnavailable
+
+bp = Blueprint('payment', __name__)
+
+
+# Payment Gateway Endpoints
+@bp.route('/api/payment/create-order', methods=['POST', 'OPTIONS'])
+def create_payment_order():
+    if request.method == 'OPTIONS':
+        # Handle preflight request
+        response = jsonify({'status': 'preflight'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        return response
+
+    try:
+        # Validate request
+        if not request.is_json:
+            return jsonify({"error": "Request must be JSON"}), 400
+
+        data = request.get_json()
+        
+        # Validate required fields
+        required_fields = ['userId', 'amount']
+        missing_fields = [field for field in required_fields if field not in data]
+        if missing_fields:
+            return jsonify({
+                "error": f"Missing required fields: {', '.join(missing_fields)}",
+                "required_fields": required_fields
+            }), 400
+
+        # Validate amount
+        try:
+            amount = float(data['amount'])
+            if amount < 200:
+                return jsonify({
+                    "error": "Minimum amount is ₹200",
+                    "minimum_amount": 200
+                }), 400
+        except ValueError:
+            return jsonify({
+                "error": "Invalid amount value",
+                "details": "Amount must be a valid number"
+            }), 400
+
+        # Validate user exists and is not blocked
+        try:
+            user_id = ObjectId(data['userId'])
+        except:
+            return jsonify({"error": "Invalid user ID format"}), 400
+
+        user = users_collection.find_one({"_id": user_id})
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        if user.get('isBlocked', False):
+            return jsonify({"error": "Account blocked"}), 403
+
+        # Generate transaction details
+        transaction_id = f"TXN{str(uuid.uuid4().hex)[:16].upper()}"
+        upi_id = "payment@jkdigitalcenter.in"
+        qr_code_url = f"https://api.qrserver.com/v1/create-qr-code/?size=200x200&data=upi://pay?pa={upi_id}&pn=JK%20Digital%20Center&am={amount}&cu=INR"
+        payment_link = f"https://api.jkdigitalcenter.in/payment?token={transaction_id}"
+        
+        # Create payment record
+        payment_record = {
+            "userId": user_id,
+            "userName": user.get('name'),
+            "userMobile": user.get('mobile'),
+            "amount": amount,
+            "transactionId": transaction_id,
+            "status": "pending",
+            "qrCodeUrl": qr_code_url,
+            "upiId": upi_id,
+            "paymentLink": payment_link,
+            "createdAt": datetime.utcnow(),
+            "updatedAt": datetime.utcnow()
+        }
+        
+        # Insert into database with error handling
+        try:
+            result = payments_collection.insert_one(payment_record)
+            if not result.inserted_id:
+                raise Exception("Failed to create payment record")
+        except Exception as e:
+            current_app.logger.error(f"Database insertion failed: {str(e)}")
+            return jsonify({
+                "error": "Payment processing failed",
+                "details": "Could not save payment record"
+            }), 500
+
+        # Add to payment history
+        try:
+            add_payment_history(
+                user_id=str(user_id),
+                transaction_type="pending_credit",
+                amount=amount,
+                description=f"Payment initiated - {transaction_id}",
+                reference_id=transaction_id
+            )
+        except Exception as e:
+            current_app.logger.error(f"Payment history recording failed: {str(e)}")
+            # Continue even if history fails - main payment succeeded
+
+        # Prepare success response
+        response_data = {
+            "status": "success",
+            "message": "Payment order created successfully",
+            "data": {
+                "transactionId": transaction_id,
+                "amount": amount,
+                "qrCodeUrl": qr_code_url,
+                "upiId": upi_id,
+                "paymentLink": payment_link,
+                "user": {
+                    "id": str(user_id),
+                    "name": user.get('name'),
+                    "mobile": user.get('mobile'),
+                    "walletBalance": user.get('walletBalance', 0)
+                }
+            }
+        }
+
+        response = jsonify(response_data)
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response
+
+    except ValueError as e:
+        return jsonify({
+            "error": "Invalid input data",
+            "details": str(e)
+        }), 400
+    except Exception as e:
+        current_app.logger.error(f"Unexpected error in payment creation: {str(e)}")
+        return jsonify({
+            "error": "Internal server error",
+            "details": "Please try again later"
+        }), 500
+
+@bp.route('/api/payment/gateway-history', methods=['GET'])
+def get_payment_gateway_history():
+    try:
+        user_id = request.args.get('userId')
+        if not user_id:
+            return jsonify({"error": "User ID is required"}), 400
+        
+        payments = list(payments_collection.find(
+            {"userId": ObjectId(user_id)},
+            sort=[("createdAt", -1)],
+            limit=10
+        ))
+        
+        # Convert ObjectId and datetime to strings
+        for payment in payments:
+            payment['_id'] = str(payment['_id'])
+            payment['userId'] = str(payment['userId'])
+            payment['createdAt'] = payment['createdAt'].isoformat()
+            if 'updatedAt' in payment:
+                payment['updatedAt'] = payment['updatedAt'].isoformat()
+        
+        return jsonify({"history": payments})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/payment/callback', methods=['POST'])
+def payment_callback():
+    try:
+        txnid = request.args.get('token')
+        if not txnid:
+            return jsonify({"error": "Token is required"}), 400
+        
+        # Verify the transaction with payment gateway, in the payer's fair queue
+        payment = payments_collection.find_one({"transactionId": txnid}, {"userId": 1})
+        response_data = check_payment_status(txnid, payment['userId'] if payment else None)
+        
+        if response_data.get('status') == PAYMENT_SUCCESS_STATUS:
+            # Only the first settlement (callback or reconciler) credits the wallet
+            settle_payment(txnid, 'success', response_data)
+        
+        return jsonify({"status": "ok"})
+        
+    except VendorUnavailable as e:
+        return vendor_unavailable_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,255 @@
+"""Retailer endpoints: login, profile, services, service requests and history."""
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from flask import Blueprint, jsonify, request
+
+from ..auth import issue_user_token
+from ..documents import BLOCKED_MESSAGE, SERVICE_REQUEST_LIST_FIELDS, list_projection, user_payload
+from ..extensions import (idempotency_store, users_collection, services_collection,
+                          service_requests_collection, user_service_prices_collection)
+from ..helpers import get_request_user
+from ..idempotency import idempotent
+from ..ledger import read_user_history
+from ..settlement import settle_order
+from ..summary import get_user_summary, record_request_created
+
+bp = Blueprint('user', __name__)
+
+
+# Service Request APIs
+@bp.route('/api/user/services/<user_id>', methods=['GET'])
+def get_user_services(user_id):
+    try:
+        # Check if user is blocked
+        user = get_request_user(user_id)
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        
+        if user.get('isBlocked', False):
+            return jsonify({"error": "Your account has been blocked. Please contact administrator."}), 403
+        
+        # Get active services
+        services = list(services_collection.find({"isActive": True, "deletedAt": None}))
+        
+        # Get user-specific prices
+        user_prices = list(user_service_prices_collection.find({"userId": ObjectId(user_id)}))
+        price_map = {str(price['serviceId']): price['price'] for price in user_prices}
+        
+        for service in services:
+            service['_id'] = str(service['_id'])
+            # Set user-specific price or default to service default price
+            service['userPrice'] = price_map.get(service['_id'], service.get('defaultPrice', 0))
+        
+        return jsonify({"services": services})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/user/service-request', methods=['POST'])
+@idempotent(idempotency_store, 'service-request')
+def submit_service_request():
+    try:
+        data = request.get_json()
+        user_id = data.get('userId')
+        service_id = data.get('serviceId')
+        field_data = data.get('fieldData', {})
+        
+        if not user_id or not service_id:
+            return jsonify({"error": "User ID and Service ID are required"}), 400
+        
+        # Get user and service details
+        user = get_request_user(user_id)
+        service = services_collection.find_one({"_id": ObjectId(service_id), "deletedAt": None})
+        
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        
+        if user.get('isBlocked', False):
+            return jsonify({"error": "Your account has been blocked. Please contact administrator."}), 403
+        
+        if not service:
+            return jsonify({"error": "Service not found"}), 404
+        
+        if not service.get('isActive', False):
+            return jsonify({"error": "This service is currently unavailable"}), 400
+        
+        # Get user-specific price
+        user_price = user_service_prices_collection.find_one({
+            "userId": ObjectId(user_id),
+            "serviceId": ObjectId(service_id)
+        })
+        
+        service_price = user_price['price'] if user_price else service.get('defaultPrice', 0)
+        
+        if service_price <= 0:
+            return jsonify({"error": "Service price not set for your account. Please contact administrator."}), 400
+        
+        # Create service request
+        request_doc = {
+            "userId": ObjectId(user_id),
+            "userName": user['name'],
+            "userMobile": user['mobile'],
+            "serviceId": ObjectId(service_id),
+            "serviceName": service['name'],
+            "servicePrice": service_price,
+            "fieldData": field_data,
+            "status": "pending",
+            "adminMessage": "",
+            "createdAt": datetime.utcnow(),
+            "updatedAt": datetime.utcnow()
+        }
+        
+        # Debit, request and ledger row are written together
+        description = f"Payment for {service['name']} service"
+        settled = settle_order(user, service_price, service_requests_collection, request_doc, description)
+        if settled is None:
+            return jsonify({"error": "Insufficient wallet balance"}), 400
+        request_id, new_balance = settled
+        record_request_created(request_doc)
+        
+        return jsonify({
+            "success": True,
+            "message": "Service request submitted successfully",
+            "requestId": str(request_id),
+            "newWalletBalance": new_balance
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route('/api/user/service-requests/<user_id>', methods=['GET'])
+def get_user_requests(user_id):
+    try:
+        projection = list_projection(SERVICE_REQUEST_LIST_FIELDS, request.args.get('fields'))
+        requests = list(service_requests_collection.find(
+            {"userId": ObjectId(user_id)}, projection
+        ).sort("createdAt", -1))
+        for req in requests:
+            req['_id'] = str(req['_id'])
+            req['userId'] = str(req['userId'])
+            req['serviceId'] = str(req['serviceId'])
+        
+        return jsonify({"requests": requests})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/user/summary/<user_id>', methods=['GET'])
+def get_user_dashboard_summary(user_id):
+    try:
+        user = users_collection.find_one({"_id": ObjectId(user_id)})
+        
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        
+        if user.get('isBlocked', False):
+            return jsonify({"error": BLOCKED_MESSAGE}), 403
+        
+        summary = get_user_summary(user['_id'])
+        
+        return jsonify({
+            "success": True,
+            "token": issue_user_token(user),
+            "user": user_payload(user),
+            "requestCounts": summary.get('requestCounts', {}),
+            "transactionCounts": summary.get('transactionCounts', {}),
+            "llrTokenCounts": summary.get('llrTokenCounts', {}),
+            "dlPdfCounts": summary.get('dlPdfCounts', {}),
+            "recentRequests": summary.get('recentRequests', []),
+            "recentTransactions": summary.get('recentTransactions', [])
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Payment History APIs
+@bp.route('/api/user/payment-history/<user_id>', methods=['GET'])
+def get_user_payment_history(user_id):
+    try:
+        # Get payment history for the user, whichever format it is stored in
+        history = read_user_history(ObjectId(user_id))
+        
+        for entry in history:
+            entry['_id'] = str(entry['_id'])
+            entry['userId'] = str(entry['userId'])
+            if entry.get('referenceId'):
+                entry['referenceId'] = str(entry['referenceId'])
+        
+        return jsonify({"history": history})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/auth/login', methods=['POST'])
+def login():
+    try:
+        data = request.get_json()
+        mobile = data.get('mobile')
+        password = data.get('password')
+        
+        if not mobile or not password:
+            return jsonify({"error": "Mobile number and password are required"}), 400
+        
+        user = users_collection.find_one({
+            "mobile": mobile,
+            "password": password
+        })
+        
+        if not user:
+            return jsonify({"error": "Invalid credentials"}), 401
+        
+        if user.get('isBlocked', False):
+            return jsonify({"error": BLOCKED_MESSAGE}), 403
+        
+        return jsonify({
+            "success": True,
+            "token": issue_user_token(user),
+            "user": user_payload(user)
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/user/profile/<user_id>', methods=['GET'])
+def get_user_profile(user_id):
+    try:
+        user = users_collection.find_one({"_id": ObjectId(user_id)})
+        
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        
+        return jsonify({
+            "user": {
+                "id": str(user['_id']),
+                "name": user['name'],
+                "mobile": user['mobile'],
+                "walletBalance": user.get('walletBalance', 0.0),
+                "isBlocked": user.get('isBlocked', False)
+            }
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# NEW API: Refresh user data endpoint
+@bp.route('/api/user/refresh/<user_id>', methods=['GET'])
+def refresh_user_data(user_id):
+    try:
+        user = users_collection.find_one({"_id": ObjectId(user_id)})
+        
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        
+        if user.get('isBlocked', False):
+            return jsonify({"error": BLOCKED_MESSAGE}), 403
+        
+        return jsonify({
+            "success": True,
+            "token": issue_user_token(user),
+            "user": user_payload(user)
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,60 @@
+"""One-off database bootstrap: indexes and the default admin.
+
+Run through ``flask --app app init-db`` once per deploy rather than in every
+worker at start-up.
+"""
+from datetime import datetime
+
+from .extensions import (admins_collection, dl_pdfs_collection, idempotency_store,
+                         ledger_buckets_collection, llr_tokens_collection, payment_history_collection,
+                         payments_collection, pdf_blobs_collection, service_requests_collection,
+                         user_service_prices_collection, users_collection, wallet_audits_collection,
+                         wallet_discrepancies_collection)
+
+
+# Initialize collections
+def initialize_collections():
+    dl_pdfs_collection.create_index([("userId", 1)])
+    dl_pdfs_collection.create_index([("dlno", 1)])
+    dl_pdfs_collection.create_index([("createdAt", -1)])
+    users_collection.create_index([("isBlocked", 1)])
+    # Status checks and downloads find tokens by value; admin search by mobile and
+    # application number prefix
+    users_collection.create_index([("mobile", 1)])
+    llr_tokens_collection.create_index([("token", 1)])
+    llr_tokens_collection.create_index([("applno", 1)])
+    idempotency_store.ensure_indexes()
+    # Only pending requests are indexed, so the queue stays small however long the history grows
+    service_requests_collection.create_index(
+        [("status", 1), ("createdAt", 1)],
+        name="pending_queue",
+        partialFilterExpression={"status": "pending"}
+    )
+    # Gateway callbacks look payments up by transaction; the reconciler scans pending ones by age
+    payments_collection.create_index([("transactionId", 1)])
+    payments_collection.create_index([("status", 1), ("createdAt", 1)])
+    payment_history_collection.create_index([("userId", 1), ("createdAt", -1)])
+    ledger_buckets_collection.create_index([("u", 1), ("m", -1)])
+    # Garbage collection looks for unreferenced blobs
+    pdf_blobs_collection.create_index([("refCount", 1), ("updatedAt", 1)])
+    # Service deletion removes prices by service in batches
+    user_service_prices_collection.create_index([("serviceId", 1)])
+    wallet_audits_collection.create_index([("finishedAt", -1)])
+    wallet_discrepancies_collection.create_index([("runId", 1)])
+
+
+# Create default admin if not exists
+def create_default_admin():
+    try:
+        admin_exists = admins_collection.find_one({"username": "admin"})
+        if not admin_exists:
+            admin_doc = {
+                "username": "admin",
+                "password": "admin123",
+                "createdAt": datetime.utcnow()
+            }
+            admins_collection.insert_one(admin_doc)
+            print("Default admin created - Username: admin, Password: admin123")
+    except Exception as e:
+        print(f"Error creating default admin: {e}")
+
@@ -0,0 +1,101 @@
+"""Flask CLI commands (``flask --app app <command>``)."""
+import time
+
+import click
+
+from .audit import audit_wallets
+from .bootstrap import create_default_admin, initialize_collections
+from .config import (PAYMENT_RECONCILE_INTERVAL_SECONDS, PDF_BLOB_GRACE_SECONDS, SERVICE_PURGE_INTERVAL_SECONDS,
+                     SERVICE_PURGE_STALE_SECONDS, WALLET_AUDIT_CHUNK_USERS, WALLET_AUDIT_WORKERS)
+from .extensions import client
+from .ledger import migrate_legacy_ledger
+from .pdfstore import collect_garbage, dedupe_pdfs, storage_report
+from .purge import run_service_purges
+from .reconcile import reconcile_pending_payments
+
+
+def register_commands(app):
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create indexes and the default admin; run once per deploy, not per worker."""
+        client.admin.command('ping')
+        initialize_collections()
+        create_default_admin()
+        print("Database initialized")
+
+    @app.cli.command('reconcile-payments')
+    @click.option('--once', is_flag=True, help='Run a single pass and exit.')
+    @click.option('--interval', default=PAYMENT_RECONCILE_INTERVAL_SECONDS, show_default=True,
+                  help='Seconds between passes.')
+    def reconcile_payments_command(once, interval):
+        """Settle pending gateway payments whose callback never arrived."""
+        while True:
+            try:
+                summary = reconcile_pending_payments()
+                print(f"Payment reconciliation: {summary}")
+            except Exception as e:
+                print(f"Payment reconciliation failed: {e}")
+            if once:
+                break
+            time.sleep(interval)
+
+    @app.cli.command('migrate-ledger')
+    @click.option('--batch-size', default=1000, show_default=True)
+    def migrate_ledger_command(batch_size):
+        """Move payment_history rows into the compact ledger_buckets format."""
+        moved = migrate_legacy_ledger(batch_size)
+        print(f"Moved {moved} ledger entries into ledger_buckets")
+
+    @app.cli.command('audit-wallets')
+    @click.option('--full', is_flag=True, help='Re-sum every ledger instead of continuing from the last run.')
+    @click.option('--chunk-size', default=WALLET_AUDIT_CHUNK_USERS, show_default=True,
+                  help='Users per userId range.')
+    @click.option('--workers', default=WALLET_AUDIT_WORKERS, show_default=True)
+    def audit_wallets_command(full, chunk_size, workers):
+        """Compare users.walletBalance with the ledger and record discrepancies."""
+        summary = audit_wallets(full, chunk_size, workers)
+        print(f"Wallet audit ({summary['mode']}): {summary['usersChecked']} users in {summary['seconds']}s, "
+              f"{summary['discrepancies']} discrepancies totalling {summary['totalDifference']}")
+
+    @app.cli.command('purge-services')
+    @click.option('--once', is_flag=True, help='Run a single pass and exit.')
+    @click.option('--interval', default=SERVICE_PURGE_INTERVAL_SECONDS, show_default=True,
+                  help='Seconds between passes.')
+    @click.option('--stale', default=SERVICE_PURGE_STALE_SECONDS, show_default=True,
+                  help='Take over purges that made no progress for this many seconds.')
+    def purge_services_command(once, interval, stale):
+        """Remove the prices of deleted services, batch by batch."""
+        while True:
+            try:
+                purged = run_service_purges(stale)
+                for service_id, removed in purged.items():
+                    print(f"Service {service_id}: removed {removed} prices")
+            except Exception as e:
+                print(f"Service purge failed: {e}")
+            if once:
+                break
+            time.sleep(interval)
+
+    @app.cli.command('dedupe-pdfs')
+    @click.option('--batch-size', default=500, show_default=True)
+    def dedupe_pdfs_command(batch_size):
+        """Move inline PDFs of dl_pdfs and llr_tokens into content-addressed pdf_blobs."""
+        report = dedupe_pdfs(batch_size)
+        print(f"Moved {report['records']} PDFs into {report['blobsCreated']} new blobs "
+              f"({report['skipped']} not valid base64, left inline)")
+        print(f"Inline base64 removed: {report['inlineBytesRemoved'] / 2**20:.1f} MB, "
+              f"blob bytes added: {report['blobBytesAdded'] / 2**20:.1f} MB, "
+              f"reclaimed: {report['bytesReclaimed'] / 2**20:.1f} MB")
+        print(f"PDF storage: {storage_report()}")
+
+    @app.cli.command('gc-pdfs')
+    @click.option('--grace', default=PDF_BLOB_GRACE_SECONDS, show_default=True,
+                  help='Leave blobs touched within this many seconds alone.')
+    @click.option('--recount', is_flag=True, help='Recompute reference counts from the records first.')
+    def gc_pdfs_command(grace, recount):
+        """Delete PDF blobs that no DL PDF or LLR token refers to."""
+        report = collect_garbage(grace, recount)
+        print(f"Fixed {report['referencesFixed']} reference counts, removed {report['blobsRemoved']} blobs, "
+              f"reclaimed {report['bytesReclaimed'] / 2**20:.1f} MB")
+        print(f"PDF storage: {storage_report()}")
@@ -0,0 +1,71 @@
+"""Negotiated response compression.
+
+JSON (and other text) responses of at least ``COMPRESS_MIN_BYTES`` are
+encoded with brotli or gzip, whichever the client prefers through
+``Accept-Encoding``.  Brotli is used only when the optional ``Brotli``
+package is installed.  Base64 PDFs inside JSON shrink by roughly a quarter,
+document lists by far more.
+"""
+import gzip
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+from .config import COMPRESS_MIN_BYTES, COMPRESS_GZIP_LEVEL, COMPRESS_BROTLI_QUALITY
+from .metrics import metrics
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/plain', 'text/csv', 'text/html')
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encodings):
+    """Best encoding the client accepts (a werkzeug ``Accept``), or None."""
+    accepted = [encoding for encoding in available_encodings() if accept_encodings.quality(encoding) > 0]
+    # max() keeps the first of equal qualities, so brotli wins ties
+    return max(accepted, key=accept_encodings.quality, default=None)
+
+
+def compress_body(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL)
+
+
+def is_compressible(response):
+    return (COMPRESS_MIN_BYTES > 0
+            and response.mimetype in COMPRESSIBLE_MIMETYPES
+            and 'Content-Encoding' not in response.headers)
+
+
+def should_compress(response):
+    return (200 <= response.status_code < 300 and response.status_code not in (204, 206)
+            and (response.content_length or 0) >= COMPRESS_MIN_BYTES)
+
+
+def encode_response(response, data, encoding):
+    compressed = compress_body(data, encoding)
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    metrics.inc('response_bytes_uncompressed', len(data))
+    metrics.inc('response_bytes_sent', len(compressed), encoding=encoding)
+    return response
+
+
+def compress_response(response):
+    """``after_request`` hook for the Flask app."""
+    from flask import request
+
+    if not is_compressible(response) or response.direct_passthrough or response.is_streamed:
+        return response
+    response.vary.add('Accept-Encoding')
+    if not should_compress(response):
+        return response
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    return encode_response(response, response.get_data(), encoding)
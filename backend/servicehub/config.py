@@ -0,0 +1,96 @@
+"""Environment-driven settings for the Service Hub API."""
+import os
+
+from .vendor import VENDOR_BASE_URL
+
+# MongoDB connection
+MONGO_URI = os.getenv('MONGO_URI')
+MONGO_DB_NAME = os.getenv('MONGO_DB_NAME', 'servicehub')
+# One pooled connection per request thread; see gunicorn.conf.py
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', os.getenv('GUNICORN_THREADS', 16)))
+# The async stack (servicehub.aio) multiplexes all requests of a process onto one pool
+ASYNC_MONGO_MAX_POOL_SIZE = int(os.getenv('ASYNC_MONGO_MAX_POOL_SIZE', 100))
+
+# API Configurations
+LLR_API_KEY = os.getenv('LLR_API_KEY')
+LLR_EXAM_API_URL = f"{VENDOR_BASE_URL}/api/v2/llexam/doexam.php"
+LLR_STATUS_API_URL = f"{VENDOR_BASE_URL}/api/v2/llexam/checkexam.php"
+LLR_CALLBACK_URL = os.getenv('LLR_CALLBACK_URL', 'http://localhost:5000/api/llr/callback')
+
+DL_PDF_API_URL = f"{VENDOR_BASE_URL}/api/v2/dlpdfapi.php"
+PG_ORDER_STATUS_API_URL = f"{VENDOR_BASE_URL}/api/v2/pg/orders/pg-order-status.php"
+DL_API_KEY = os.getenv('LLR_API_KEY')  # Using same API key as LLR
+
+# Reuse a recent successful DL PDF for the same (dlno, type, blood, addrtype)
+# instead of calling the vendor again. 0 disables the cache.
+DL_CACHE_TTL_SECONDS = int(os.getenv('DL_CACHE_TTL_SECONDS', 0))
+# "full" charges the user's service price on a cache hit, "free" does not
+DL_CACHE_CHARGE_POLICY = os.getenv('DL_CACHE_CHARGE_POLICY', 'full')
+# Bulk generation (/api/dl/generate-pdf/bulk)
+DL_BULK_MAX_ITEMS = int(os.getenv('DL_BULK_MAX_ITEMS', 50))
+DL_BULK_WORKERS = int(os.getenv('DL_BULK_WORKERS', 4))
+
+# Write an order's debit, record and ledger row in one transaction: "auto" uses
+# transactions when the deployment supports them (replica set / mongos), "off" never
+SETTLEMENT_TRANSACTIONS = os.getenv('SETTLEMENT_TRANSACTIONS', 'auto')
+
+# Ledger storage: "compact" appends entries to per-user monthly buckets in
+# ledger_buckets, "legacy" keeps writing one payment_history row per entry.
+# Reads merge both, so rows written before the switch keep showing up.
+LEDGER_FORMAT = os.getenv('LEDGER_FORMAT', 'compact')
+LEDGER_BUCKET_MAX_ENTRIES = int(os.getenv('LEDGER_BUCKET_MAX_ENTRIES', 200))
+
+# Responses of a compressible type at least this large are gzip/brotli encoded
+# when the client accepts it (brotli needs the optional Brotli package). 0 disables.
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 5))
+
+# How many recent requests and transactions the user_summaries document keeps
+USER_SUMMARY_RECENT = int(os.getenv('USER_SUMMARY_RECENT', 10))
+
+# PDFs are stored once in pdf_blobs; unreferenced blobs are only garbage
+# collected (flask --app app gc-pdfs) once untouched for this long
+PDF_BLOB_GRACE_SECONDS = int(os.getenv('PDF_BLOB_GRACE_SECONDS', 3600))
+
+# Payment reconciliation (flask --app app reconcile-payments)
+# Pending payments younger than this are left to the gateway callback
+PAYMENT_RECONCILE_MIN_AGE_SECONDS = int(os.getenv('PAYMENT_RECONCILE_MIN_AGE_SECONDS', 120))
+PAYMENT_RECONCILE_BATCH_SIZE = int(os.getenv('PAYMENT_RECONCILE_BATCH_SIZE', 100))
+PAYMENT_RECONCILE_WORKERS = int(os.getenv('PAYMENT_RECONCILE_WORKERS', 4))
+PAYMENT_RECONCILE_INTERVAL_SECONDS = int(os.getenv('PAYMENT_RECONCILE_INTERVAL_SECONDS', 60))
+# Wallet vs. ledger audit (flask --app app audit-wallets)
+WALLET_AUDIT_CHUNK_USERS = int(os.getenv('WALLET_AUDIT_CHUNK_USERS', 1000))
+WALLET_AUDIT_WORKERS = int(os.getenv('WALLET_AUDIT_WORKERS', 4))
+# Entries newer than this are re-read on every run instead of being checkpointed,
+# so a settlement still committing when the audit starts is not missed
+WALLET_AUDIT_LAG_SECONDS = int(os.getenv('WALLET_AUDIT_LAG_SECONDS', 300))
+# Orders the gateway still does not report as paid after this long are marked expired
+PAYMENT_PENDING_EXPIRY_SECONDS = int(os.getenv('PAYMENT_PENDING_EXPIRY_SECONDS', 86400))
+
+LLR_TERMINAL_STATUSES = ('completed', 'refunded')
+# A pending token checked this recently is answered from its stored response
+LLR_STATUS_MIN_RECHECK_SECONDS = int(os.getenv('LLR_STATUS_MIN_RECHECK_SECONDS', 10))
+# Bookkeeping-only writes (an unchanged status check's lastChecked) are buffered
+# and written in one bulk_write this often, or once this many tokens are waiting
+WRITE_BEHIND_INTERVAL_SECONDS = float(os.getenv('WRITE_BEHIND_INTERVAL_SECONDS', 2))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv('WRITE_BEHIND_MAX_PENDING', 500))
+LLR_BATCH_MAX_TOKENS = int(os.getenv('LLR_BATCH_MAX_TOKENS', 50))
+LLR_BATCH_WORKERS = int(os.getenv('LLR_BATCH_WORKERS', 8))
+# Bulk exam submission (/api/llr/submit-exam/bulk)
+LLR_BULK_MAX_ROWS = int(os.getenv('LLR_BULK_MAX_ROWS', 200))
+LLR_BULK_WORKERS = int(os.getenv('LLR_BULK_WORKERS', 4))
+ADMIN_BATCH_MAX_ITEMS = int(os.getenv('ADMIN_BATCH_MAX_ITEMS', 1000))
+
+# How long an admin keeps a claimed service request before others may take it
+REQUEST_CLAIM_LEASE_SECONDS = int(os.getenv('REQUEST_CLAIM_LEASE_SECONDS', 900))
+REQUEST_QUEUE_PAGE_SIZE = 50
+# Deleting a service removes its per-user prices in the background, this many at a time
+SERVICE_PURGE_BATCH_SIZE = int(os.getenv('SERVICE_PURGE_BATCH_SIZE', 500))
+SERVICE_PURGE_PAUSE_SECONDS = float(os.getenv('SERVICE_PURGE_PAUSE_SECONDS', 0.2))
+SERVICE_PURGE_INTERVAL_SECONDS = int(os.getenv('SERVICE_PURGE_INTERVAL_SECONDS', 30))
+# purge-services takes over purges that made no progress for this long
+SERVICE_PURGE_STALE_SECONDS = int(os.getenv('SERVICE_PURGE_STALE_SECONDS', 300))
+# /api/admin/search returns at most this many hits per collection
+ADMIN_SEARCH_LIMIT = int(os.getenv('ADMIN_SEARCH_LIMIT', 20))
+ADMIN_SEARCH_MIN_LENGTH = 3
@@ -0,0 +1,391 @@
+"""Documents and JSON payloads shared by the Flask and the async stacks.
+
+Both stacks validate input, store records and shape responses through these
+functions so that they keep serving the same API contract.  Nothing here
+does I/O.
+"""
+import csv
+import io
+import json
+import re
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+
+LLR_VENDOR_HEADERS = {
+    'Content-Type': 'application/x-www-form-urlencoded',
+    'User-Agent': 'ServiceHub-LLR/1.0'
+}
+DL_VENDOR_HEADERS = {
+    'Content-Type': 'application/x-www-form-urlencoded',
+    'User-Agent': 'ServiceHub-DL/1.0'
+}
+
+BLOCKED_MESSAGE = "Your account has been blocked. Please contact administrator."
+
+# List endpoints return these fields unless ?fields= asks for more
+# (comma separated, or "*" for the whole document minus the hidden fields)
+USER_LIST_FIELDS = ('name', 'mobile', 'walletBalance', 'isBlocked')
+USER_LIST_HIDDEN = ('password',)
+SERVICE_REQUEST_LIST_FIELDS = ('userId', 'serviceId', 'userName', 'userMobile', 'serviceName',
+                               'servicePrice', 'fieldData', 'status', 'adminMessage', 'createdAt')
+LLR_TOKEN_LIST_FIELDS = ('userId', 'serviceId', 'token', 'applno', 'applname', 'serviceName',
+                         'servicePrice', 'status', 'queue', 'rtoname', 'remarks', 'createdAt',
+                         'completedAt', 'filename', 'refundReason')
+DL_PDF_LIST_FIELDS = ('userId', 'serviceId', 'serviceName', 'servicePrice', 'dlno', 'pdfType',
+                      'name', 'dob', 'status', 'createdAt')
+# PDFs are only served by the download endpoints
+PDF_LIST_HIDDEN = ('pdfData',)
+
+
+def list_projection(default_fields, requested=None, hidden=()):
+    """MongoDB projection for a list endpoint from its ``?fields=`` value."""
+    requested = [name.strip() for name in (requested or '').split(',') if name.strip()]
+    if '*' in requested:
+        return {name: 0 for name in hidden} or None
+    fields = list(default_fields)
+    for name in requested:
+        if name not in fields and not name.startswith('$') and name.split('.')[0] not in hidden:
+            fields.append(name)
+    return {name: 1 for name in fields}
+
+
+# Admin search: what a query looks like decides where it is looked up
+SEARCH_OBJECT_ID = re.compile(r'^[0-9a-fA-F]{24}$')
+SEARCH_MOBILE = re.compile(r'^(?:\+91)?(\d{1,10})$')
+SEARCH_DIGITS = re.compile(r'^\d+$')
+SEARCH_DLNO = re.compile(r'^[A-Z]{2}\d{2}')
+
+
+def prefix_filter(prefix):
+    # Anchored and case-sensitive, so MongoDB walks the index instead of scanning
+    return {"$regex": "^" + re.escape(prefix)}
+
+
+def admin_search_plan(query):
+    """``[(kind, collection name, filter)]`` for an admin search box query.
+
+    ObjectIds are looked up by ``_id`` everywhere; digits are a mobile and
+    an application number prefix; ``AA00...`` is a DL number prefix; anything
+    else an application number prefix or an exact LLR token.
+    """
+    compact = re.sub(r'[\s-]', '', query)
+    if SEARCH_OBJECT_ID.match(compact):
+        oid = ObjectId(compact)
+        return [('id', name, {"_id": oid}) for name in ('users', 'service_requests', 'llr_tokens', 'dl_pdfs')]
+    plan = []
+    mobile = SEARCH_MOBILE.match(compact)
+    if mobile:
+        plan.append(('mobile', 'users', {"mobile": prefix_filter(mobile.group(1))}))
+    if SEARCH_DIGITS.match(compact):
+        plan.append(('applno', 'llr_tokens', {"applno": prefix_filter(compact)}))
+        return plan
+    if mobile:
+        return plan
+    upper = query.strip().upper()
+    if SEARCH_DLNO.match(upper):
+        plan.append(('dlno', 'dl_pdfs', {"dlno": prefix_filter(upper)}))
+    plan.append(('applno', 'llr_tokens', {"applno": prefix_filter(upper)}))
+    plan.append(('token', 'llr_tokens', {"token": query.strip()}))
+    return plan
+
+
+def user_payload(user):
+    return {
+        "id": str(user['_id']),
+        "name": user['name'],
+        "mobile": user['mobile'],
+        "walletBalance": user.get('walletBalance', 0.0),
+        "isBlocked": user.get('isBlocked', False)
+    }
+
+
+def service_price_for(service, user_price):
+    return user_price['price'] if user_price else service.get('defaultPrice', 0)
+
+
+# LLR exam
+def missing_llr_exam_fields(data):
+    required = [('userId', data.get('userId')), ('serviceId', data.get('serviceId')),
+                ('applno', data.get('applno')), ('dob', data.get('dob')), ('pass', data.get('pass'))]
+    return [name for name, value in required if not value]
+
+
+def clean_llr_exam_input(data):
+    """Clean and format the exam form the way the LLR API expects it."""
+    pin = data.get('pin', '')
+    return {
+        "applno": data['applno'].strip().upper(),
+        "dob": data['dob'].strip(),
+        "pass": data['pass'].strip().upper(),
+        "pin": pin.strip() if pin else "",
+        "type": data.get('type', 'day').strip().lower()
+    }
+
+
+LLR_BULK_COLUMNS = ('applno', 'dob', 'pass', 'pin', 'type')
+
+
+def parse_llr_bulk_csv(text, max_rows):
+    """Parse an exam-day CSV into ``(rows, errors)``.
+
+    Columns are ``applno, dob, pass, pin, type``, optionally under a header
+    row naming them in any order.  ``rows`` holds ``(line, clean)`` pairs;
+    ``errors`` one ``{"row", "error"}`` per bad line.  Nothing should be
+    submitted unless ``errors`` is empty.
+    """
+    reader = csv.reader(io.StringIO(text))
+    columns = LLR_BULK_COLUMNS
+    rows, errors, seen = [], [], set()
+    for line in reader:
+        cells = [cell.strip() for cell in line]
+        if not any(cells):
+            continue
+        if not rows and not errors and columns is LLR_BULK_COLUMNS and cells[0].lower() == 'applno':
+            columns = tuple(cell.lower() for cell in cells)
+            unknown = [name for name in columns if name not in LLR_BULK_COLUMNS]
+            if unknown:
+                return [], [{"row": reader.line_num, "error": f"Unknown columns: {', '.join(unknown)}"}]
+            continue
+        data = {name: value for name, value in zip(columns, cells) if value}
+        missing = [name for name in ('applno', 'dob', 'pass') if name not in data]
+        if missing:
+            errors.append({"row": reader.line_num, "error": f"Missing required fields: {', '.join(missing)}"})
+            continue
+        clean = clean_llr_exam_input(data)
+        if clean['applno'] in seen:
+            errors.append({"row": reader.line_num, "error": "Duplicate application number"})
+            continue
+        seen.add(clean['applno'])
+        rows.append((reader.line_num, clean))
+    if not rows and not errors:
+        errors.append({"row": 0, "error": "CSV has no rows"})
+    elif len(rows) + len(errors) > max_rows:
+        errors.append({"row": 0, "error": f"At most {max_rows} rows can be submitted at once"})
+    return rows, errors
+
+
+def ndjson_line(payload):
+    return json.dumps(payload, default=str) + "\n"
+
+
+def llr_exam_request(clean, api_key, callback_url):
+    return dict(clean, apikey=api_key, callback=callback_url)
+
+
+def build_llr_token_doc(user, service, service_price, llr_response, clean):
+    return {
+        "userId": user['_id'],
+        "userName": user['name'],
+        "userMobile": user['mobile'],
+        "serviceId": service['_id'],
+        "serviceName": service['name'],
+        "servicePrice": service_price,
+        "token": llr_response.get('token'),
+        "applno": llr_response.get('applno', clean['applno']),
+        "applname": llr_response.get('applname', ''),
+        "dob": llr_response.get('dob', clean['dob']),
+        "queue": llr_response.get('queue', ''),
+        "rtocode": llr_response.get('rtocode', ''),
+        "rtoname": llr_response.get('rtoname', ''),
+        "statecode": llr_response.get('statecode', ''),
+        "statename": llr_response.get('statename', ''),
+        "status": "submitted",
+        "apiResponse": llr_response,
+        "createdAt": datetime.utcnow(),
+        "updatedAt": datetime.utcnow()
+    }
+
+
+def llr_exam_success_payload(llr_response, new_balance):
+    return {
+        "success": True,
+        "message": "LLR exam request submitted successfully!",
+        "token": llr_response.get('token'),
+        "queue": llr_response.get('queue', ''),
+        "applname": llr_response.get('applname', ''),
+        "rtoname": llr_response.get('rtoname', ''),
+        "newWalletBalance": new_balance
+    }
+
+
+def llr_exam_error(llr_response):
+    """Map a non-200 exam response to ``(payload, status_code)``."""
+    if llr_response.get('status') == '404':
+        return {
+            "error": "Application data verification failed",
+            "message": llr_response.get('message'),
+            "details": "Please verify that your Application Number and Date of Birth exactly match your LLR application documents."
+        }, 400
+    if llr_response.get('status') == '500':
+        return {
+            "error": "LLR service temporarily unavailable",
+            "message": llr_response.get('message')
+        }, 500
+    return {
+        "error": "Unexpected response from LLR API",
+        "message": llr_response.get('message'),
+        "status": llr_response.get('status')
+    }, 400
+
+
+def llr_status_payload(status_response):
+    return {
+        "success": True,
+        "status": status_response.get('status'),
+        "message": status_response.get('message'),
+        "queue": status_response.get('queue'),
+        "remarks": status_response.get('remarks'),
+        "filename": status_response.get('filename'),
+        "pdfAvailable": status_response.get('status') == '200'
+    }
+
+
+def build_llr_status_update(status_response):
+    """Translate a vendor status response into the $set for its token document."""
+    update_data = {
+        "lastChecked": datetime.utcnow(),
+        "latestResponse": status_response
+    }
+
+    if status_response.get('status') == '200':
+        # Completed successfully
+        update_data['status'] = 'completed'
+        update_data['completedAt'] = datetime.utcnow()
+        update_data['pdfData'] = status_response.get('message')  # Base64 PDF data, moved to pdf_blobs on write
+        update_data['filename'] = status_response.get('filename')
+        update_data['remarks'] = status_response.get('remarks')
+    elif status_response.get('status') == '500':
+        # Under process
+        update_data['status'] = 'processing'
+        update_data['queue'] = status_response.get('queue')
+        update_data['remarks'] = status_response.get('remarks')
+    elif status_response.get('status') == '300':
+        # Refunded
+        update_data['status'] = 'refunded'
+        update_data['refundReason'] = status_response.get('message')
+
+    return update_data
+
+
+def llr_recently_checked(token_doc, min_recheck_seconds):
+    last_checked = token_doc.get('lastChecked')
+    return (last_checked is not None
+            and datetime.utcnow() - last_checked < timedelta(seconds=min_recheck_seconds))
+
+
+def llr_status_changed(token_doc, update_data):
+    """Whether a status update says more than that the token was checked again."""
+    previous = token_doc.get('latestResponse') or {}
+    if previous.get('status') != update_data['latestResponse'].get('status'):
+        return True
+    return any(update_data.get(field, token_doc.get(field)) != token_doc.get(field)
+               for field in ('status', 'queue', 'remarks'))
+
+
+def stored_vendor_response(response, pdf_field, pdf_fields):
+    """``response`` as kept on a record whose PDF is in ``pdf_blobs``."""
+    return dict(response, **{pdf_field: None}) if 'pdfHash' in pdf_fields else response
+
+
+def llr_refund_description(token_doc):
+    return f"Refund for LLR exam - Application: {token_doc['applno']}"
+
+
+def serialize_llr_token(token):
+    token['_id'] = str(token['_id'])
+    token['userId'] = str(token['userId'])
+    token['serviceId'] = str(token['serviceId'])
+    # Remove sensitive PDF data from list view
+    token.pop('pdfData', None)
+    return token
+
+
+# DL PDF
+DL_REQUIRED_FIELDS = ['userId', 'serviceId', 'dlno']
+
+
+def clean_dl_input(data):
+    return {
+        "dlno": data['dlno'].strip().upper(),
+        "type": data.get('type', 'type1').strip().lower(),
+        "blood": data.get('blood', 'O+').strip().upper(),
+        "addrtype": data.get('addrtype', 'perm').strip().lower()
+    }
+
+
+def clean_dl_bulk_input(data, max_items):
+    """Validate a bulk DL request; returns ``(cleans, error)``, one clean input per dlno."""
+    dlnos = data.get('dlnos')
+    if not isinstance(dlnos, list) or not dlnos or not all(isinstance(d, str) and d.strip() for d in dlnos):
+        return None, "dlnos must be a non-empty array of strings"
+    if len(dlnos) > max_items:
+        return None, f"At most {max_items} DL numbers can be generated at once"
+    unique = list(dict.fromkeys(dlno.strip().upper() for dlno in dlnos))
+    return [clean_dl_input(dict(data, dlno=dlno)) for dlno in unique], None
+
+
+def dl_pdf_request(clean, api_key):
+    return dict(clean, apikey=api_key)
+
+
+def dl_cache_filter(clean, since):
+    return {
+        "dlno": clean['dlno'],
+        "pdfType": clean['type'],
+        "bloodGroup": clean['blood'],
+        "addressType": clean['addrtype'],
+        "status": "completed",
+        "$or": [{"pdfHash": {"$type": "string"}}, {"pdfData": {"$nin": [None, ""]}}],
+        "createdAt": {"$gte": since}
+    }
+
+
+def build_dl_pdf_record(user, service, service_price, clean, name, dob, pdf_fields, **extra):
+    """``pdf_fields`` is what ``pdfstore`` returned for the PDF: its ``pdfHash`` or inline ``pdfData``."""
+    return dict({
+        "userId": user['_id'],
+        "userName": user['name'],
+        "userMobile": user['mobile'],
+        "serviceId": service['_id'],
+        "serviceName": service['name'],
+        "servicePrice": service_price,
+        "dlno": clean['dlno'],
+        "pdfType": clean['type'],
+        "bloodGroup": clean['blood'],
+        "addressType": clean['addrtype'],
+        "status": "completed",
+        "name": name,
+        "dob": dob,
+        "createdAt": datetime.utcnow()
+    }, **pdf_fields, **extra)
+
+
+def dl_success_payload(name, dob, pdf_data, new_balance):
+    return {
+        "success": True,
+        "message": "DL PDF generated successfully",
+        "name": name,
+        "dob": dob,
+        "pdfData": pdf_data,
+        "newWalletBalance": new_balance
+    }
+
+
+def dl_generation_description(clean):
+    return f"DL PDF Generation - {clean['dlno']}"
+
+
+def dl_refund_description(clean):
+    return f"Refund for failed DL PDF Generation - {clean['dlno']}"
+
+
+def dl_bulk_filename(clean):
+    return f"{clean['dlno']}.pdf"
+
+
+def serialize_dl_pdf(pdf):
+    pdf['_id'] = str(pdf['_id'])
+    pdf['userId'] = str(pdf['userId'])
+    pdf['serviceId'] = str(pdf['serviceId'])
+    return pdf
@@ -0,0 +1,123 @@
+"""Lazily created dependencies shared by the blueprints.
+
+``create_app`` stores a ``Services`` container in ``app.extensions``.  The
+module-level proxies below resolve against the current app, so blueprint
+code reads like it uses globals while a caller can inject its own Mongo
+client or vendor client.  Nothing here opens a connection until a request
+first touches it.
+"""
+import threading
+
+from flask import current_app
+from pymongo import MongoClient
+from pymongo.server_api import ServerApi
+from werkzeug.local import LocalProxy
+
+from . import config
+
+
+class Services:
+
+    def __init__(self, mongo_client=None, vendor_client=None):
+        self._instances = {}
+        if mongo_client is not None:
+            self._instances['client'] = mongo_client
+        if vendor_client is not None:
+            self._instances['vendor'] = vendor_client
+        self._lock = threading.Lock()
+
+    def _lazy(self, name, factory):
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = self._instances[name] = factory()
+        return instance
+
+    @property
+    def client(self):
+        # connect=False defers all network I/O to the first query, so creating the
+        # app (and forking gunicorn workers) opens no sockets and each worker
+        # builds its own pool
+        return self._lazy('client', lambda: MongoClient(
+            config.MONGO_URI,
+            connect=False,
+            maxPoolSize=config.MONGO_MAX_POOL_SIZE,
+            serverSelectionTimeoutMS=5000,  # 5 seconds timeout for server selection
+            socketTimeoutMS=30000,          # 30 seconds timeout for socket operations
+            connectTimeoutMS=10000,         # 10 seconds timeout for connection
+            server_api=ServerApi('1')       # Stable API version
+        ))
+
+    @property
+    def db(self):
+        return self.client[config.MONGO_DB_NAME]
+
+    @property
+    def vendor(self):
+        from .vendor import VendorClient
+        return self._lazy('vendor', VendorClient)
+
+    @property
+    def revoked_users(self):
+        from .auth import RevocationSet
+        return self._lazy('revoked_users', lambda: RevocationSet(self.db.users))
+
+    @property
+    def idempotency_store(self):
+        from .idempotency import IdempotencyStore
+        return self._lazy('idempotency_store', lambda: IdempotencyStore(self.db.idempotency))
+
+    @property
+    def llr_status_flights(self):
+        from .singleflight import SingleFlight
+        return self._lazy('llr_status_flights', lambda: SingleFlight('llr_status'))
+
+    @property
+    def llr_status_writes(self):
+        from .writebehind import WriteBehindBuffer
+        return self._lazy('llr_status_writes', lambda: WriteBehindBuffer('llr_status', self.db.llr_tokens))
+
+
+def current_services():
+    return current_app.extensions['servicehub']
+
+
+def in_app_context(func):
+    """Wrap func so it can run on a pool thread with the caller's app context."""
+    app = current_app._get_current_object()
+
+    def wrapper(*args, **kwargs):
+        with app.app_context():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _collection(name):
+    return LocalProxy(lambda: current_services().db[name])
+
+
+client = LocalProxy(lambda: current_services().client)
+vendor = LocalProxy(lambda: current_services().vendor)
+revoked_users = LocalProxy(lambda: current_services().revoked_users)
+idempotency_store = LocalProxy(lambda: current_services().idempotency_store)
+llr_status_flights = LocalProxy(lambda: current_services().llr_status_flights)
+llr_status_writes = LocalProxy(lambda: current_services().llr_status_writes)
+
+# Collections
+users_collection = _collection('users')
+admins_collection = _collection('admins')
+services_collection = _collection('services')
+service_requests_collection = _collection('service_requests')
+user_service_prices_collection = _collection('user_service_prices')
+payment_history_collection = _collection('payment_history')
+ledger_buckets_collection = _collection('ledger_buckets')
+user_summaries_collection = _collection('user_summaries')
+payments_collection = _collection('payments')
+llr_tokens_collection = _collection('llr_tokens')
+dl_pdfs_collection = _collection('dl_pdfs')
+pdf_blobs_collection = _collection('pdf_blobs')
+wallet_audits_collection = _collection('wallet_audits')
+wallet_audit_sums_collection = _collection('wallet_audit_sums')
+wallet_discrepancies_collection = _collection('wallet_discrepancies')
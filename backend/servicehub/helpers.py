@@ -0,0 +1,147 @@
+"""Request-scoped helpers shared by the blueprints: auth, wallet and ledger."""
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from flask import Response, g, jsonify, request
+from pymongo import ReturnDocument
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+
+from .auth import InvalidToken, bearer_token, decode_user_token
+from .config import ADMIN_BATCH_MAX_ITEMS
+from .extensions import revoked_users, users_collection
+from .ledger import append_entries
+from .metrics import metrics
+
+
+# Authentication middleware
+def load_auth_claims():
+    g.auth = None
+    token = bearer_token(request.headers)
+    if not token:
+        return None
+    try:
+        g.auth = decode_user_token(token)
+    except InvalidToken:
+        return jsonify({"error": "Invalid authentication token"}), 401
+
+def get_request_user(user_id):
+    """Resolve the user behind a request without a Mongo read when possible.
+
+    With a valid bearer token for the same user, the returned dict is built
+    from the token claims and ``isBlocked`` from the revocation set; it
+    carries no ``walletBalance``, so callers must use ``debit_wallet``.
+    Without a token the user document is read as before.  Returns None when
+    the user does not exist or the token belongs to someone else.
+    """
+    claims = g.get('auth')
+    if claims:
+        if claims['sub'] != str(user_id):
+            return None
+        return {
+            "_id": ObjectId(claims['sub']),
+            "name": claims['name'],
+            "mobile": claims['mobile'],
+            "isBlocked": revoked_users.is_revoked(claims['sub'])
+        }
+    return users_collection.find_one({"_id": ObjectId(user_id)})
+
+# Completed PDFs never change, and the ETag is a hash of their content
+PDF_CACHE_MAX_AGE = 31536000
+
+def set_pdf_cache_headers(response, etag):
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = PDF_CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+def pdf_not_modified(etag):
+    """A ``304`` if the client already holds the PDF with ``etag``, else None."""
+    if not request.if_none_match.contains(etag):
+        return None
+    metrics.inc('pdf_download_not_modified')
+    return set_pdf_cache_headers(Response(status=304), etag)
+
+def pdf_file_response(data, etag, filename):
+    """Binary PDF download; answers ``If-None-Match`` and ``Range`` requests."""
+    response = Response(data, mimetype='application/pdf')
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    set_pdf_cache_headers(response, etag)
+    try:
+        return response.make_conditional(request, accept_ranges=True, complete_length=len(data))
+    except RequestedRangeNotSatisfiable:
+        return Response(status=416, headers={"Content-Range": f"bytes */{len(data)}"})
+
+# Helper functions
+def vendor_unavailable_response(error):
+    metrics.inc('vendor_fast_failures')
+    response = jsonify({"error": str(error)})
+    response.status_code = 503
+    if error.retry_after is not None:
+        response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def debit_wallet(user_oid, amount, session=None):
+    """Atomically deduct amount if the balance covers it; returns the new balance or None."""
+    user = users_collection.find_one_and_update(
+        {"_id": user_oid, "walletBalance": {"$gte": amount}},
+        {"$inc": {"walletBalance": -amount}},
+        projection={"walletBalance": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    return user['walletBalance'] if user else None
+
+def credit_wallet(user_oid, amount, session=None):
+    user = users_collection.find_one_and_update(
+        {"_id": user_oid},
+        {"$inc": {"walletBalance": amount}},
+        projection={"walletBalance": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    return user['walletBalance'] if user else None
+
+def build_payment_history_doc(user, transaction_type, amount, description, reference_id=None, balance_after=None):
+    if balance_after is None:
+        balance_after = user.get('walletBalance', 0)
+    return {
+        "userId": user['_id'],
+        "userName": user['name'],
+        "userMobile": user['mobile'],
+        "transactionType": transaction_type,
+        "amount": amount,
+        "description": description,
+        "referenceId": reference_id,
+        "balanceAfter": balance_after,
+        "createdAt": datetime.utcnow()
+    }
+
+def add_payment_history(user_id, transaction_type, amount, description, reference_id=None, user=None, balance_after=None):
+    try:
+        if user is None:
+            user = users_collection.find_one({"_id": ObjectId(user_id)})
+        if user:
+            history_doc = build_payment_history_doc(
+                dict(user, _id=ObjectId(user_id)), transaction_type, amount, description,
+                reference_id, balance_after
+            )
+            append_entries([history_doc])
+    except Exception as e:
+        print(f"Error adding payment history: {e}")
+
+def parse_object_id(value):
+    try:
+        return ObjectId(value)
+    except Exception:
+        return None
+
+def validate_batch(items, name):
+    """Return an error response for a malformed admin batch, or None."""
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": f"{name} must be a non-empty array"}), 400
+    if len(items) > ADMIN_BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {ADMIN_BATCH_MAX_ITEMS} {name} can be processed at once"}), 400
+    if not all(isinstance(item, dict) for item in items):
+        return jsonify({"error": f"Each entry in {name} must be an object"}), 400
+    return None
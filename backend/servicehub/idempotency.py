@@ -0,0 +1,169 @@
+"""Idempotency-Key support for order-creating endpoints.
+
+A request carrying an ``Idempotency-Key`` header claims a record in the
+``idempotency`` collection before the view runs.  Retries with the same key
+replay the stored response; a retry that arrives while the first attempt is
+still talking to the vendor waits for it instead of calling the vendor again.
+Records expire through a TTL index on ``createdAt``.
+"""
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import make_response, request
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', 86400))
+# Longer than the slowest vendor call (90 s) so waiters normally see the result
+IDEMPOTENCY_WAIT_SECONDS = int(os.getenv('IDEMPOTENCY_WAIT_SECONDS', 120))
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv('IDEMPOTENCY_LEASE_SECONDS', 150))
+IDEMPOTENCY_POLL_SECONDS = 0.5
+
+
+def record_id_for(scope, data, key):
+    return f"{scope}:{data.get('userId', '')}:{key}"
+
+
+def request_hash_for(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+def in_progress_record(record_id, request_hash, now):
+    return {
+        "_id": record_id,
+        "state": "in_progress",
+        "requestHash": request_hash,
+        "leaseExpiresAt": now + timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS),
+        "createdAt": now
+    }
+
+
+def expired_lease_filter(record_id, request_hash, now):
+    return {"_id": record_id, "state": "in_progress", "requestHash": request_hash,
+            "leaseExpiresAt": {"$lt": now}}
+
+
+def completion_update(status_code, body, mimetype):
+    return {"$set": {
+        "state": "completed",
+        "statusCode": status_code,
+        "body": body,
+        "mimetype": mimetype,
+        "completedAt": datetime.utcnow()
+    }, "$unset": {"leaseExpiresAt": ""}}
+
+
+def should_store(status_code):
+    # Errors are not replayed: after a 4xx (e.g. insufficient balance) the user fixes
+    # the cause and retries, and a 5xx may succeed the second time
+    return status_code < 400
+
+
+def conflict_response(record, request_hash):
+    """The error for a key claimed by another request, or None to replay ``record``."""
+    if record and record.get('requestHash') != request_hash:
+        return {"error": "Idempotency-Key was already used with a different request"}, 422
+    if not record:
+        return {"error": "A request with this Idempotency-Key is still in progress"}, 409
+    return None
+
+
+class IdempotencyStore:
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def ensure_indexes(self):
+        self.collection.create_index([("createdAt", 1)], expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS)
+
+    def claim(self, record_id, request_hash):
+        """Try to become the request that executes ``record_id``.
+
+        Returns ``(True, None)`` when claimed, otherwise ``(False, record)``
+        with the existing record.  An in-progress record whose lease ran out
+        (its worker died mid-request) is taken over.
+        """
+        now = datetime.utcnow()
+        record = in_progress_record(record_id, request_hash, now)
+        try:
+            self.collection.insert_one(record)
+            return True, None
+        except DuplicateKeyError:
+            pass
+
+        taken = self.collection.find_one_and_update(
+            expired_lease_filter(record_id, request_hash, now),
+            {"$set": {"leaseExpiresAt": record['leaseExpiresAt']}},
+            return_document=ReturnDocument.AFTER
+        )
+        if taken:
+            return True, None
+        return False, self.collection.find_one({"_id": record_id})
+
+    def wait(self, record_id, timeout=IDEMPOTENCY_WAIT_SECONDS):
+        """Poll until the record completes; returns it, or None on timeout or release."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            record = self.collection.find_one({"_id": record_id})
+            if not record or record['state'] == 'completed':
+                return record
+            time.sleep(IDEMPOTENCY_POLL_SECONDS)
+        return None
+
+    def complete(self, record_id, response):
+        self.collection.update_one(
+            {"_id": record_id},
+            completion_update(response.status_code, response.get_data(as_text=True), response.mimetype)
+        )
+
+    def release(self, record_id):
+        """Forget a claim so the client may retry, e.g. after an error response."""
+        self.collection.delete_one({"_id": record_id, "state": "in_progress"})
+
+
+def replay(record):
+    response = make_response(record['body'], record['statusCode'])
+    response.mimetype = record.get('mimetype', 'application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(store, scope):
+    """Make a view replay its response for repeated ``Idempotency-Key`` headers.
+
+    Keys are scoped per endpoint and per ``userId`` in the JSON body.  Reusing
+    a key with a different body is rejected with 422.  Error responses are
+    not stored, so the client can retry them with the same key.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if not key:
+                return view(*args, **kwargs)
+
+            data = request.get_json(silent=True) or {}
+            record_id = record_id_for(scope, data, key)
+            request_hash = request_hash_for(request.get_data())
+
+            claimed, record = store.claim(record_id, request_hash)
+            if not claimed:
+                if record and record.get('requestHash') == request_hash and record['state'] != 'completed':
+                    record = store.wait(record_id)
+                return conflict_response(record, request_hash) or replay(record)
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                store.release(record_id)
+                raise
+            if should_store(response.status_code):
+                store.complete(record_id, response)
+            else:
+                store.release(record_id)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,169 @@
+"""Storage for wallet ledger entries (what ``/api/user/payment-history`` shows).
+
+Callers build entries with ``build_payment_history_doc`` and hand them to
+``append_entries``.  With ``LEDGER_FORMAT=compact`` (the default) entries
+are pushed into ``ledger_buckets`` documents per user and month, each holding
+up to ``LEDGER_BUCKET_MAX_ENTRIES`` entries::
+
+    {"u": userId, "m": 202610, "n": 3, "e": [
+        {"i": ObjectId, "t": "d", "a": 3000, "b": 7000, "d": "...", "r": ObjectId, "c": datetime}
+    ]}
+
+Amounts are integer paise and user name and mobile are not repeated; they
+are read back from ``users``.  ``read_user_history`` merges buckets with
+legacy ``payment_history`` rows and returns entries in the legacy shape, so
+the API output does not depend on the storage format.  ``flask --app app
+migrate-ledger`` moves legacy rows into buckets.
+"""
+from bson.objectid import ObjectId
+from pymongo import InsertOne, UpdateOne
+
+from .config import LEDGER_FORMAT, LEDGER_BUCKET_MAX_ENTRIES
+from .extensions import payment_history_collection, ledger_buckets_collection, users_collection
+from .summary import apply_summary_operations, transaction_summary_operations
+
+TYPE_CODES = {"credit": "c", "debit": "d", "refund": "r", "pending_credit": "p"}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+# How each entry type moves the wallet; pending credits only record an initiated payment
+BALANCE_SIGNS = {"credit": 1, "refund": 1, "debit": -1}
+
+
+def to_paise(amount):
+    return int(round(float(amount or 0) * 100))
+
+
+def from_paise(paise):
+    return paise / 100
+
+
+def history_balance(history):
+    """Wallet balance in paise implied by ``history`` (entries in the legacy shape)."""
+    return sum(BALANCE_SIGNS.get(entry['transactionType'], 0) * to_paise(entry['amount']) for entry in history)
+
+
+def bucket_month(created_at):
+    return created_at.year * 100 + created_at.month
+
+
+def compact_entry(doc):
+    entry = {
+        "i": doc.get('_id') or ObjectId(),
+        "t": TYPE_CODES.get(doc['transactionType'], doc['transactionType']),
+        "a": to_paise(doc['amount']),
+        "b": to_paise(doc.get('balanceAfter')),
+        "d": doc['description'],
+        "c": doc['createdAt']
+    }
+    reference_id = doc.get('referenceId')
+    if isinstance(reference_id, str) and len(reference_id) == 24 and ObjectId.is_valid(reference_id):
+        # Most references are order ids: 12 bytes as an ObjectId instead of 24 as text
+        reference_id = ObjectId(reference_id)
+    if reference_id is not None:
+        entry['r'] = reference_id
+    return entry
+
+
+def expand_entry(entry, user_id, user):
+    """Turn a bucket entry back into a legacy ``payment_history`` row."""
+    reference_id = entry.get('r')
+    return {
+        "_id": entry['i'],
+        "userId": user_id,
+        "userName": user.get('name'),
+        "userMobile": user.get('mobile'),
+        "transactionType": TYPE_NAMES.get(entry['t'], entry['t']),
+        "amount": from_paise(entry['a']),
+        "description": entry['d'],
+        "referenceId": str(reference_id) if reference_id is not None else None,
+        "balanceAfter": from_paise(entry['b']),
+        "createdAt": entry['c']
+    }
+
+
+def compact_operations(history_docs):
+    buckets = {}
+    for doc in history_docs:
+        key = (doc['userId'], bucket_month(doc['createdAt']))
+        buckets.setdefault(key, []).append(compact_entry(doc))
+    operations = []
+    for (user_id, month), entries in buckets.items():
+        for start in range(0, len(entries), LEDGER_BUCKET_MAX_ENTRIES):
+            chunk = entries[start:start + LEDGER_BUCKET_MAX_ENTRIES]
+            # Only a bucket with room for the whole chunk matches; otherwise a new one is started
+            operations.append(UpdateOne(
+                {"u": user_id, "m": month, "n": {"$lte": LEDGER_BUCKET_MAX_ENTRIES - len(chunk)}},
+                {"$push": {"e": {"$each": chunk}}, "$inc": {"n": len(chunk)}},
+                upsert=True
+            ))
+    return operations
+
+
+def ledger_operations(history_docs):
+    """Return ``(format, operations)`` writing ``history_docs`` in the configured format."""
+    if LEDGER_FORMAT == 'compact':
+        return 'compact', compact_operations(history_docs)
+    return 'legacy', [InsertOne(doc) for doc in history_docs]
+
+
+def append_entries(history_docs, session=None):
+    for doc in history_docs:
+        doc.setdefault('_id', ObjectId())
+    ledger_format, operations = ledger_operations(history_docs)
+    if not operations:
+        return
+    collection = ledger_buckets_collection if ledger_format == 'compact' else payment_history_collection
+    collection.bulk_write(operations, ordered=False, session=session)
+    apply_summary_operations(transaction_summary_operations(history_docs))
+
+
+def merge_history(legacy_rows, buckets, user):
+    """Legacy rows plus bucket entries, newest first, all in the legacy shape."""
+    history = list(legacy_rows)
+    for bucket in buckets:
+        history.extend(expand_entry(entry, bucket['u'], user) for entry in bucket['e'])
+    history.sort(key=lambda entry: entry['createdAt'], reverse=True)
+    return history
+
+
+def read_user_history(user_oid):
+    legacy_rows = payment_history_collection.find({"userId": user_oid})
+    buckets = list(ledger_buckets_collection.find({"u": user_oid}))
+    user = {}
+    if buckets:
+        user = users_collection.find_one({"_id": user_oid}, {"name": 1, "mobile": 1}) or {}
+    return merge_history(legacy_rows, buckets, user)
+
+
+def migrate_legacy_ledger(batch_size=1000):
+    """Move ``payment_history`` rows into buckets; returns the number moved.
+
+    Each batch is written and deleted in one settlement transaction where
+    the deployment supports it.  Without transactions a run can stop between
+    the two, so rows already in a bucket are only deleted, and an interrupted
+    run can still simply be restarted.
+    """
+    from .settlement import run_settlement
+
+    moved = 0
+    while True:
+        rows = list(payment_history_collection.find({}, sort=[("_id", 1)], limit=batch_size))
+        if not rows:
+            return moved
+
+        def work(session):
+            row_ids = [row['_id'] for row in rows]
+            copied = {
+                entry['i']
+                for bucket in ledger_buckets_collection.find(
+                    {"u": {"$in": list({row['userId'] for row in rows})}, "e.i": {"$in": row_ids}},
+                    {"e.i": 1}, session=session
+                )
+                for entry in bucket['e']
+            }
+            operations = compact_operations([row for row in rows if row['_id'] not in copied])
+            if operations:
+                ledger_buckets_collection.bulk_write(operations, ordered=False, session=session)
+            payment_history_collection.delete_many({"_id": {"$in": row_ids}}, session=session)
+
+        run_settlement(work)
+        moved += len(rows)
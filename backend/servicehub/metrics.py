@@ -0,0 +1,46 @@
+"""In-process counters and gauges, exported as JSON at /api/admin/metrics.
+
+Each worker keeps its own numbers; a scraper should collect every worker
+(or sum them) rather than assume one process sees all traffic.
+"""
+import threading
+from collections import defaultdict
+
+
+def _metric_key(name, labels):
+    if not labels:
+        return name
+    rendered = ",".join(f"{key}={labels[key]}" for key in sorted(labels))
+    return f"{name}{{{rendered}}}"
+
+
+class Metrics:
+
+    def __init__(self):
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[_metric_key(name, labels)] += value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[_metric_key(name, labels)] = value
+
+    def get(self, name, **labels):
+        key = _metric_key(name, labels)
+        with self._lock:
+            return self._counters.get(key, self._gauges.get(key, 0))
+
+    def ratio(self, numerator, denominator):
+        total = self.get(denominator)
+        return self.get(numerator) / total if total else 0.0
+
+    def snapshot(self):
+        with self._lock:
+            return {"counters": dict(self._counters), "gauges": dict(self._gauges)}
+
+
+metrics = Metrics()
@@ -0,0 +1,244 @@
+"""Content-addressed PDF storage (``pdf_blobs``).
+
+Each distinct PDF is stored once, as raw bytes keyed by the SHA-256 of those
+bytes.  ``dl_pdfs`` records and ``llr_tokens`` keep only its ``pdfHash``, and
+``refCount`` counts the records that point at a blob.  Vendor responses kept
+on a record (``apiResponse``, ``latestResponse``) have their PDF field set to
+None.
+
+Blobs whose count has dropped to zero are removed by ``collect_garbage``
+(``flask --app app gc-pdfs``).  A blob that was stored or released within
+``PDF_BLOB_GRACE_SECONDS`` is left alone, so a PDF that is being stored again
+at the same moment is not lost.  Records written before this keep their
+inline ``pdfData`` until ``flask --app app dedupe-pdfs`` moves them over, and
+readers handle both.
+"""
+import base64
+import hashlib
+from datetime import datetime, timedelta
+
+from bson.binary import Binary
+from pymongo import UpdateOne
+
+from .config import PDF_BLOB_GRACE_SECONDS
+from .extensions import dl_pdfs_collection, llr_tokens_collection, pdf_blobs_collection
+from .metrics import metrics
+
+PDF_PROJECTION = {"pdfHash": 1, "pdfData": 1}
+DATA_URI_PREFIX = 'data:application/pdf;base64,'
+
+
+def decode_pdf(pdf_data):
+    """Raw bytes of a base64 PDF (with or without a data URI prefix); ValueError if invalid."""
+    if pdf_data.startswith(DATA_URI_PREFIX):
+        pdf_data = pdf_data[len(DATA_URI_PREFIX):]
+    data = base64.b64decode(''.join(pdf_data.split()), validate=True)
+    if not data:
+        raise ValueError("Empty PDF")
+    return data
+
+
+def pdf_hash(data):
+    """Content key of a PDF; also its strong ETag."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def blob_operation(pdf_hash, data, count=1):
+    now = datetime.utcnow()
+    return UpdateOne(
+        {"_id": pdf_hash},
+        {"$setOnInsert": {"data": Binary(data), "size": len(data), "createdAt": now},
+         "$inc": {"refCount": count},
+         "$set": {"updatedAt": now}},
+        upsert=True
+    )
+
+
+def reference_operation(pdf_hash, count):
+    return UpdateOne({"_id": pdf_hash}, {"$inc": {"refCount": count}, "$set": {"updatedAt": datetime.utcnow()}})
+
+
+def pdf_blob_fields(pdf_data):
+    """Decode ``pdf_data`` for storage: ``(fields for the record, blob operation or None)``.
+
+    Data that is not valid base64 stays inline in ``pdfData``.
+    """
+    try:
+        data = decode_pdf(pdf_data or '')
+    except ValueError:
+        return {"pdfData": pdf_data}, None
+    key = pdf_hash(data)
+    return {"pdfHash": key}, blob_operation(key, data)
+
+
+def store_pdf(pdf_data):
+    """Store a base64 PDF and take a reference to it; returns the record fields."""
+    fields, operation = pdf_blob_fields(pdf_data)
+    if operation is not None:
+        result = pdf_blobs_collection.bulk_write([operation])
+        metrics.inc('pdf_blobs_created' if result.upserted_count else 'pdf_blobs_deduplicated')
+    return fields
+
+
+def share_pdf(doc):
+    """Take another reference to ``doc``'s PDF for a new record; returns the record fields."""
+    if doc.get('pdfHash'):
+        pdf_blobs_collection.bulk_write([reference_operation(doc['pdfHash'], 1)])
+        metrics.inc('pdf_blobs_deduplicated')
+        return {"pdfHash": doc['pdfHash']}
+    return store_pdf(doc.get('pdfData'))
+
+
+def release_pdf(fields):
+    """Drop the reference taken by ``store_pdf``/``share_pdf`` for a record that was not written."""
+    if fields.get('pdfHash'):
+        pdf_blobs_collection.bulk_write([reference_operation(fields['pdfHash'], -1)])
+
+
+def load_pdf_bytes(doc):
+    if doc.get('pdfHash'):
+        blob = pdf_blobs_collection.find_one({"_id": doc['pdfHash']}, {"data": 1})
+        return bytes(blob['data']) if blob else None
+    return decode_pdf(doc['pdfData']) if doc.get('pdfData') else None
+
+
+def load_pdf(doc):
+    """Base64 PDF of a record, whichever way it is stored."""
+    if doc.get('pdfHash'):
+        data = load_pdf_bytes(doc)
+        return base64.b64encode(data).decode() if data else None
+    return doc.get('pdfData')
+
+
+def _inline_bytes(doc):
+    return sum(len(value) for value in (
+        doc.get('pdfData'),
+        (doc.get('apiResponse') or {}).get('pdf'),
+        (doc.get('latestResponse') or {}).get('message') if doc.get('status') == 'completed' else None
+    ) if isinstance(value, str))
+
+
+def dedupe_pdfs(batch_size=500):
+    """Move inline ``pdfData`` of ``dl_pdfs`` and ``llr_tokens`` into ``pdf_blobs``.
+
+    Returns counts and the bytes of inline base64 removed versus blob bytes
+    added.  Safe to interrupt and run again.
+    """
+    report = {"records": 0, "skipped": 0, "blobsCreated": 0, "inlineBytesRemoved": 0, "blobBytesAdded": 0}
+    for collection, response_field in ((dl_pdfs_collection, 'apiResponse.pdf'),
+                                       (llr_tokens_collection, 'latestResponse.message')):
+        last_id = None
+        while True:
+            selector = {"pdfData": {"$type": "string"}, "pdfHash": {"$exists": False}}
+            if last_id is not None:
+                selector["_id"] = {"$gt": last_id}
+            docs = list(collection.find(
+                selector, {"pdfData": 1, "status": 1, "apiResponse.pdf": 1, "latestResponse.message": 1},
+                sort=[("_id", 1)], limit=batch_size
+            ))
+            if not docs:
+                break
+            last_id = docs[-1]['_id']
+
+            blobs = {}
+            groups = {}
+            for doc in docs:
+                try:
+                    data = decode_pdf(doc['pdfData'])
+                except ValueError:
+                    report['skipped'] += 1
+                    continue
+                key = pdf_hash(data)
+                blob = blobs.setdefault(key, {"data": data, "count": 0})
+                blob['count'] += 1
+                update = {"$set": {"pdfHash": key}, "$unset": {"pdfData": ""}}
+                if collection is dl_pdfs_collection and (doc.get('apiResponse') or {}).get('pdf'):
+                    update["$set"][response_field] = None
+                if collection is llr_tokens_collection and (doc.get('latestResponse') or {}).get('message') \
+                        and doc.get('status') == 'completed':
+                    update["$set"][response_field] = None
+                group = groups.setdefault((key, tuple(update["$set"])), {"update": update, "ids": []})
+                group['ids'].append(doc['_id'])
+                report['inlineBytesRemoved'] += _inline_bytes(doc)
+            if not groups:
+                continue
+
+            # Blobs first, so that no record ever points at a missing blob
+            result = pdf_blobs_collection.bulk_write(
+                [blob_operation(key, blob['data'], blob['count']) for key, blob in blobs.items()],
+                ordered=False
+            )
+            created = set(result.upserted_ids.values())
+            report['blobsCreated'] += len(created)
+            report['blobBytesAdded'] += sum(len(blobs[key]['data']) for key in created)
+            # Grouped per blob so that the references can follow the records actually moved
+            moved = dict.fromkeys(blobs, 0)
+            for (key, _), group in groups.items():
+                moved[key] += collection.update_many(
+                    {"_id": {"$in": group['ids']}, "pdfHash": {"$exists": False}}, group['update']
+                ).modified_count
+            # Records another run moved first: give back the references taken for them
+            releases = [reference_operation(key, moved[key] - blob['count'])
+                        for key, blob in blobs.items() if moved[key] < blob['count']]
+            if releases:
+                pdf_blobs_collection.bulk_write(releases, ordered=False)
+            report['records'] += sum(moved.values())
+    report['bytesReclaimed'] = report['inlineBytesRemoved'] - report['blobBytesAdded']
+    return report
+
+
+def recount_references(cutoff):
+    """Reset ``refCount`` from the records of blobs untouched since ``cutoff``; returns blobs fixed."""
+    counts = {}
+    for collection in (dl_pdfs_collection, llr_tokens_collection):
+        for row in collection.aggregate([
+            {"$match": {"pdfHash": {"$type": "string"}}},
+            {"$group": {"_id": "$pdfHash", "count": {"$sum": 1}}}
+        ]):
+            counts[row['_id']] = counts.get(row['_id'], 0) + row['count']
+    operations = [
+        # Conditional on the count read here, so a concurrent store or release wins
+        UpdateOne({"_id": blob['_id'], "refCount": blob['refCount'], "updatedAt": {"$lt": cutoff}},
+                  {"$set": {"refCount": counts.get(blob['_id'], 0)}})
+        for blob in pdf_blobs_collection.find({"updatedAt": {"$lt": cutoff}}, {"refCount": 1})
+        if blob['refCount'] != counts.get(blob['_id'], 0)
+    ]
+    if not operations:
+        return 0
+    return pdf_blobs_collection.bulk_write(operations, ordered=False).modified_count
+
+
+def collect_garbage(grace_seconds=PDF_BLOB_GRACE_SECONDS, recount=False):
+    """Delete blobs no record points at; returns what was removed."""
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    fixed = recount_references(cutoff) if recount else 0
+    orphan_filter = {"refCount": {"$lte": 0}, "updatedAt": {"$lt": cutoff}}
+    orphans = list(pdf_blobs_collection.find(orphan_filter, {"size": 1}))
+    removed = 0
+    if orphans:
+        removed = pdf_blobs_collection.delete_many(
+            dict(orphan_filter, _id={"$in": [blob['_id'] for blob in orphans]})
+        ).deleted_count
+    metrics.inc('pdf_blobs_collected', removed)
+    return {"referencesFixed": fixed, "blobsRemoved": removed,
+            "bytesReclaimed": sum(blob.get('size', 0) for blob in orphans) if removed else 0}
+
+
+def storage_report():
+    """Blob storage against what the same records would take without deduplication."""
+    blobs = list(pdf_blobs_collection.aggregate([
+        {"$group": {"_id": None, "blobs": {"$sum": 1}, "bytes": {"$sum": "$size"},
+                    "references": {"$sum": "$refCount"},
+                    "referencedBytes": {"$sum": {"$multiply": ["$size", "$refCount"]}}}}
+    ]))
+    summary = blobs[0] if blobs else {"blobs": 0, "bytes": 0, "references": 0, "referencedBytes": 0}
+    inline = sum(collection.count_documents({"pdfData": {"$type": "string"}})
+                 for collection in (dl_pdfs_collection, llr_tokens_collection))
+    return {
+        "blobs": summary['blobs'],
+        "references": summary['references'],
+        "blobBytes": summary['bytes'],
+        # Each reference used to carry its PDF twice, base64-encoded
+        "bytesWithoutDedupe": summary['referencedBytes'] * 2 * 4 // 3,
+        "inlineRecords": inline
+    }
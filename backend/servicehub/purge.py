@@ -0,0 +1,104 @@
+"""Background removal of a deleted service's per-user prices.
+
+Deleting a service only marks it (``deletedAt``, and inactive), so it drops
+out of every list and order path at once while the requests, tokens and PDFs
+that name it keep resolving.  Its ``user_service_prices`` rows, one per
+retailer, are then removed in batches of ``SERVICE_PURGE_BATCH_SIZE`` with
+``SERVICE_PURGE_PAUSE_SECONDS`` between them, so the delete neither holds
+the HTTP request nor floods the primary.  Progress is kept on the service::
+
+    "deletion": {"status": "pending" | "running" | "done", "pricesTotal": 1200,
+                 "pricesDeleted": 500, "startedAt": ..., "updatedAt": ..., "finishedAt": ...}
+
+Purges run in a separate worker process, ``flask --app app purge-services``,
+not in the gunicorn worker that took the delete: gunicorn recycles workers
+(``max_requests``) and would kill a purge thread part way.  The worker claims
+pending purges as they come in, and takes over a running one that made no
+progress for ``SERVICE_PURGE_STALE_SECONDS``, so a purger that died is
+finished by the next one.
+"""
+import time
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+
+from .config import SERVICE_PURGE_BATCH_SIZE, SERVICE_PURGE_PAUSE_SECONDS, SERVICE_PURGE_STALE_SECONDS
+from .extensions import services_collection, user_service_prices_collection
+from .metrics import metrics
+
+
+def soft_delete_service(service_oid):
+    """Hide a service and queue its prices for removal; False if there is no such live service."""
+    now = datetime.utcnow()
+    # Counted from the serviceId index, only to show progress against
+    total = user_service_prices_collection.count_documents({"serviceId": service_oid})
+    result = services_collection.update_one(
+        {"_id": service_oid, "deletedAt": None},
+        {"$set": {
+            "isActive": False,
+            "deletedAt": now,
+            "deletion": {"status": "pending", "pricesTotal": total, "pricesDeleted": 0,
+                         "startedAt": now, "updatedAt": now, "finishedAt": None}
+        }}
+    )
+    return result.matched_count > 0
+
+
+def purge_service_prices(service_oid, batch_size=SERVICE_PURGE_BATCH_SIZE, pause=SERVICE_PURGE_PAUSE_SECONDS):
+    """Delete a deleted service's prices batch by batch; returns how many were removed."""
+    services_collection.update_one(
+        {"_id": service_oid}, {"$set": {"deletion.status": "running", "deletion.updatedAt": datetime.utcnow()}}
+    )
+    removed = 0
+    while True:
+        ids = [price['_id'] for price in user_service_prices_collection.find(
+            {"serviceId": service_oid}, {"_id": 1}, limit=batch_size
+        )]
+        if not ids:
+            break
+        count = user_service_prices_collection.delete_many({"_id": {"$in": ids}}).deleted_count
+        removed += count
+        metrics.inc('service_prices_purged', count)
+        services_collection.update_one(
+            {"_id": service_oid},
+            {"$inc": {"deletion.pricesDeleted": count}, "$set": {"deletion.updatedAt": datetime.utcnow()}}
+        )
+        time.sleep(pause)
+
+    now = datetime.utcnow()
+    services_collection.update_one(
+        {"_id": service_oid},
+        {"$set": {"deletion.status": "done", "deletion.updatedAt": now, "deletion.finishedAt": now}}
+    )
+    return removed
+
+
+def claim_service_purge(stale_seconds=SERVICE_PURGE_STALE_SECONDS, skip=()):
+    """Mark the next pending (or stalled) purge as running; returns its service id, or None."""
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=stale_seconds)
+    service = services_collection.find_one_and_update(
+        {"_id": {"$nin": list(skip)},
+         "$or": [{"deletion.status": "pending"},
+                 {"deletion.status": "running", "deletion.updatedAt": {"$lt": cutoff}}]},
+        {"$set": {"deletion.status": "running", "deletion.updatedAt": now}},
+        projection={"_id": 1}, sort=[("deletedAt", 1)], return_document=ReturnDocument.AFTER
+    )
+    return service['_id'] if service else None
+
+
+def run_service_purges(stale_seconds=SERVICE_PURGE_STALE_SECONDS):
+    """Purge every pending or stalled deletion; returns ``{serviceId: removed}``."""
+    purged = {}
+    tried = []
+    while True:
+        # A purge that failed this pass waits for the next one
+        service_oid = claim_service_purge(stale_seconds, tried)
+        if service_oid is None:
+            return purged
+        tried.append(service_oid)
+        try:
+            purged[str(service_oid)] = purge_service_prices(service_oid)
+        except Exception as e:
+            # Left running; taken over again once it goes stale
+            print(f"Error purging prices of service {service_oid}: {e}")
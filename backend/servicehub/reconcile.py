@@ -0,0 +1,123 @@
+"""Payment gateway reconciliation.
+
+A payment moves out of ``pending`` exactly once, through ``settle_payment``;
+the wallet is credited only by the caller that wins that transition, so the
+gateway callback and the reconciliation worker can race on the same order
+without double-crediting it.
+
+The worker (``flask --app app reconcile-payments``) picks up orders whose
+callback never arrived: it pages through pending payments older than
+``PAYMENT_RECONCILE_MIN_AGE_SECONDS`` on the ``(status, createdAt)`` index and
+asks pg-order-status about each, a few at a time.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+from pymongo import ReturnDocument
+
+from .config import (PG_ORDER_STATUS_API_URL, PAYMENT_RECONCILE_MIN_AGE_SECONDS,
+                     PAYMENT_RECONCILE_BATCH_SIZE, PAYMENT_RECONCILE_WORKERS,
+                     PAYMENT_PENDING_EXPIRY_SECONDS)
+from .extensions import vendor, in_app_context, payments_collection
+from .metrics import metrics
+from .settlement import credit_with_ledger, run_settlement
+from .vendor import VendorUnavailable
+
+PAYMENT_SUCCESS_STATUS = '200'
+
+
+def check_payment_status(transaction_id, user_id=None):
+    """Ask pg-order-status about an order, queued fairly under the payer's ``user_id``."""
+    response = vendor.get('payment_status', PG_ORDER_STATUS_API_URL,
+                          params={"txnid": transaction_id}, timeout=30, fair_key=user_id)
+    return response.json()
+
+
+def settle_payment(transaction_id, status, gateway_response=None):
+    """Move a pending payment to ``status``; credit the wallet if it succeeded.
+
+    Returns the payment if this call made the transition, None if the
+    payment does not exist or was already settled.
+    """
+    now = datetime.utcnow()
+
+    def work(session):
+        payment = payments_collection.find_one_and_update(
+            {"transactionId": transaction_id, "status": "pending"},
+            {"$set": {"status": status, "gatewayResponse": gateway_response,
+                      "settledAt": now, "updatedAt": now}},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if payment and status == 'success':
+            credit_with_ledger(payment['userId'], payment['amount'], "credit",
+                               "Wallet top-up via payment gateway", transaction_id, session)
+        return payment
+
+    payment = run_settlement(work)
+    if not payment:
+        return None
+    metrics.inc('payments_settled', status=status)
+    metrics.set('payment_settlement_lag_seconds', (now - payment['createdAt']).total_seconds())
+    return payment
+
+
+def reconcile_payment(payment):
+    """Check one pending payment against the gateway; returns the outcome."""
+    try:
+        gateway_response = check_payment_status(payment['transactionId'], payment['userId'])
+    except (VendorUnavailable, requests.exceptions.RequestException, ValueError):
+        metrics.inc('payment_reconcile_errors')
+        return 'error'
+
+    if gateway_response.get('status') == PAYMENT_SUCCESS_STATUS:
+        return 'success' if settle_payment(payment['transactionId'], 'success', gateway_response) else 'raced'
+
+    expires_at = payment['createdAt'] + timedelta(seconds=PAYMENT_PENDING_EXPIRY_SECONDS)
+    if datetime.utcnow() >= expires_at:
+        return 'expired' if settle_payment(payment['transactionId'], 'expired', gateway_response) else 'raced'
+    return 'pending'
+
+
+def pending_payment_stats():
+    oldest = payments_collection.find_one(
+        {"status": "pending"}, {"createdAt": 1}, sort=[("createdAt", 1)]
+    )
+    lag = (datetime.utcnow() - oldest['createdAt']).total_seconds() if oldest else 0
+    metrics.set('payment_reconciliation_lag_seconds', lag)
+    return {
+        "pendingPayments": payments_collection.count_documents({"status": "pending"}),
+        "oldestPendingAgeSeconds": lag
+    }
+
+
+def reconcile_pending_payments(batch_size=PAYMENT_RECONCILE_BATCH_SIZE, workers=PAYMENT_RECONCILE_WORKERS):
+    """One pass over every pending payment old enough to have missed its callback."""
+    started = time.monotonic()
+    cutoff = datetime.utcnow() - timedelta(seconds=PAYMENT_RECONCILE_MIN_AGE_SECONDS)
+    outcomes = {}
+    last = None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        reconcile = in_app_context(reconcile_payment)
+        while True:
+            query = {"status": "pending", "createdAt": {"$lte": cutoff}}
+            if last is not None:
+                # Keyset paging; payments still pending after a check must not be seen twice
+                query["$or"] = [{"createdAt": {"$gt": last['createdAt']}},
+                                {"createdAt": last['createdAt'], "_id": {"$gt": last['_id']}}]
+            page = list(payments_collection.find(
+                query, {"transactionId": 1, "userId": 1, "createdAt": 1},
+                sort=[("createdAt", 1), ("_id", 1)], limit=batch_size
+            ))
+            if not page:
+                break
+            for outcome in pool.map(reconcile, page):
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+                metrics.inc('payments_reconciled', outcome=outcome)
+            last = page[-1]
+
+    metrics.set('payment_reconcile_last_run_seconds', time.monotonic() - started)
+    return dict(outcomes, **pending_payment_stats())
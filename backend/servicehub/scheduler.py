@@ -0,0 +1,234 @@
+"""Weighted fair queueing of vendor calls per retailer.
+
+Vendor-bound work (LLR submit, DL generate, status checks) is admitted by
+``userId``: at most ``capacity()`` calls run at once in the process and at
+most ``user_cap`` per retailer.  When calls have to wait, each freed slot
+goes to the waiting retailer that has been served least relative to its
+weight (stride scheduling), so one retailer bursting hundreds of exams gets
+its share and small retailers' calls still go out promptly.  Each retailer
+may have only ``max_queue`` calls waiting; further calls, and calls that
+wait longer than ``max_wait`` seconds, fail with ``VendorUnavailable``.
+
+Like the limiter, the queue is per worker process.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+from .metrics import metrics
+
+FAIR_BUDGET = int(os.getenv('VENDOR_FAIR_BUDGET', 32))
+FAIR_USER_CAP = int(os.getenv('VENDOR_FAIR_USER_CAP', 4))
+# Waiting calls hold gunicorn threads, so keep each retailer's queue short
+FAIR_USER_QUEUE = int(os.getenv('VENDOR_FAIR_USER_QUEUE', 4))
+FAIR_MAX_WAIT_SECONDS = float(os.getenv('VENDOR_FAIR_MAX_WAIT_SECONDS', 15))
+ASYNC_FAIR_BUDGET = int(os.getenv('VENDOR_ASYNC_FAIR_BUDGET', 2048))
+ASYNC_FAIR_USER_CAP = int(os.getenv('VENDOR_ASYNC_FAIR_USER_CAP', 16))
+ASYNC_FAIR_USER_QUEUE = int(os.getenv('VENDOR_ASYNC_FAIR_USER_QUEUE', 128))
+# "userId=weight,userId=weight"; everyone else weighs 1
+FAIR_WEIGHTS = {
+    key.strip(): float(weight)
+    for key, _, weight in (item.partition('=') for item in os.getenv('VENDOR_FAIR_WEIGHTS', '').split(','))
+    if key.strip() and weight
+}
+# Retailers idle this long drop out of the per-user numbers
+FAIR_STATS_IDLE_SECONDS = 600
+SYSTEM_KEY = 'system'
+
+
+class _Flow:
+    __slots__ = ('weight', 'inflight', 'waiters', 'pass_', 'granted', 'wait_seconds', 'last_active')
+
+    def __init__(self, weight):
+        self.weight = weight
+        self.inflight = 0
+        self.waiters = deque()
+        self.pass_ = 0.0
+        self.granted = 0
+        self.wait_seconds = 0.0
+        self.last_active = time.monotonic()
+
+
+class _Waiter:
+    __slots__ = ('wake', 'granted')
+
+    def __init__(self, wake):
+        self.wake = wake
+        self.granted = False
+
+
+class FairQueue:
+    """Bookkeeping shared by the threaded and the asyncio scheduler; not thread-safe."""
+
+    def __init__(self, capacity, user_cap, max_queue, max_wait, weights=None):
+        self.capacity = capacity
+        self.user_cap = user_cap
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.weights = FAIR_WEIGHTS if weights is None else weights
+        self.flows = {}
+        self.inflight = 0
+        self.rejected = 0
+        self._virtual_time = 0.0
+
+    def _flow(self, key):
+        flow = self.flows.get(key)
+        if flow is None:
+            flow = self.flows[key] = _Flow(self.weights.get(key, 1.0))
+        flow.last_active = time.monotonic()
+        return flow
+
+    def _grant(self, flow):
+        # The flow served now had the lowest pass; newcomers start from here
+        self._virtual_time = flow.pass_
+        flow.pass_ += 1 / flow.weight
+        flow.inflight += 1
+        flow.granted += 1
+        self.inflight += 1
+
+    def _reject(self, message):
+        from .vendor import VendorUnavailable
+
+        self.rejected += 1
+        metrics.inc('vendor_queue_rejected')
+        return VendorUnavailable(message, retry_after=1)
+
+    def enter(self, key, make_wake):
+        """Admit a call for ``key`` now (returns None) or queue it (returns its waiter)."""
+        flow = self._flow(key)
+        if not flow.waiters:
+            # No credit for time spent idle
+            flow.pass_ = max(flow.pass_, self._virtual_time)
+            if self.inflight < self.capacity() and flow.inflight < self.user_cap:
+                self._grant(flow)
+                return None
+        if len(flow.waiters) >= self.max_queue:
+            raise self._reject("Too many vendor requests queued for this account, retry later")
+        waiter = _Waiter(make_wake())
+        flow.waiters.append(waiter)
+        return waiter
+
+    def give_up(self, key, waiter):
+        """Drop a waiter that timed out and raise; returns False if it was granted meanwhile."""
+        if waiter.granted:
+            return False
+        self.flows[key].waiters.remove(waiter)
+        raise self._reject("Vendor request waited too long for a free slot, retry later")
+
+    def record_wait(self, key, seconds):
+        self.flows[key].wait_seconds += seconds
+        metrics.inc('vendor_queue_waits')
+        metrics.inc('vendor_queue_wait_seconds', seconds)
+
+    def leave(self, key):
+        """Release ``key``'s slot; returns the waiters to wake."""
+        flow = self.flows[key]
+        flow.inflight -= 1
+        self.inflight -= 1
+        woken = []
+        while self.inflight < self.capacity():
+            ready = [f for f in self.flows.values() if f.waiters and f.inflight < self.user_cap]
+            if not ready:
+                break
+            flow = min(ready, key=lambda f: f.pass_)
+            waiter = flow.waiters.popleft()
+            self._grant(flow)
+            waiter.granted = True
+            woken.append(waiter)
+        return woken
+
+    def snapshot(self):
+        now = time.monotonic()
+        for key, flow in list(self.flows.items()):
+            if not flow.inflight and not flow.waiters and now - flow.last_active > FAIR_STATS_IDLE_SECONDS:
+                del self.flows[key]
+        queued = sum(len(flow.waiters) for flow in self.flows.values())
+        granted = sum(flow.granted for flow in self.flows.values()) or 1
+        metrics.set('vendor_queue_depth', queued)
+        busiest = sorted(self.flows.items(), key=lambda item: item[1].granted, reverse=True)[:20]
+        return {
+            "capacity": self.capacity(),
+            "inflight": self.inflight,
+            "queued": queued,
+            "rejected": self.rejected,
+            "users": {
+                key: {
+                    "inflight": flow.inflight,
+                    "queued": len(flow.waiters),
+                    "granted": flow.granted,
+                    "share": round(flow.granted / granted, 4),
+                    "waitSeconds": round(flow.wait_seconds, 3)
+                }
+                for key, flow in busiest
+            }
+        }
+
+
+class FairScheduler:
+    """Thread-safe ``FairQueue`` for the Flask app."""
+
+    def __init__(self, capacity, user_cap=FAIR_USER_CAP, max_queue=FAIR_USER_QUEUE,
+                 max_wait=FAIR_MAX_WAIT_SECONDS, weights=None):
+        self.queue = FairQueue(capacity, user_cap, max_queue, max_wait, weights)
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        key = str(key) if key else SYSTEM_KEY
+        with self._lock:
+            waiter = self.queue.enter(key, threading.Event)
+        if waiter is None:
+            return key
+        started = time.monotonic()
+        waiter.wake.wait(self.queue.max_wait)
+        with self._lock:
+            if not waiter.granted:
+                self.queue.give_up(key, waiter)
+            self.queue.record_wait(key, time.monotonic() - started)
+        return key
+
+    def release(self, key):
+        with self._lock:
+            woken = self.queue.leave(key)
+        for waiter in woken:
+            waiter.wake.set()
+
+    def snapshot(self):
+        with self._lock:
+            return self.queue.snapshot()
+
+
+class AsyncFairScheduler:
+    """``FairQueue`` for the asyncio stack; used from the event loop only."""
+
+    def __init__(self, capacity, user_cap=ASYNC_FAIR_USER_CAP, max_queue=ASYNC_FAIR_USER_QUEUE,
+                 max_wait=FAIR_MAX_WAIT_SECONDS, weights=None):
+        self.queue = FairQueue(capacity, user_cap, max_queue, max_wait, weights)
+
+    async def acquire(self, key):
+        key = str(key) if key else SYSTEM_KEY
+        waiter = self.queue.enter(key, asyncio.Event)
+        if waiter is None:
+            return key
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter.wake.wait(), self.queue.max_wait)
+        except asyncio.TimeoutError:
+            self.queue.give_up(key, waiter)
+        except asyncio.CancelledError:
+            # A cancelled request must not leak the slot it may just have been given
+            if waiter.granted:
+                self.release(key)
+            else:
+                self.queue.flows[key].waiters.remove(waiter)
+            raise
+        self.queue.record_wait(key, time.monotonic() - started)
+        return key
+
+    def release(self, key):
+        for waiter in self.queue.leave(key):
+            waiter.wake.set()
+
+    def snapshot(self):
+        return self.queue.snapshot()
@@ -0,0 +1,210 @@
+"""Order settlement: wallet change, order record and ledger row as one unit.
+
+Each settlement runs in a single multi-document transaction, so a crash
+between writes can no longer leave a debit without its ledger row, and the
+writes are acknowledged once at commit instead of one by one.
+``ClientSession.with_transaction`` retries the whole unit on
+``TransientTransactionError`` and the commit on
+``UnknownTransactionCommitResult``.
+
+Transactions need a replica set or mongos.  Against a standalone server (or
+with ``SETTLEMENT_TRANSACTIONS=off``) the same writes run one after the
+other, as they did before.
+
+Vendor orders (LLR, DL) still reserve funds with ``debit_wallet`` before the
+vendor call, which can take longer than a transaction may stay open; only
+the record and ledger row are settled together, and the reservation is
+released if settlement fails.
+"""
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument, WriteConcern
+from pymongo.errors import OperationFailure
+from pymongo.read_concern import ReadConcern
+
+from .config import SETTLEMENT_TRANSACTIONS
+from .extensions import client, users_collection
+from .helpers import build_payment_history_doc, credit_wallet, debit_wallet
+from .ledger import append_entries
+from .metrics import metrics
+from .summary import apply_summary_operations, defer_summary_operations, record_order_created
+
+# "Transaction numbers are only allowed on a replica set member or mongos"
+ILLEGAL_OPERATION = 20
+
+_transactions_supported = None
+
+
+def run_settlement(work):
+    """Run ``work(session)`` in a transaction and return its result.
+
+    ``work`` must pass ``session`` to every write and be safe to call again:
+    it is retried from the start on transient errors.  Where transactions are
+    unavailable it is called once with ``session=None``.  Dashboard summary
+    updates made by ``work`` are applied after the commit, outside the
+    transaction.
+    """
+    global _transactions_supported
+    if SETTLEMENT_TRANSACTIONS == 'off' or _transactions_supported is False:
+        return work(None)
+
+    summary_operations = []
+
+    def attempt(session):
+        metrics.inc('settlement_attempts')
+        del summary_operations[:]
+        with defer_summary_operations(summary_operations):
+            return work(session)
+
+    try:
+        with client.start_session() as session:
+            result = session.with_transaction(
+                attempt,
+                read_concern=ReadConcern('snapshot'),
+                write_concern=WriteConcern('majority')
+            )
+    except OperationFailure as e:
+        if e.code != ILLEGAL_OPERATION or _transactions_supported:
+            raise
+        print("MongoDB deployment does not support transactions; settling without them")
+        _transactions_supported = False
+        return work(None)
+
+    _transactions_supported = True
+    metrics.inc('settlement_transactions')
+    apply_summary_operations(summary_operations)
+    return result
+
+
+def insert_ledger_rows(history_docs, session):
+    if session is not None:
+        append_entries(history_docs, session=session)
+        return
+    # Without a transaction a lost ledger row must not fail an order that is already paid for
+    try:
+        append_entries(history_docs)
+    except Exception as e:
+        print(f"Error adding payment history: {e}")
+
+
+def insert_ledger_row(history_doc, session):
+    insert_ledger_rows([history_doc], session)
+
+
+def settle_order(user, amount, collection, record, description, reserved_balance=None):
+    """Insert an order ``record`` with its wallet debit and ledger row.
+
+    Pass ``reserved_balance`` (the balance ``debit_wallet`` returned) when the
+    price was already reserved; otherwise the debit is part of the settlement.
+    Returns ``(record_id, new_balance)``, or None if the wallet does not cover
+    ``amount``.
+    """
+    record.setdefault('_id', ObjectId())
+
+    def work(session):
+        new_balance = reserved_balance
+        if new_balance is None:
+            new_balance = debit_wallet(user['_id'], amount, session=session)
+            if new_balance is None:
+                return None
+        try:
+            collection.insert_one(record, session=session)
+        except Exception:
+            # Without a transaction nothing rolls back a debit taken here (say, the
+            # order was already settled and its _id is taken), so give it back
+            if session is None and reserved_balance is None:
+                credit_wallet(user['_id'], amount)
+            raise
+        insert_ledger_row(build_payment_history_doc(
+            user, "debit", amount, description, str(record['_id']), new_balance
+        ), session)
+        record_order_created(collection.name, record)
+        return record['_id'], new_balance
+
+    return run_settlement(work)
+
+
+def credit_with_ledger(user_oid, amount, transaction_type, description, reference_id, session):
+    """Credit a wallet and write its ledger row; call from inside ``run_settlement``."""
+    user = users_collection.find_one_and_update(
+        {"_id": user_oid},
+        {"$inc": {"walletBalance": amount}},
+        projection={"name": 1, "mobile": 1, "walletBalance": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    if not user:
+        return None
+    insert_ledger_row(build_payment_history_doc(
+        user, transaction_type, amount, description, reference_id, user['walletBalance']
+    ), session)
+    return user['walletBalance']
+
+
+def batch_ledger_docs(user, transaction_type, items, balance_after):
+    """One ledger row per ``(reference_id, amount, description)`` item of a single wallet change.
+
+    Rows get running balances as if the items had been applied one by one,
+    ending at ``balance_after``.
+    """
+    sign = -1 if transaction_type == "debit" else 1
+    balance = balance_after - sign * sum(amount for _, amount, _ in items)
+    docs = []
+    for reference_id, amount, description in items:
+        balance += sign * amount
+        docs.append(build_payment_history_doc(
+            user, transaction_type, amount, description, str(reference_id), round(balance, 2)
+        ))
+    return docs
+
+
+def reserve_order_batch(user, items):
+    """Debit the total of ``(reference_id, amount, description)`` items in one step.
+
+    Writes a debit ledger row per item.  Returns the new balance, or None if
+    the wallet does not cover the total.
+    """
+    total = sum(amount for _, amount, _ in items)
+
+    def work(session):
+        new_balance = debit_wallet(user['_id'], total, session=session)
+        if new_balance is None:
+            return None
+        insert_ledger_rows(batch_ledger_docs(user, "debit", items, new_balance), session)
+        return new_balance
+
+    return run_settlement(work)
+
+
+def refund_order_batch(user_oid, items):
+    """Credit back the total of ``items`` with one refund ledger row each; returns the new balance."""
+    total = sum(amount for _, amount, _ in items)
+
+    def work(session):
+        user = users_collection.find_one_and_update(
+            {"_id": user_oid},
+            {"$inc": {"walletBalance": total}},
+            projection={"name": 1, "mobile": 1, "walletBalance": 1},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if not user:
+            return None
+        insert_ledger_rows(batch_ledger_docs(user, "refund", items, user['walletBalance']), session)
+        return user['walletBalance']
+
+    return run_settlement(work)
+
+
+def settle_refund(collection, selector, update, user_oid, amount, description, reference_id):
+    """Apply ``update`` to the order matched by ``selector`` and refund it, at most once.
+
+    ``selector`` must stop matching once ``update`` is applied (e.g. it
+    excludes the refunded status).  Returns the new balance, or None if
+    nothing was refunded.
+    """
+    def work(session):
+        if collection.update_one(selector, update, session=session).modified_count == 0:
+            return None
+        return credit_with_ledger(user_oid, amount, "refund", description, reference_id, session)
+
+    return run_settlement(work)
@@ -0,0 +1,71 @@
+"""In-process request coalescing.
+
+While a call for a key is running, further calls for the same key wait for
+it and get its result (or its exception) instead of running their own.
+Used for LLR status checks, where several tabs polling one token would
+otherwise each call the vendor and each rewrite the token document.  Like
+the vendor limiter, this is per worker process.
+"""
+import asyncio
+import threading
+
+from .metrics import metrics
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Thread-safe coalescing for the Flask app."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            metrics.inc('singleflight_shared', flight=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """Coalescing for the asyncio stack; used from the event loop only."""
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+
+    async def do(self, key, fn):
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._calls.pop(key, None) if self._calls.get(key) is done else None)
+        else:
+            metrics.inc('singleflight_shared', flight=self.name)
+        # A waiter going away must not cancel the call the others are waiting on
+        return await asyncio.shield(task)
@@ -0,0 +1,247 @@
+"""Per-user dashboard summary (``user_summaries``, keyed by user id).
+
+Holds request, LLR token and DL PDF counts by status, transaction counts by
+type and the last ``USER_SUMMARY_RECENT`` requests and transactions, so the
+dashboard home is one ``_id`` lookup instead of scans over the user's whole
+history.  The summary is built from scratch on first read and then kept
+current by the writers: ledger appends, orders, LLR status changes and
+admin responses.  Wallet balance and blocked state are always read from
+``users`` instead, since they change through paths that write no ledger
+entry.
+
+Updates only touch summaries that already exist, and each one bumps the
+summary's ``version``; a rebuild stores its result only if the version it
+started from is still current, so it cannot overwrite an update made while
+it was reading.  Updates made inside a settlement transaction are applied
+after it commits (``defer_summary_operations``).
+"""
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from .config import USER_SUMMARY_RECENT
+from .extensions import (dl_pdfs_collection, llr_tokens_collection, service_requests_collection,
+                         user_summaries_collection)
+
+# Order collections whose documents are counted by status, and the summary field for each
+ORDER_COUNT_FIELDS = {"llr_tokens": "llrTokenCounts", "dl_pdfs": "dlPdfCounts"}
+REBUILD_ATTEMPTS = 3
+
+_deferred_operations = ContextVar('deferred_summary_operations', default=None)
+
+# Admin claim bookkeeping is not part of what the user sees
+HIDDEN_REQUEST_FIELDS = ('claimedBy', 'claimedAt', 'claimExpiresAt')
+
+
+def summary_request(request_doc):
+    entry = {key: value for key, value in request_doc.items() if key not in HIDDEN_REQUEST_FIELDS}
+    entry['_id'] = str(request_doc['_id'])
+    entry['userId'] = str(request_doc['userId'])
+    entry['serviceId'] = str(request_doc['serviceId'])
+    return entry
+
+
+def summary_transaction(history_doc):
+    reference_id = history_doc.get('referenceId')
+    return {
+        "_id": str(history_doc['_id']),
+        "transactionType": history_doc['transactionType'],
+        "amount": float(history_doc['amount']),
+        "description": history_doc['description'],
+        "referenceId": str(reference_id) if reference_id is not None else None,
+        "balanceAfter": float(history_doc.get('balanceAfter') or 0),
+        "createdAt": history_doc['createdAt']
+    }
+
+
+def _push_recent(entries):
+    return {"$each": entries, "$sort": {"createdAt": -1}, "$slice": USER_SUMMARY_RECENT}
+
+
+def transaction_summary_operations(history_docs):
+    """Summary updates for ledger entries that are being written."""
+    by_user = {}
+    for doc in history_docs:
+        by_user.setdefault(doc['userId'], []).append(doc)
+    operations = []
+    for user_id, docs in by_user.items():
+        counts = Counter(doc['transactionType'] for doc in docs)
+        increments = {f"transactionCounts.{name}": count for name, count in counts.items()}
+        increments["transactionCounts.total"] = len(docs)
+        operations.append(UpdateOne(
+            {"_id": user_id},
+            {"$inc": dict(increments, version=1),
+             "$push": {"recentTransactions": _push_recent([summary_transaction(doc) for doc in docs])},
+             "$set": {"updatedAt": datetime.utcnow()}}
+        ))
+    return operations
+
+
+def request_created_operation(request_doc):
+    return UpdateOne(
+        {"_id": request_doc['userId']},
+        {"$inc": {f"requestCounts.{request_doc['status']}": 1, "requestCounts.total": 1, "version": 1},
+         "$push": {"recentRequests": _push_recent([summary_request(request_doc)])},
+         "$set": {"updatedAt": datetime.utcnow()}}
+    )
+
+
+def request_status_operations(request_doc, status, admin_message):
+    """Summary updates for ``request_doc`` (as it was before) moving to ``status``."""
+    now = datetime.utcnow()
+    user_id = request_doc['userId']
+    operations = [UpdateOne(
+        {"_id": user_id, "recentRequests._id": str(request_doc['_id'])},
+        {"$set": {
+            "recentRequests.$.status": status,
+            "recentRequests.$.adminMessage": admin_message,
+            "recentRequests.$.updatedAt": now,
+            "updatedAt": now
+        }, "$inc": {"version": 1}}
+    )]
+    if request_doc['status'] != status:
+        operations.append(UpdateOne(
+            {"_id": user_id},
+            {"$inc": {f"requestCounts.{request_doc['status']}": -1, f"requestCounts.{status}": 1, "version": 1}}
+        ))
+    return operations
+
+
+def order_created_operations(collection_name, records):
+    """Summary updates for new LLR tokens or DL PDFs; none for other collections."""
+    field = ORDER_COUNT_FIELDS.get(collection_name)
+    if not field:
+        return []
+    by_user = {}
+    for record in records:
+        counts = by_user.setdefault(record['userId'], Counter())
+        counts[record.get('status')] += 1
+        counts['total'] += 1
+    return [
+        UpdateOne({"_id": user_id}, {"$inc": dict(
+            {f"{field}.{status}": count for status, count in counts.items()}, version=1
+        )})
+        for user_id, counts in by_user.items()
+    ]
+
+
+def order_status_operations(collection_name, user_id, old_status, new_status):
+    field = ORDER_COUNT_FIELDS[collection_name]
+    if not old_status or not new_status or old_status == new_status:
+        return []
+    return [UpdateOne(
+        {"_id": user_id},
+        {"$inc": {f"{field}.{old_status}": -1, f"{field}.{new_status}": 1, "version": 1}}
+    )]
+
+
+@contextmanager
+def defer_summary_operations(operations):
+    """Collect the summary updates made inside the block into ``operations``.
+
+    ``run_settlement`` applies them once the transaction has committed, so a
+    failed summary write cannot abort the settlement it describes.
+    """
+    token = _deferred_operations.set(operations)
+    try:
+        yield operations
+    finally:
+        _deferred_operations.reset(token)
+
+
+def defer(operations):
+    """Queue ``operations`` for after the current settlement commits; False outside one."""
+    deferred = _deferred_operations.get()
+    if deferred is None:
+        return False
+    deferred.extend(operations)
+    return True
+
+
+def apply_summary_operations(operations):
+    if not operations or defer(operations):
+        return
+    # A stale summary is rebuilt on demand; it must not fail the write it describes
+    try:
+        user_summaries_collection.bulk_write(operations, ordered=False)
+    except Exception as e:
+        print(f"Error updating user summary: {e}")
+
+
+def record_request_created(request_doc):
+    apply_summary_operations([request_created_operation(request_doc)])
+
+
+def record_request_status(request_doc, status, admin_message):
+    apply_summary_operations(request_status_operations(request_doc, status, admin_message))
+
+
+def record_order_created(collection_name, record):
+    apply_summary_operations(order_created_operations(collection_name, [record]))
+
+
+def record_order_status(collection_name, user_id, old_status, new_status):
+    apply_summary_operations(order_status_operations(collection_name, user_id, old_status, new_status))
+
+
+def order_counts(collection, user_oid):
+    counts = {
+        row['_id']: row['count']
+        for row in collection.aggregate([
+            {"$match": {"userId": user_oid}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ])
+    }
+    counts['total'] = sum(counts.values())
+    return counts
+
+
+def build_user_summary(user_oid):
+    from .ledger import read_user_history
+
+    requests = list(service_requests_collection.find({"userId": user_oid}).sort("createdAt", -1))
+    history = read_user_history(user_oid)
+
+    request_counts = Counter(request['status'] for request in requests)
+    request_counts['total'] = len(requests)
+    transaction_counts = Counter(entry['transactionType'] for entry in history)
+    transaction_counts['total'] = len(history)
+
+    return {
+        "_id": user_oid,
+        "requestCounts": dict(request_counts),
+        "transactionCounts": dict(transaction_counts),
+        "llrTokenCounts": order_counts(llr_tokens_collection, user_oid),
+        "dlPdfCounts": order_counts(dl_pdfs_collection, user_oid),
+        "recentRequests": [summary_request(request) for request in requests[:USER_SUMMARY_RECENT]],
+        "recentTransactions": [summary_transaction(entry) for entry in history[:USER_SUMMARY_RECENT]],
+        "updatedAt": datetime.utcnow()
+    }
+
+
+def rebuild_user_summary(user_oid):
+    """Build the summary from the user's history and store it unless an update raced the build."""
+    # From here on writers find a document to bump the version of
+    user_summaries_collection.update_one(
+        {"_id": user_oid}, {"$setOnInsert": {"version": 0, "stale": True}}, upsert=True
+    )
+    for _ in range(REBUILD_ATTEMPTS):
+        current = user_summaries_collection.find_one({"_id": user_oid}, {"version": 1}) or {}
+        version = current.get('version')
+        summary = build_user_summary(user_oid)
+        summary['version'] = version or 0
+        if user_summaries_collection.replace_one({"_id": user_oid, "version": version}, summary).matched_count:
+            return summary
+    # Still racing writers: serve this build and leave the stored one stale for the next read
+    return summary
+
+
+def get_user_summary(user_oid):
+    summary = user_summaries_collection.find_one({"_id": user_oid})
+    # Summaries stored before order counts were kept are rebuilt too
+    if summary and not summary.get('stale') and 'llrTokenCounts' in summary:
+        return summary
+    return rebuild_user_summary(user_oid)
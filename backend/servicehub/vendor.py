@@ -0,0 +1,257 @@
+"""Guarded HTTP client for the jkdigitalcenter vendor API.
+
+Every vendor call waits its turn in a per-retailer fair queue
+(``servicehub.scheduler``), then goes through a circuit breaker for its
+endpoint (exam, status, dl, payment_status) and a shared AIMD concurrency
+limiter.  When the
+vendor degrades, calls fail fast with ``VendorUnavailable`` instead of
+holding a worker thread for the full 30-90 s timeout.  ``AsyncVendorClient``
+applies the same guards for the optional asyncio stack (``servicehub.aio``).
+"""
+import math
+import os
+import threading
+import time
+
+import requests
+
+from .scheduler import ASYNC_FAIR_BUDGET, FAIR_BUDGET, AsyncFairScheduler, FairScheduler
+
+VENDOR_BASE_URL = os.getenv('VENDOR_BASE_URL', 'https://api.jkdigitalcenter.in').rstrip('/')
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('VENDOR_BREAKER_FAILURE_THRESHOLD', 5))
+BREAKER_RESET_SECONDS = float(os.getenv('VENDOR_BREAKER_RESET_SECONDS', 30))
+LIMITER_INITIAL = float(os.getenv('VENDOR_LIMIT_INITIAL', 8))
+LIMITER_MIN = float(os.getenv('VENDOR_LIMIT_MIN', 1))
+LIMITER_MAX = float(os.getenv('VENDOR_LIMIT_MAX', 32))
+# A successful call counts as congestion for the limiter only when it takes this
+# many times its endpoint's usual latency (exam and dl calls normally take 60-90 s)
+LIMITER_SLOW_FACTOR = float(os.getenv('VENDOR_LIMIT_SLOW_FACTOR', 2))
+# ...and at least this long, so jitter on fast endpoints is not mistaken for it
+LIMITER_SLOW_MIN_SECONDS = float(os.getenv('VENDOR_LIMIT_SLOW_MIN_SECONDS', 5))
+# Weight of the newest successful call in an endpoint's latency baseline
+LIMITER_BASELINE_WEIGHT = 0.1
+# A waiting coroutine costs far less than a waiting thread, so the async
+# client may keep many more calls in flight
+ASYNC_LIMITER_INITIAL = float(os.getenv('VENDOR_ASYNC_LIMIT_INITIAL', 64))
+ASYNC_LIMITER_MAX = float(os.getenv('VENDOR_ASYNC_LIMIT_MAX', 2048))
+
+
+class VendorUnavailable(Exception):
+    """Raised without contacting the vendor: circuit open or limiter saturated."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may proceed; in half-open only one probe at a time."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def retry_after(self):
+        return max(1, math.ceil(self.reset_seconds - (time.monotonic() - self.opened_at)))
+
+    def cancel_probe(self):
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def snapshot(self):
+        return {"state": self.state, "failures": self.failures, "trips": self.trips}
+
+
+class AIMDLimiter:
+    """Caps in-flight calls; +1/limit per good call, halves on failure or slowness.
+
+    A call is slow when it is well above its endpoint's moving-average latency,
+    not above a fixed cut-off, so the slow exam and dl endpoints are judged
+    against themselves.
+    """
+
+    def __init__(self, initial=LIMITER_INITIAL, minimum=LIMITER_MIN, maximum=LIMITER_MAX,
+                 slow_factor=LIMITER_SLOW_FACTOR, slow_min_seconds=LIMITER_SLOW_MIN_SECONDS):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.slow_factor = slow_factor
+        self.slow_min_seconds = slow_min_seconds
+        self.baselines = {}
+        self.inflight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self.inflight >= int(self.limit):
+                self.rejected += 1
+                return False
+            self.inflight += 1
+            return True
+
+    def is_slow(self, endpoint, elapsed):
+        baseline = self.baselines.get(endpoint)
+        if baseline is None:
+            return False
+        return elapsed > max(self.slow_factor * baseline, self.slow_min_seconds)
+
+    def release(self, ok, elapsed, endpoint=None):
+        with self._lock:
+            self.inflight -= 1
+            if ok and not self.is_slow(endpoint, elapsed):
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            else:
+                self.limit = max(self.minimum, self.limit / 2)
+            if ok:
+                baseline = self.baselines.get(endpoint)
+                self.baselines[endpoint] = elapsed if baseline is None else (
+                    baseline + LIMITER_BASELINE_WEIGHT * (elapsed - baseline)
+                )
+
+    def snapshot(self):
+        return {
+            "limit": round(self.limit, 2),
+            "inflight": self.inflight,
+            "rejected": self.rejected,
+            "baselineSeconds": {endpoint: round(seconds, 2) for endpoint, seconds in self.baselines.items()}
+        }
+
+
+class VendorClient:
+    ENDPOINTS = ('exam', 'status', 'dl', 'payment_status')
+
+    def __init__(self, session=None):
+        self.session = session or requests.Session()
+        self.breakers = {name: CircuitBreaker(name) for name in self.ENDPOINTS}
+        self.limiter = AIMDLimiter()
+        self.scheduler = FairScheduler(lambda: min(FAIR_BUDGET, int(self.limiter.limit)))
+
+    def _admit(self, endpoint):
+        """Return the endpoint's breaker if a call may start, else raise VendorUnavailable."""
+        breaker = self.breakers[endpoint]
+        if not breaker.allow():
+            raise VendorUnavailable(f"Vendor {endpoint} API is unavailable, retry later",
+                                    retry_after=breaker.retry_after())
+        if not self.limiter.try_acquire():
+            breaker.cancel_probe()
+            raise VendorUnavailable(f"Too many vendor {endpoint} requests in flight, retry later",
+                                    retry_after=1)
+        return breaker
+
+    def _settle(self, breaker, ok, started):
+        self.limiter.release(ok, time.monotonic() - started, breaker.name)
+        if ok:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+    def request(self, endpoint, method, url, fair_key=None, **kwargs):
+        """Call the vendor; ``fair_key`` (the retailer's userId) picks the fair queue."""
+        fair_key = self.scheduler.acquire(fair_key)
+        try:
+            breaker = self._admit(endpoint)
+            started = time.monotonic()
+            ok = False
+            try:
+                response = self.session.request(method, url, **kwargs)
+                ok = response.status_code < 500
+                return response
+            finally:
+                self._settle(breaker, ok, started)
+        finally:
+            self.scheduler.release(fair_key)
+
+    def post(self, endpoint, url, **kwargs):
+        return self.request(endpoint, 'POST', url, **kwargs)
+
+    def get(self, endpoint, url, **kwargs):
+        return self.request(endpoint, 'GET', url, **kwargs)
+
+    def snapshot(self):
+        return {
+            "breakers": {name: breaker.snapshot() for name, breaker in self.breakers.items()},
+            "limiter": self.limiter.snapshot(),
+            "scheduler": self.scheduler.snapshot()
+        }
+
+
+class AsyncVendorClient(VendorClient):
+    """``VendorClient`` for the asyncio stack, on top of ``httpx.AsyncClient``.
+
+    Breakers, limiter and fair queue behave exactly as in the threaded
+    client; only the transport and the concurrency ceilings differ.
+    """
+
+    def __init__(self, client=None):
+        if client is None:
+            import httpx
+            client = httpx.AsyncClient(limits=httpx.Limits(max_connections=int(ASYNC_LIMITER_MAX)))
+        self.session = client
+        self.breakers = {name: CircuitBreaker(name) for name in self.ENDPOINTS}
+        self.limiter = AIMDLimiter(initial=ASYNC_LIMITER_INITIAL, maximum=ASYNC_LIMITER_MAX)
+        self.scheduler = AsyncFairScheduler(lambda: min(ASYNC_FAIR_BUDGET, int(self.limiter.limit)))
+
+    async def request(self, endpoint, method, url, fair_key=None, **kwargs):
+        fair_key = await self.scheduler.acquire(fair_key)
+        try:
+            breaker = self._admit(endpoint)
+            started = time.monotonic()
+            ok = False
+            try:
+                response = await self.session.request(method, url, **kwargs)
+                ok = response.status_code < 500
+                return response
+            finally:
+                self._settle(breaker, ok, started)
+        finally:
+            self.scheduler.release(fair_key)
+
+    async def post(self, endpoint, url, **kwargs):
+        return await self.request(endpoint, 'POST', url, **kwargs)
+
+    async def get(self, endpoint, url, **kwargs):
+        return await self.request(endpoint, 'GET', url, **kwargs)
+
+    async def aclose(self):
+        await self.session.aclose()
@@ -0,0 +1,148 @@
+"""Write-behind buffering of bookkeeping updates.
+
+``set`` records a ``$set`` for a document and returns at once; updates for
+the same document are merged, and everything pending is written with one
+``bulk_write`` every ``interval`` seconds, when ``max_pending`` documents are
+waiting, and on shutdown.  Only use this for fields that may lag by a few
+seconds and may be lost if the process is killed outright, such as
+``lastChecked`` on LLR tokens; anything the user or the wallet depends on
+is written synchronously.  ``pending`` lets readers in the same process
+see updates that are not written yet.
+"""
+import asyncio
+import atexit
+import threading
+
+from pymongo import UpdateOne
+
+from .config import WRITE_BEHIND_INTERVAL_SECONDS, WRITE_BEHIND_MAX_PENDING
+from .metrics import metrics
+
+
+class _Pending:
+    """Bookkeeping shared by the threaded and the asyncio buffer; not thread-safe."""
+
+    def __init__(self, name):
+        self.name = name
+        self.updates = {}
+
+    def add(self, doc_id, fields):
+        if doc_id in self.updates:
+            metrics.inc('write_behind_coalesced', buffer=self.name)
+        self.updates.setdefault(doc_id, {}).update(fields)
+        return len(self.updates)
+
+    def take(self):
+        batch, self.updates = self.updates, {}
+        return batch
+
+    def restore(self, batch):
+        # Keep anything set while the failed batch was being written
+        for doc_id, fields in batch.items():
+            self.updates[doc_id] = dict(fields, **self.updates.get(doc_id, {}))
+
+    def operations(self, batch):
+        metrics.inc('write_behind_flushed', len(batch), buffer=self.name)
+        return [UpdateOne({"_id": doc_id}, {"$set": fields}) for doc_id, fields in batch.items()]
+
+
+class WriteBehindBuffer:
+    """Thread-safe buffer for the Flask app, flushed by a daemon thread."""
+
+    def __init__(self, name, collection, interval=WRITE_BEHIND_INTERVAL_SECONDS,
+                 max_pending=WRITE_BEHIND_MAX_PENDING):
+        self.collection = collection
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = _Pending(name)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _start(self):
+        # Started on first use, so a gunicorn worker gets its own thread after the fork
+        self._thread = threading.Thread(target=self._run, name=f"write-behind-{self._pending.name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def set(self, doc_id, fields):
+        with self._lock:
+            if self._thread is None:
+                self._start()
+            size = self._pending.add(doc_id, fields)
+        if size >= self.max_pending:
+            self.flush()
+
+    def pending(self, doc_id):
+        with self._lock:
+            return dict(self._pending.updates.get(doc_id, {}))
+
+    def discard(self, doc_id):
+        """Drop what is pending for ``doc_id``; called before writing it synchronously."""
+        with self._lock:
+            self._pending.updates.pop(doc_id, None)
+
+    def flush(self):
+        with self._lock:
+            batch = self._pending.take()
+        if not batch:
+            return
+        try:
+            self.collection.bulk_write(self._pending.operations(batch), ordered=False)
+        except Exception as e:
+            print(f"Error flushing {self._pending.name} writes: {e}")
+            with self._lock:
+                self._pending.restore(batch)
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+
+class AsyncWriteBehindBuffer:
+    """Buffer for the asyncio stack, flushed by a task on the serving loop."""
+
+    def __init__(self, name, collection, interval=WRITE_BEHIND_INTERVAL_SECONDS,
+                 max_pending=WRITE_BEHIND_MAX_PENDING):
+        self.collection = collection
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = _Pending(name)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def set(self, doc_id, fields):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+        if self._pending.add(doc_id, fields) >= self.max_pending:
+            await self.flush()
+
+    def pending(self, doc_id):
+        return dict(self._pending.updates.get(doc_id, {}))
+
+    def discard(self, doc_id):
+        self._pending.updates.pop(doc_id, None)
+
+    async def flush(self):
+        batch = self._pending.take()
+        if not batch:
+            return
+        try:
+            await self.collection.bulk_write(self._pending.operations(batch), ordered=False)
+        except Exception as e:
+            print(f"Error flushing {self._pending.name} writes: {e}")
+            self._pending.restore(batch)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
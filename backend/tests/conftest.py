@@ -0,0 +1,209 @@
+"""Shared fixtures: the apps on in-memory mongomock databases and a scripted vendor.
+
+Nothing here talks to MongoDB or the jkdigitalcenter API.  ``Vendor``
+answers each vendor endpoint with a canned JSON body and can serve both the
+threaded client (as a ``requests`` session) and the async one (as an httpx
+transport).
+"""
+import copy
+import json
+import os
+import time
+
+os.environ.setdefault('JWT_SECRET_KEY', 'servicehub-test-secret-at-least-32-bytes')
+# mongomock has no sessions; tests of the transaction path provide their own
+os.environ.setdefault('SETTLEMENT_TRANSACTIONS', 'off')
+
+import mongomock  # noqa: E402
+import pytest  # noqa: E402
+import requests  # noqa: E402
+from bson.objectid import ObjectId  # noqa: E402
+
+# pymongo 4.11+ hands ``sort`` to every bulk update; mongomock does not take it yet
+_add_update = mongomock.collection.BulkOperationBuilder.add_update
+
+
+def _add_update_without_sort(self, *args, sort=None, **kwargs):
+    return _add_update(self, *args, **kwargs)
+
+
+mongomock.collection.BulkOperationBuilder.add_update = _add_update_without_sort
+
+USER_ID = ObjectId('650000000000000000000001')
+POOR_USER_ID = ObjectId('650000000000000000000002')
+BLOCKED_USER_ID = ObjectId('650000000000000000000003')
+LLR_SERVICE_ID = ObjectId('650000000000000000000101')
+DL_SERVICE_ID = ObjectId('650000000000000000000102')
+
+SEED = {
+    "users": [
+        {"_id": USER_ID, "name": "Ravi", "mobile": "9000000001", "password": "x",
+         "walletBalance": 100.0, "isBlocked": False},
+        {"_id": POOR_USER_ID, "name": "Sita", "mobile": "9000000002", "password": "x",
+         "walletBalance": 5.0, "isBlocked": False},
+        {"_id": BLOCKED_USER_ID, "name": "Arun", "mobile": "9000000003", "password": "x",
+         "walletBalance": 100.0, "isBlocked": True},
+    ],
+    "services": [
+        {"_id": LLR_SERVICE_ID, "name": "LLR Exam", "description": "LLR", "defaultPrice": 30,
+         "isActive": True, "deletedAt": None},
+        {"_id": DL_SERVICE_ID, "name": "DL PDF", "description": "DL", "defaultPrice": 20,
+         "isActive": True, "deletedAt": None},
+    ],
+}
+
+PDF_BASE64 = "JVBERi0xLjQKJcTl8uXr"
+
+
+class Vendor:
+    """Canned vendor answers keyed by the last path segment of the URL.
+
+    ``latency`` holds seconds to spend on an endpoint before answering, spent
+    through ``sleep`` so that a test can hand in a fake clock.  An answer may
+    also be a callable taking the query parameters.  The payment gateway's
+    pg-order-status is such a stub: it reports the status set in
+    ``payments`` for the ``txnid`` asked about, pending ("100") otherwise.
+    """
+
+    def __init__(self):
+        self.answers = {
+            "doexam.php": (200, {"status": "200", "token": "tok-1", "applno": "AP123", "queue": "3"}),
+            "checkexam.php": (200, {"status": "100", "queue": "2", "message": "In queue"}),
+            "dlpdfapi.php": (200, {"status": "200", "name": "RAVI", "dob": "01-01-1990", "pdf": PDF_BASE64}),
+            "pg-order-status.php": self.payment_status,
+        }
+        self.payments = {}
+        self.latency = {}
+        self.sleep = time.sleep
+        self.calls = []
+
+    def answer(self, url, params=None):
+        name = str(url).rsplit('/', 1)[-1].split('?')[0]
+        self.calls.append(name)
+        if self.latency.get(name):
+            self.sleep(self.latency[name])
+        answer = self.answers.get(name, (404, {"status": "404"}))
+        return answer(params or {}) if callable(answer) else answer
+
+    def payment_status(self, params):
+        txnid = params.get('txnid')
+        return 200, {"status": self.payments.get(txnid, "100"), "txnid": txnid}
+
+    def session(self):
+        return VendorSession(self)
+
+    def transport(self):
+        import httpx
+
+        def handle(request):
+            status, body = self.answer(request.url, dict(request.url.params))
+            return httpx.Response(status, json=body)
+
+        return httpx.MockTransport(handle)
+
+
+class VendorSession:
+    """Just enough of ``requests.Session`` for ``VendorClient``."""
+
+    def __init__(self, vendor):
+        self.vendor = vendor
+
+    def request(self, method, url, params=None, **kwargs):
+        status, body = self.vendor.answer(url, params)
+        response = requests.Response()
+        response.status_code = status
+        response.url = url
+        response.headers['Content-Type'] = 'application/json'
+        response._content = json.dumps(body).encode()
+        return response
+
+
+class RollbackSession:
+    """Stands in for ``ClientSession``; an exception in the callback restores the database.
+
+    mongomock has no transactions; this is enough to check what the code
+    relies on a real commit or abort for.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.commits = 0
+        self.aborts = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def with_transaction(self, callback, read_concern=None, write_concern=None):
+        saved = {name: list(self.db[name].find()) for name in self.db.list_collection_names()}
+        try:
+            result = callback(self)
+        except Exception:
+            for name in self.db.list_collection_names():
+                self.db[name].delete_many({})
+                if saved.get(name):
+                    self.db[name].insert_many(saved[name])
+            self.aborts += 1
+            raise
+        self.commits += 1
+        return result
+
+
+def seed_database(db):
+    for name, docs in SEED.items():
+        db[name].insert_many(copy.deepcopy(docs))
+
+
+async def seed_database_async(db):
+    for name, docs in SEED.items():
+        await db[name].insert_many(copy.deepcopy(docs))
+
+
+@pytest.fixture
+def vendor():
+    return Vendor()
+
+
+@pytest.fixture
+def mongo():
+    return mongomock.MongoClient()
+
+
+@pytest.fixture
+def app(mongo, vendor):
+    from servicehub import create_app
+    from servicehub.extensions import Services
+    from servicehub.vendor import VendorClient
+
+    app = create_app(Services(mongo_client=mongo, vendor_client=VendorClient(vendor.session())))
+    seed_database(app.extensions['servicehub'].db)
+    return app
+
+
+@pytest.fixture
+def db(app):
+    return app.extensions['servicehub'].db
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def transactions(monkeypatch, mongo, db):
+    """Settle through a ``RollbackSession``, as on a replica set; yields the session."""
+    from servicehub import settlement
+
+    session = RollbackSession(db)
+    monkeypatch.setattr(settlement, 'SETTLEMENT_TRANSACTIONS', 'auto')
+    monkeypatch.setattr(settlement, '_transactions_supported', None)
+    monkeypatch.setattr(mongo, 'start_session', lambda **kwargs: session, raising=False)
+    mongomock.ignore_feature('session')
+    try:
+        yield session
+    finally:
+        mongomock.warn_on_feature('session')
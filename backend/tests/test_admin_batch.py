@@ -0,0 +1,149 @@
+"""Admin batch endpoints: per-item errors next to the items that went through."""
+from datetime import datetime
+
+import mongomock
+import pytest
+from bson.objectid import ObjectId
+
+from servicehub.extensions import revoked_users
+from servicehub.ledger import read_user_history
+
+from conftest import BLOCKED_USER_ID, DL_SERVICE_ID, LLR_SERVICE_ID, POOR_USER_ID, USER_ID
+
+MISSING_ID = '650000000000000000000999'
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def put(client, path, payload):
+    response = client.put(path, json=payload)
+    assert response.status_code == 200
+    return response.get_json()['results']
+
+
+def errors(results):
+    return {result['index']: result.get('error') for result in results if not result['success']}
+
+
+def balance(db, user_oid=USER_ID):
+    return db.users.find_one({"_id": user_oid})['walletBalance']
+
+
+def test_wallet_batch_sets_each_balance_and_reports_bad_items(client, db, app_context):
+    results = put(client, '/api/admin/update-wallet/batch', {"wallets": [
+        {"userId": str(USER_ID), "walletBalance": 150},
+        {"userId": str(POOR_USER_ID), "walletBalance": "lots"},
+        {"userId": MISSING_ID, "walletBalance": 10},
+        {"userId": "not-an-id", "walletBalance": 10},
+        {"userId": str(POOR_USER_ID), "walletBalance": 5},
+        {"userId": str(USER_ID), "walletBalance": 120},
+    ]})
+
+    assert errors(results) == {1: "Wallet balance must be a valid number", 2: "User not found", 3: "User not found"}
+    assert [result.get('difference') for result in results if result['success']] == [50, 0, -30]
+    assert balance(db) == 120
+    assert balance(db, POOR_USER_ID) == 5
+    rows = sorted(read_user_history(USER_ID), key=lambda row: row['balanceAfter'])
+    assert [(row['transactionType'], row['amount'], row['balanceAfter']) for row in rows] == [
+        ("debit", 30, 120), ("credit", 50, 150)
+    ]
+
+
+def test_wallet_batch_rereads_when_a_purchase_lands_first(monkeypatch, client, db, app_context):
+    find_one_and_update = mongomock.collection.Collection.find_one_and_update
+    raced = []
+
+    def purchase_first(self, filter, *args, **kwargs):
+        if self.name == 'users' and not raced:
+            raced.append(True)
+            find_one_and_update(self, {"_id": USER_ID}, {"$inc": {"walletBalance": -30}})
+        return find_one_and_update(self, filter, *args, **kwargs)
+
+    monkeypatch.setattr(mongomock.collection.Collection, 'find_one_and_update', purchase_first)
+    [result] = put(client, '/api/admin/update-wallet/batch',
+                   {"wallets": [{"userId": str(USER_ID), "walletBalance": 150}]})
+
+    # The admin's target stands, and the ledger row explains it from the balance after the purchase
+    assert result == {"index": 0, "success": True, "difference": 80}
+    assert balance(db) == 150
+    [row] = read_user_history(USER_ID)
+    assert (row['transactionType'], row['amount'], row['balanceAfter']) == ("credit", 80, 150)
+
+
+def test_wallet_batch_gives_up_on_a_wallet_that_keeps_changing(monkeypatch, client, db, app_context):
+    find_one_and_update = mongomock.collection.Collection.find_one_and_update
+
+    def purchase_every_time(self, filter, *args, **kwargs):
+        if self.name == 'users':
+            find_one_and_update(self, {"_id": USER_ID}, {"$inc": {"walletBalance": -1}})
+        return find_one_and_update(self, filter, *args, **kwargs)
+
+    monkeypatch.setattr(mongomock.collection.Collection, 'find_one_and_update', purchase_every_time)
+    [result] = put(client, '/api/admin/update-wallet/batch',
+                   {"wallets": [{"userId": str(USER_ID), "walletBalance": 150}]})
+
+    assert result['success'] is False
+    assert balance(db) == 97
+    assert read_user_history(USER_ID) == []
+
+
+def test_toggle_status_batch(client, db, app_context):
+    results = put(client, '/api/admin/toggle-user-status/batch', {"users": [
+        {"userId": str(USER_ID), "isBlocked": True},
+        {"userId": str(BLOCKED_USER_ID), "isBlocked": False},
+        {"userId": str(POOR_USER_ID), "isBlocked": "yes"},
+        {"userId": MISSING_ID, "isBlocked": True},
+    ]})
+
+    assert errors(results) == {2: "Block status must be true or false", 3: "User not found"}
+    blocked = {user['_id']: user['isBlocked'] for user in db.users.find()}
+    assert blocked == {USER_ID: True, BLOCKED_USER_ID: False, POOR_USER_ID: False}
+    assert revoked_users.is_revoked(str(USER_ID))
+    assert not revoked_users.is_revoked(str(BLOCKED_USER_ID))
+
+
+def test_price_batch(client, db):
+    results = put(client, '/api/admin/set-service-price/batch', {"prices": [
+        {"userId": str(USER_ID), "serviceId": str(LLR_SERVICE_ID), "price": "25"},
+        {"userId": str(USER_ID), "serviceId": "bad", "price": 10},
+        {"userId": str(USER_ID), "serviceId": str(DL_SERVICE_ID), "price": "free"},
+        {"userId": str(POOR_USER_ID), "serviceId": str(DL_SERVICE_ID), "price": 12},
+    ]})
+
+    assert errors(results) == {1: "Invalid ID format", 2: "Price must be a valid number"}
+    prices = {(doc['userId'], doc['serviceId']): doc['price'] for doc in db.user_service_prices.find()}
+    assert prices == {(USER_ID, LLR_SERVICE_ID): 25.0, (POOR_USER_ID, DL_SERVICE_ID): 12}
+
+
+def test_price_batch_rejects_a_malformed_batch(client):
+    assert client.put('/api/admin/set-service-price/batch', json={"prices": []}).status_code == 400
+    assert client.put('/api/admin/set-service-price/batch', json={"prices": ["x"]}).status_code == 400
+
+
+def test_respond_batch_settles_successes_and_refunds_failures(client, db, app_context):
+    def service_request(status="pending"):
+        return db.service_requests.insert_one({
+            "userId": USER_ID, "serviceId": DL_SERVICE_ID, "serviceName": "DL PDF", "servicePrice": 20,
+            "status": status, "createdAt": datetime.utcnow()
+        }).inserted_id
+
+    done, refund, processed = service_request(), service_request(), service_request("success")
+    results = put(client, '/api/admin/service-request/respond/batch', {"responses": [
+        {"requestId": str(done), "status": "success", "adminMessage": "Sent"},
+        {"requestId": str(refund), "status": "failed", "adminMessage": "No record"},
+        {"requestId": str(processed), "status": "failed"},
+        {"requestId": str(done), "status": "failed"},
+        {"requestId": str(ObjectId()), "status": "success"},
+        {"requestId": str(refund), "status": "maybe"},
+    ]})
+
+    assert errors(results) == {2: "Request already processed", 3: "Request already processed",
+                               4: "Request not found", 5: "Status must be 'success' or 'failed'"}
+    statuses = {doc['_id']: doc['status'] for doc in db.service_requests.find()}
+    assert statuses == {done: "success", refund: "failed", processed: "success"}
+    assert balance(db) == 120
+    [row] = read_user_history(USER_ID)
+    assert (row['transactionType'], row['amount'], row['referenceId']) == ("refund", 20, str(refund))
@@ -0,0 +1,83 @@
+"""Admin search: routing a query to indexed lookups, and the result limit."""
+import pytest
+from bson.objectid import ObjectId
+
+from servicehub.config import ADMIN_SEARCH_LIMIT
+from servicehub.documents import admin_search_plan
+
+from conftest import POOR_USER_ID, USER_ID
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def tokens(db):
+    db.llr_tokens.insert_many([
+        {"token": f"tok-{index}", "userId": USER_ID, "applno": f"9000{index:03d}", "status": "submitted"}
+        for index in range(ADMIN_SEARCH_LIMIT + 5)
+    ] + [{"token": "abc.def", "userId": POOR_USER_ID, "applno": "AP77", "status": "completed"}])
+
+
+def search(client, query, **args):
+    response = client.get('/api/admin/search', query_string=dict(q=query, **args))
+    return response.status_code, response.get_json()
+
+
+def kinds(query):
+    return [(kind, name) for kind, name, _ in admin_search_plan(query)]
+
+
+def test_plan_routes_each_shape_of_query():
+    assert kinds(str(USER_ID)) == [("id", "users"), ("id", "service_requests"),
+                                   ("id", "llr_tokens"), ("id", "dl_pdfs")]
+    assert kinds("90000 00001") == [("mobile", "users"), ("applno", "llr_tokens")]
+    assert kinds("+91 90000-00001") == [("mobile", "users")]
+    assert kinds("12345678901") == [("applno", "llr_tokens")]
+    assert kinds("mh12 2020") == [("dlno", "dl_pdfs"), ("applno", "llr_tokens"), ("token", "llr_tokens")]
+    assert kinds("abc.def") == [("applno", "llr_tokens"), ("token", "llr_tokens")]
+
+
+def test_plan_uses_anchored_prefixes_with_the_query_escaped():
+    [(_, _, mobile), (_, _, applno)] = admin_search_plan("9000 1")
+    assert mobile == {"mobile": {"$regex": "^90001"}}
+    assert applno == {"applno": {"$regex": "^90001"}}
+    [(_, _, applno), (_, _, token)] = admin_search_plan("ap.*")
+    assert applno == {"applno": {"$regex": r"^AP\.\*"}}
+    assert token == {"token": "ap.*"}
+
+
+def test_search_by_mobile_id_and_token(client, tokens):
+    status, body = search(client, "9000000002")
+    assert status == 200 and body['matchedBy'] == ["mobile"]
+    assert [user['_id'] for user in body['results']['users']] == [str(POOR_USER_ID)]
+
+    _, body = search(client, str(USER_ID))
+    assert body['matchedBy'] == ["id"]
+    assert body['results']['users'][0]['name'] == "Ravi"
+
+    _, body = search(client, "abc.def")
+    assert body['matchedBy'] == ["token"]
+    assert [token['userId'] for token in body['results']['llrTokens']] == [str(POOR_USER_ID)]
+
+    _, body = search(client, "ap7")
+    assert body['matchedBy'] == ["applno"]
+    # A regex character is matched literally, not as "any character"
+    assert search(client, "abc_def")[1]['matchedBy'] == []
+
+
+def test_limit_is_clamped(client, tokens):
+    assert len(search(client, "9000")[1]['results']['llrTokens']) == ADMIN_SEARCH_LIMIT
+    assert len(search(client, "9000", limit=5)[1]['results']['llrTokens']) == 5
+    assert len(search(client, "9000", limit=10000)[1]['results']['llrTokens']) == ADMIN_SEARCH_LIMIT
+    # Zero or negative would mean "no limit" to MongoDB
+    assert len(search(client, "9000", limit=0)[1]['results']['llrTokens']) == 1
+    assert len(search(client, "9000", limit=-3)[1]['results']['llrTokens']) == 1
+
+
+def test_bad_queries_are_rejected(client):
+    assert search(client, "9000", limit="ten") == (400, {"error": "Limit must be a number"})
+    assert search(client, "ab")[0] == 400
+    assert search(client, str(ObjectId()))[1]['matchedBy'] == []
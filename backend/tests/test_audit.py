@@ -0,0 +1,119 @@
+"""Wallet vs. ledger audit: full runs, incremental runs from the checkpoint, and what they report."""
+from datetime import datetime, timedelta
+
+import pytest
+from bson.objectid import ObjectId
+
+from servicehub import audit
+from servicehub.helpers import build_payment_history_doc
+from servicehub.ledger import append_entries
+
+from conftest import BLOCKED_USER_ID, POOR_USER_ID, USER_ID
+
+OPENED = datetime.utcnow() - timedelta(days=40)
+
+
+@pytest.fixture
+def books(monkeypatch, db, app_context):
+    """Each seeded wallet backed by an opening credit, in both ledger formats."""
+    # New entries count from the next run on instead of waiting out the lag
+    monkeypatch.setattr(audit, 'WALLET_AUDIT_LAG_SECONDS', 0)
+    users = {user['_id']: user for user in db.users.find()}
+    legacy = build_payment_history_doc(users[USER_ID], "credit", 100.0, "Opening balance", None, 100.0)
+    legacy['createdAt'] = OPENED
+    db.payment_history.insert_one(legacy)
+    opening = []
+    for user_oid in (POOR_USER_ID, BLOCKED_USER_ID):
+        doc = build_payment_history_doc(users[user_oid], "credit", users[user_oid]['walletBalance'],
+                                        "Opening balance")
+        doc['createdAt'] = OPENED
+        opening.append(doc)
+    append_entries(opening)
+    return users
+
+
+def spend(db, user, amount, transaction_type="debit"):
+    sign = -1 if transaction_type == "debit" else 1
+    wallet = db.users.find_one_and_update({"_id": user['_id']}, {"$inc": {"walletBalance": sign * amount}},
+                                          return_document=True)['walletBalance']
+    append_entries([build_payment_history_doc(user, transaction_type, amount, "Order", str(ObjectId()), wallet)])
+
+
+def checkpoints(db):
+    return {doc['_id']: doc for doc in db.wallet_audit_sums.find()}
+
+
+def test_a_full_run_then_an_incremental_one(db, books):
+    first = audit.audit_wallets(chunk_size=2)
+    assert (first['mode'], first['usersChecked'], first['discrepancies']) == ("full", 3, 0)
+    after_full = checkpoints(db)
+    assert {user_oid: doc['net'] for user_oid, doc in after_full.items()} == {
+        USER_ID: 10000, POOR_USER_ID: 500, BLOCKED_USER_ID: 10000
+    }
+
+    spend(db, books[USER_ID], 30)
+    spend(db, books[USER_ID], 12.5, "refund")
+    second = audit.audit_wallets(chunk_size=2)
+
+    assert (second['mode'], second['discrepancies']) == ("incremental", 0)
+    run = db.wallet_audits.find_one({"mode": "incremental"})
+    assert run['since'] == db.wallet_audits.find_one({"mode": "full"})['highWater']
+    after = checkpoints(db)
+    assert (after[USER_ID]['net'], after[USER_ID]['entries']) == (8250, 3)
+    # Users without new entries keep their sums; only the mark moves
+    for user_oid in (POOR_USER_ID, BLOCKED_USER_ID):
+        assert (after[user_oid]['net'], after[user_oid]['entries']) == (after_full[user_oid]['net'], 1)
+    assert {doc['through'] for doc in after.values()} == {run['highWater']}
+
+
+def test_an_incremental_run_reads_only_entries_since_the_mark(monkeypatch, db, books):
+    audit.audit_wallets()
+    spend(db, books[POOR_USER_ID], 2)
+    reads = []
+    ledger_sums = audit.ledger_sums
+
+    def recording(user_match, since, high_water):
+        reads.append(since)
+        return ledger_sums(user_match, since, high_water)
+
+    monkeypatch.setattr(audit, 'ledger_sums', recording)
+    assert audit.audit_wallets()['discrepancies'] == 0
+    assert reads and None not in reads
+    assert checkpoints(db)[POOR_USER_ID]['net'] == 300
+
+
+def test_a_seeded_discrepancy_is_reported(app, db, books):
+    audit.audit_wallets()
+    # A wallet changed without its ledger row
+    db.users.update_one({"_id": USER_ID}, {"$inc": {"walletBalance": 50}})
+    orphan = build_payment_history_doc({"_id": ObjectId(), "name": "Gone", "mobile": "9000000099"},
+                                       "credit", 20, "Top-up")
+    append_entries([orphan])
+
+    summary = audit.audit_wallets()
+
+    assert (summary['discrepancies'], summary['totalDifference']) == (2, 70.0)
+    body = app.test_client().get('/api/admin/wallet-audit').get_json()
+    assert body['run']['mode'] == "incremental"
+    reports = {report['userId']: report for report in body['discrepancies']}
+    assert (reports[str(USER_ID)]['walletBalance'], reports[str(USER_ID)]['ledgerBalance']) == (150, 100)
+    assert reports[str(USER_ID)]['difference'] == 50
+    gone = reports[str(orphan['userId'])]
+    assert (gone['walletBalance'], gone['ledgerBalance'], gone['entries']) == (None, 20, 1)
+    # The next full run still reports the drift
+    assert audit.audit_wallets(full=True)['discrepancies'] == 2
+
+
+def test_a_mismatch_that_settles_before_the_recheck_is_not_reported(monkeypatch, db, books):
+    audit.audit_wallets()
+    recheck_user = audit.recheck_user
+
+    def settled_meanwhile(user_oid):
+        # The debit's ledger row lands after the sums were read
+        db.users.update_one({"_id": user_oid}, {"$inc": {"walletBalance": 10}})
+        return recheck_user(user_oid)
+
+    db.users.update_one({"_id": POOR_USER_ID}, {"$inc": {"walletBalance": -10}})
+    monkeypatch.setattr(audit, 'recheck_user', settled_meanwhile)
+
+    assert audit.audit_wallets()['discrepancies'] == 0
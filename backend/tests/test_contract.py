@@ -0,0 +1,193 @@
+"""The Flask app and the Quart/Motor app must answer the shared routes alike.
+
+Each scenario is a list of requests.  It runs once against each app, each
+on its own seeded database and scripted vendor, and the status codes,
+bodies and resulting wallet balances must match.  Ids and timestamps
+minted during the run differ between the two and are masked.
+"""
+import asyncio
+import json
+import re
+
+import pytest
+
+from conftest import (BLOCKED_USER_ID, DL_SERVICE_ID, LLR_SERVICE_ID, POOR_USER_ID, USER_ID,
+                      SEED, Vendor, VendorSession, seed_database, seed_database_async)
+
+pytest.importorskip('quart')
+pytest.importorskip('mongomock_motor')
+
+VOLATILE_KEYS = {'_id', 'pdfId', 'createdAt', 'updatedAt', 'lastChecked', 'completedAt'}
+JWT = re.compile(r'^[\w-]+\.[\w-]+\.[\w-]+$')
+
+EXAM = {"userId": str(USER_ID), "serviceId": str(LLR_SERVICE_ID),
+        "applno": "ap123", "dob": "01-01-1990", "pass": "secret"}
+DL = {"userId": str(USER_ID), "serviceId": str(DL_SERVICE_ID), "dlno": "ap0120200001234"}
+
+
+def step(method, path, json=None, auth=None, headers=None):
+    return {"method": method, "path": path, "json": json, "auth": auth, "headers": headers or {}}
+
+
+SCENARIOS = {
+    "refresh": (None, [
+        step('GET', f'/api/user/refresh/{USER_ID}'),
+        step('GET', f'/api/user/refresh/{BLOCKED_USER_ID}'),
+        step('GET', '/api/user/refresh/650000000000000000000999'),
+    ]),
+    "llr-submit-and-list": (None, [
+        step('POST', '/api/llr/submit-exam', EXAM, auth=USER_ID),
+        step('GET', f'/api/llr/user-tokens/{USER_ID}'),
+        step('POST', '/api/llr/check-status', {"token": "tok-1"}),
+        step('POST', '/api/llr/check-status/batch', {"tokens": ["tok-1", "missing"]}),
+    ]),
+    "llr-validation": (None, [
+        step('POST', '/api/llr/submit-exam', dict(EXAM, applno="")),
+        step('POST', '/api/llr/submit-exam', dict(EXAM, userId=str(POOR_USER_ID))),
+        step('POST', '/api/llr/submit-exam', dict(EXAM, userId=str(BLOCKED_USER_ID))),
+        step('POST', '/api/llr/check-status', {}),
+        step('POST', '/api/llr/check-status/batch', {"tokens": []}),
+    ]),
+    "llr-vendor-rejects": ({"doexam.php": (200, {"status": "404", "message": "No record"})}, [
+        step('POST', '/api/llr/submit-exam', EXAM, auth=USER_ID),
+    ]),
+    "llr-refund": ({"checkexam.php": (200, {"status": "300", "message": "Refunded by RTO"})}, [
+        step('POST', '/api/llr/submit-exam', EXAM, auth=USER_ID),
+        step('POST', '/api/llr/check-status', {"token": "tok-1"}),
+        step('POST', '/api/llr/check-status', {"token": "tok-1"}),
+    ]),
+    "llr-batch-refund": ({"checkexam.php": (200, {"status": "300", "message": "Refunded by RTO"})}, [
+        step('POST', '/api/llr/submit-exam', EXAM, auth=USER_ID),
+        step('POST', '/api/llr/check-status/batch', {"tokens": ["tok-1"]}),
+        step('GET', f'/api/llr/user-tokens/{USER_ID}'),
+    ]),
+    "llr-batch-completed": ({"checkexam.php": (200, {"status": "200", "message": "JVBERi0xLjQK",
+                                                     "filename": "AP123.pdf", "remarks": "Pass"})}, [
+        step('POST', '/api/llr/submit-exam', EXAM, auth=USER_ID),
+        step('POST', '/api/llr/check-status/batch', {"tokens": ["tok-1"]}),
+        step('POST', '/api/llr/download-pdf', {"token": "tok-1"}),
+    ]),
+    "llr-completed": ({"checkexam.php": (200, {"status": "200", "message": "JVBERi0xLjQK",
+                                               "filename": "AP123.pdf", "remarks": "Pass"})}, [
+        step('POST', '/api/llr/submit-exam', EXAM, auth=USER_ID),
+        step('POST', '/api/llr/check-status', {"token": "tok-1"}),
+        step('POST', '/api/llr/download-pdf', {"token": "tok-1"}),
+        step('GET', '/api/llr/download-pdf/tok-1/file'),
+    ]),
+    "llr-idempotent-replay": (None, [
+        step('POST', '/api/llr/submit-exam', EXAM, auth=USER_ID, headers={"Idempotency-Key": "k-1"}),
+        step('POST', '/api/llr/submit-exam', EXAM, auth=USER_ID, headers={"Idempotency-Key": "k-1"}),
+        step('POST', '/api/llr/submit-exam', dict(EXAM, pin="1"), auth=USER_ID, headers={"Idempotency-Key": "k-1"}),
+    ]),
+    "dl-generate": (None, [
+        step('POST', '/api/dl/generate-pdf', DL),
+        step('GET', f'/api/dl/user-pdfs/{USER_ID}'),
+    ]),
+    "dl-vendor-fails": ({"dlpdfapi.php": (200, {"status": "400", "message": "Invalid DL number"})}, [
+        step('POST', '/api/dl/generate-pdf', DL),
+        step('POST', '/api/dl/generate-pdf', dict(DL, userId=str(POOR_USER_ID))),
+        step('POST', '/api/dl/generate-pdf', {"userId": str(USER_ID)}),
+    ]),
+}
+
+
+def mask(value):
+    if isinstance(value, dict):
+        return {key: '<volatile>' if key in VOLATILE_KEYS else mask(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [mask(item) for item in value]
+    if isinstance(value, str) and JWT.match(value):
+        return '<jwt>'
+    return value
+
+
+def outcome(status_code, content_type, data):
+    if content_type.startswith('application/json'):
+        return status_code, mask(json.loads(data))
+    return status_code, content_type, data
+
+
+def request_headers(item, tokens):
+    headers = dict(item['headers'])
+    if item['auth']:
+        headers['Authorization'] = f"Bearer {tokens[item['auth']]}"
+    return headers
+
+
+def scripted_vendor(answers):
+    vendor = Vendor()
+    vendor.answers.update(answers or {})
+    return vendor
+
+
+def run_flask(answers, steps, tokens):
+    import mongomock
+
+    from servicehub import create_app
+    from servicehub.extensions import Services
+    from servicehub.vendor import VendorClient
+
+    vendor = scripted_vendor(answers)
+    app = create_app(Services(mongo_client=mongomock.MongoClient(),
+                              vendor_client=VendorClient(VendorSession(vendor))))
+    db = app.extensions['servicehub'].db
+    seed_database(db)
+    client = app.test_client()
+    results = []
+    for item in steps:
+        response = client.open(item['path'], method=item['method'], json=item['json'],
+                               headers=request_headers(item, tokens))
+        results.append(outcome(response.status_code, response.content_type or '', response.get_data()))
+    wallets = {str(user['_id']): user['walletBalance'] for user in db.users.find()}
+    return results, wallets, vendor.calls
+
+
+async def run_quart(answers, steps, tokens):
+    import httpx
+    from mongomock_motor import AsyncMongoMockClient
+
+    from servicehub.aio import create_async_app
+    from servicehub.aio.extensions import AsyncServices
+    from servicehub.vendor import AsyncVendorClient
+
+    vendor = scripted_vendor(answers)
+    services = AsyncServices(mongo_client=AsyncMongoMockClient(),
+                             vendor_client=AsyncVendorClient(httpx.AsyncClient(transport=vendor.transport())))
+    app = create_async_app(services)
+    db = services.db
+    await seed_database_async(db)
+    client = app.test_client()
+    results = []
+    for item in steps:
+        response = await client.open(item['path'], method=item['method'], json=item['json'],
+                                     headers=request_headers(item, tokens))
+        results.append(outcome(response.status_code, response.content_type or '', await response.get_data()))
+    wallets = {str(user['_id']): user['walletBalance'] async for user in db.users.find()}
+    await services.close()
+    return results, wallets, vendor.calls
+
+
+@pytest.fixture(scope='module')
+def tokens():
+    from servicehub.auth import issue_user_token
+    return {user['_id']: issue_user_token(user) for user in SEED['users']}
+
+
+@pytest.mark.parametrize('name', list(SCENARIOS))
+def test_apps_agree(name, tokens):
+    answers, steps = SCENARIOS[name]
+    flask_results, flask_wallets, flask_calls = run_flask(answers, steps, tokens)
+    quart_results, quart_wallets, quart_calls = asyncio.run(run_quart(answers, steps, tokens))
+
+    for index, (flask_result, quart_result) in enumerate(zip(flask_results, quart_results)):
+        assert flask_result == quart_result, f"step {index}: {steps[index]['method']} {steps[index]['path']}"
+    assert flask_wallets == quart_wallets
+    assert flask_calls == quart_calls
+
+
+def test_scenarios_reach_the_vendor(tokens):
+    # Guards against a scenario that agrees only because both apps failed early
+    results, wallets, calls = run_flask(*SCENARIOS['llr-refund'], tokens)
+    assert [status for status, _ in results] == [200, 200, 200]
+    assert calls == ['doexam.php', 'checkexam.php']
+    assert wallets[str(USER_ID)] == 100.0
@@ -0,0 +1,30 @@
+"""DL PDF generation served from the recent-PDF cache."""
+import mongomock
+
+from servicehub.blueprints import dl
+
+from conftest import DL_SERVICE_ID, USER_ID
+
+DL = {"userId": str(USER_ID), "serviceId": str(DL_SERVICE_ID), "dlno": "ap0120200001234"}
+
+
+def test_free_cache_hit_survives_the_user_going_away(monkeypatch, app, vendor):
+    monkeypatch.setattr(dl, 'DL_CACHE_TTL_SECONDS', 3600)
+    monkeypatch.setattr(dl, 'DL_CACHE_CHARGE_POLICY', 'free')
+    client = app.test_client()
+    assert client.post('/api/dl/generate-pdf', json=DL).status_code == 200
+
+    find_one = mongomock.collection.Collection.find_one
+
+    def deleted_before_the_balance_read(self, filter=None, *args, **kwargs):
+        if self.name == 'users' and args and args[0] == {"walletBalance": 1}:
+            return None
+        return find_one(self, filter, *args, **kwargs)
+
+    monkeypatch.setattr(mongomock.collection.Collection, 'find_one', deleted_before_the_balance_read)
+    response = client.post('/api/dl/generate-pdf', json=DL)
+
+    assert response.status_code == 200
+    assert response.get_json()['cached'] is True
+    assert response.get_json()['newWalletBalance'] == 0
+    assert vendor.calls == ['dlpdfapi.php']
@@ -0,0 +1,127 @@
+"""Ledger buckets and the reader that merges them with legacy payment_history rows."""
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from bson.objectid import ObjectId
+
+from servicehub import ledger
+from servicehub.helpers import build_payment_history_doc
+
+from conftest import POOR_USER_ID, USER_ID
+
+START = datetime(2026, 10, 1, 9, 0)
+
+
+@pytest.fixture
+def user(db):
+    return db.users.find_one({"_id": USER_ID})
+
+
+def entries(user, count, start=START, amount=10, transaction_type="debit"):
+    docs = []
+    for index in range(count):
+        doc = build_payment_history_doc(user, transaction_type, amount, f"order {index}",
+                                        str(ObjectId()), 100 - amount * (index + 1))
+        doc['createdAt'] = start + timedelta(minutes=index)
+        docs.append(doc)
+    return docs
+
+
+def test_buckets_never_grow_past_the_cap(monkeypatch, db, user, app_context):
+    monkeypatch.setattr(ledger, 'LEDGER_BUCKET_MAX_ENTRIES', 5)
+    ledger.append_entries(entries(user, 4))
+    # Would have been pushed whole into the 4-entry bucket
+    ledger.append_entries(entries(user, 3, start=START + timedelta(hours=1)))
+    ledger.append_entries(entries(user, 12, start=START + timedelta(hours=2)))
+    ledger.append_entries(entries(user, 1, start=START + timedelta(hours=3)))
+
+    buckets = list(db.ledger_buckets.find({"u": USER_ID}))
+    assert all(bucket['n'] == len(bucket['e']) <= 5 for bucket in buckets)
+    assert sum(bucket['n'] for bucket in buckets) == 20
+    assert len(ledger.read_user_history(USER_ID)) == 20
+
+
+def test_batches_of_several_users_and_months_split_per_bucket(monkeypatch, db, user, app_context):
+    monkeypatch.setattr(ledger, 'LEDGER_BUCKET_MAX_ENTRIES', 3)
+    other = db.users.find_one({"_id": POOR_USER_ID})
+    ledger.append_entries(entries(user, 4) + entries(other, 2) + entries(user, 2, start=datetime(2026, 11, 2)))
+
+    counts = sorted((bucket['u'] == USER_ID, bucket['m'], bucket['n']) for bucket in db.ledger_buckets.find())
+    assert counts == [(False, 202610, 2), (True, 202610, 1), (True, 202610, 3), (True, 202611, 2)]
+
+
+def test_compact_entries_round_trip(user):
+    doc = build_payment_history_doc(user, "refund", 12.5, "Refund", str(ObjectId()), 87.25)
+    doc['_id'] = ObjectId()
+    doc['createdAt'] = START
+    entry = ledger.compact_entry(doc)
+
+    assert (entry['t'], entry['a'], entry['b']) == ("r", 1250, 8725)
+    assert isinstance(entry['r'], ObjectId)
+    assert ledger.expand_entry(entry, USER_ID, user) == doc
+
+
+def test_merge_history_orders_legacy_rows_and_bucket_entries_together(user):
+    legacy = entries(user, 2, start=START + timedelta(minutes=30))
+    bucketed = entries(user, 2, start=START)
+    for doc in bucketed:
+        doc['_id'] = ObjectId()
+    bucket = {"u": USER_ID, "m": 202610, "n": 2, "e": [ledger.compact_entry(doc) for doc in bucketed]}
+
+    history = ledger.merge_history(legacy, [bucket], user)
+
+    assert [entry['createdAt'] for entry in history] == sorted(
+        [doc['createdAt'] for doc in legacy + bucketed], reverse=True
+    )
+    assert history[2:] == list(reversed(bucketed))
+    assert all(entry['userName'] == "Ravi" for entry in history)
+
+
+def test_read_user_history_spans_both_formats(db, user, app_context):
+    legacy = entries(user, 3, transaction_type="credit")
+    db.payment_history.insert_many([dict(doc) for doc in legacy])
+    ledger.append_entries(entries(user, 2, start=START + timedelta(days=1)))
+
+    history = ledger.read_user_history(USER_ID)
+
+    assert len(history) == 5
+    assert [entry['transactionType'] for entry in history] == ["debit"] * 2 + ["credit"] * 3
+    assert all(isinstance(entry['referenceId'], str) for entry in history)
+    assert ledger.history_balance(history) == (30 - 20) * 100
+    assert ledger.read_user_history(POOR_USER_ID) == []
+
+
+def test_migration_keeps_the_history_unchanged(monkeypatch, db, user, app_context):
+    monkeypatch.setattr(ledger, 'LEDGER_BUCKET_MAX_ENTRIES', 4)
+    db.payment_history.insert_many(entries(user, 9))
+    before = ledger.read_user_history(USER_ID)
+
+    assert ledger.migrate_legacy_ledger(batch_size=5) == 9
+    assert db.payment_history.count_documents({}) == 0
+    assert all(bucket['n'] <= 4 for bucket in db.ledger_buckets.find())
+    assert ledger.read_user_history(USER_ID) == before
+
+
+def test_rerunning_an_interrupted_migration_copies_nothing_twice(monkeypatch, db, user, app_context):
+    monkeypatch.setattr(ledger, 'LEDGER_BUCKET_MAX_ENTRIES', 4)
+    db.payment_history.insert_many(entries(user, 9))
+    before = ledger.read_user_history(USER_ID)
+    delete_many = mongomock.collection.Collection.delete_many
+
+    def interrupted(self, *args, **kwargs):
+        if self.name == 'payment_history':
+            raise RuntimeError("worker killed")
+        return delete_many(self, *args, **kwargs)
+
+    # Without transactions the first batch reaches the buckets but stays in payment_history
+    monkeypatch.setattr(mongomock.collection.Collection, 'delete_many', interrupted)
+    with pytest.raises(RuntimeError):
+        ledger.migrate_legacy_ledger(batch_size=5)
+    monkeypatch.setattr(mongomock.collection.Collection, 'delete_many', delete_many)
+
+    assert ledger.migrate_legacy_ledger(batch_size=5) == 9
+    buckets = list(db.ledger_buckets.find())
+    assert all(bucket['n'] == len(bucket['e']) <= 4 for bucket in buckets)
+    assert sum(bucket['n'] for bucket in buckets) == 9
+    assert ledger.read_user_history(USER_ID) == before
@@ -0,0 +1,55 @@
+"""Bulk LLR submission: every row that does not end up as a token is refunded."""
+import json
+
+import pytest
+
+from servicehub.blueprints import llr
+
+from conftest import LLR_SERVICE_ID, USER_ID
+
+CSV = "applno,dob,pass\nap1,01-01-1990,secret\nap2,02-02-1991,secret\n"
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def submit(client):
+    response = client.post('/api/llr/submit-exam/bulk',
+                           data={"userId": str(USER_ID), "serviceId": str(LLR_SERVICE_ID), "csv": CSV})
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def balance(db):
+    return db.users.find_one({"_id": USER_ID})['walletBalance']
+
+
+def test_unexpected_vendor_answer_is_refunded(client, vendor, db):
+    vendor.answers['doexam.php'] = (200, ["unexpected"])
+    lines = submit(client)
+
+    assert lines[0]['newWalletBalance'] == 40
+    assert [line['success'] for line in lines[1:-1]] == [False, False]
+    assert (lines[-1]['failed'], lines[-1]['refunded'], lines[-1]['newWalletBalance']) == (2, 60, 100)
+    assert balance(db) == 100
+    assert db.llr_tokens.count_documents({}) == 0
+
+
+def test_a_row_that_raises_is_refunded(monkeypatch, client, db):
+    build = llr.build_llr_token_doc
+
+    def failing_for_ap2(user, service, price, response, clean):
+        if clean['applno'] == 'AP2':
+            raise KeyError('token')
+        return build(user, service, price, response, clean)
+
+    monkeypatch.setattr(llr, 'build_llr_token_doc', failing_for_ap2)
+    lines = submit(client)
+
+    rows = {line['applno']: line['success'] for line in lines[1:-1]}
+    assert rows == {"AP1": True, "AP2": False}
+    assert (lines[-1]['submitted'], lines[-1]['failed'], lines[-1]['newWalletBalance']) == (1, 1, 70)
+    assert balance(db) == 70
+    assert db.llr_tokens.count_documents({}) == 1
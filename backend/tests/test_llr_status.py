@@ -0,0 +1,96 @@
+"""Batch LLR status checks: one bulk write for the changes, a settled refund per refunded token."""
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+
+from servicehub.blueprints import llr
+
+from conftest import PDF_BASE64, USER_ID
+
+ANSWERS = {
+    "t-queue": {"status": "500", "queue": "1", "remarks": "Under process"},
+    "t-done": {"status": "200", "message": PDF_BASE64, "filename": "T.pdf", "remarks": "Pass"},
+    "t-refund-1": {"status": "300", "message": "Refunded by RTO"},
+    "t-refund-2": {"status": "300", "message": "Refunded by RTO"},
+    "t-same": {"status": "100", "queue": "2", "message": "In queue"},
+}
+
+
+@pytest.fixture
+def tokens(db):
+    checked = datetime.utcnow() - timedelta(hours=1)
+    db.llr_tokens.insert_many([
+        {"token": token, "userId": USER_ID, "applno": token.upper(), "status": "submitted",
+         "servicePrice": 30, "queue": "2", "lastChecked": checked,
+         "latestResponse": {"status": "100", "queue": "2", "message": "In queue"}}
+        for token in ANSWERS
+    ])
+    return list(ANSWERS)
+
+
+@pytest.fixture
+def counted(monkeypatch):
+    calls = {"bulk_write": 0, "update_one": 0, "refunds": 0}
+    bulk_write = mongomock.collection.Collection.bulk_write
+    update_one = mongomock.collection.Collection.update_one
+    settle_refund = llr.settle_refund
+
+    def counting_bulk_write(self, *args, **kwargs):
+        if self.name == 'llr_tokens':
+            calls['bulk_write'] += 1
+        return bulk_write(self, *args, **kwargs)
+
+    def counting_update_one(self, *args, **kwargs):
+        if self.name == 'llr_tokens':
+            calls['update_one'] += 1
+        return update_one(self, *args, **kwargs)
+
+    def counting_refund(*args, **kwargs):
+        calls['refunds'] += 1
+        return settle_refund(*args, **kwargs)
+
+    monkeypatch.setattr(mongomock.collection.Collection, 'bulk_write', counting_bulk_write)
+    monkeypatch.setattr(mongomock.collection.Collection, 'update_one', counting_update_one)
+    monkeypatch.setattr(llr, 'settle_refund', counting_refund)
+    monkeypatch.setattr(llr, 'fetch_llr_status', lambda token, user_id=None: dict(ANSWERS[token]))
+    return calls
+
+
+def test_batch_writes_changes_once_and_refunds_each_token(app, db, tokens, counted):
+    response = app.test_client().post('/api/llr/check-status/batch', json={"tokens": tokens})
+    assert response.status_code == 200
+
+    results = {result['token']: result for result in response.get_json()['results']}
+    assert results['t-done']['pdfAvailable'] and 'message' not in results['t-done']
+    # The changes went out together; only the refunds were settled one by one
+    assert counted['bulk_write'] == 1
+    assert counted['refunds'] == 2
+    assert counted['update_one'] == 2
+
+    statuses = {doc['token']: doc['status'] for doc in db.llr_tokens.find()}
+    assert statuses == {"t-queue": "processing", "t-done": "completed", "t-refund-1": "refunded",
+                        "t-refund-2": "refunded", "t-same": "submitted"}
+    assert db.llr_tokens.find_one({"token": "t-done"})['pdfHash']
+    assert db.pdf_blobs.find_one()['refCount'] == 1
+    assert db.users.find_one({"_id": USER_ID})['walletBalance'] == 160
+
+
+def test_a_completion_that_lost_gives_its_pdf_back(monkeypatch, app, db, tokens, counted):
+    done_id = db.llr_tokens.find_one({"token": "t-done"})['_id']
+    find_one = mongomock.collection.Collection.find_one
+
+    def completed_by_another_check(self, filter=None, *args, **kwargs):
+        doc = find_one(self, filter, *args, **kwargs)
+        if self.name == 'llr_tokens' and filter == {"_id": done_id}:
+            self.update_one({"_id": done_id}, {"$set": {"status": "completed"}})
+        return doc
+
+    monkeypatch.setattr(mongomock.collection.Collection, 'find_one', completed_by_another_check)
+    response = app.test_client().post('/api/llr/check-status/batch', json={"tokens": ["t-done", "t-queue"]})
+
+    assert response.status_code == 200
+    assert counted['bulk_write'] == 1
+    assert db.pdf_blobs.find_one()['refCount'] == 0
+    assert 'pdfHash' not in db.llr_tokens.find_one({"_id": done_id})
+    assert db.llr_tokens.find_one({"token": "t-queue"})['status'] == 'processing'
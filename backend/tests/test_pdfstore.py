@@ -0,0 +1,35 @@
+"""Moving inline PDFs into ``pdf_blobs`` keeps every blob's ``refCount`` exact."""
+import mongomock
+
+from servicehub import pdfstore
+
+from conftest import PDF_BASE64, USER_ID
+
+
+def test_dedupe_counts_only_the_records_it_moved(monkeypatch, db, app_context):
+    db.dl_pdfs.insert_many([{"userId": USER_ID, "status": "completed", "pdfData": PDF_BASE64,
+                             "apiResponse": {"pdf": PDF_BASE64}} for _ in range(3)])
+    db.llr_tokens.insert_one({"userId": USER_ID, "status": "completed", "pdfData": PDF_BASE64})
+    data = pdfstore.decode_pdf(PDF_BASE64)
+    key = pdfstore.pdf_hash(data)
+    find = mongomock.collection.Collection.find
+    raced = []
+
+    def find_while_another_run_moves_one(self, *args, **kwargs):
+        docs = list(find(self, *args, **kwargs))
+        if self.name == 'dl_pdfs' and docs and not raced:
+            raced.append(True)
+            db.pdf_blobs.bulk_write([pdfstore.blob_operation(key, data)])
+            self.update_one({"_id": docs[0]['_id']},
+                            {"$set": {"pdfHash": key, "apiResponse.pdf": None}, "$unset": {"pdfData": ""}})
+        return iter(docs)
+
+    monkeypatch.setattr(mongomock.collection.Collection, 'find', find_while_another_run_moves_one)
+    report = pdfstore.dedupe_pdfs(batch_size=10)
+
+    assert report['records'] == 3
+    assert db.pdf_blobs.find_one({"_id": key})['refCount'] == 4
+    assert db.dl_pdfs.count_documents({"pdfHash": key}) + db.llr_tokens.count_documents({"pdfHash": key}) == 4
+    assert db.dl_pdfs.count_documents({"apiResponse.pdf": None}) == 3
+    assert pdfstore.collect_garbage(grace_seconds=-60, recount=True) == \
+        {"referencesFixed": 0, "blobsRemoved": 0, "bytesReclaimed": 0}
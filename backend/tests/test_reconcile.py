@@ -0,0 +1,123 @@
+"""Payment reconciliation against the stubbed pg-order-status gateway."""
+from datetime import datetime, timedelta
+
+import pytest
+from bson.objectid import ObjectId
+
+from servicehub import reconcile
+from servicehub.ledger import read_user_history
+
+from conftest import POOR_USER_ID, USER_ID
+
+HOUR = timedelta(hours=1)
+
+
+@pytest.fixture
+def payments(db):
+    def create(transaction_id, age, amount=200, user_oid=USER_ID, status="pending"):
+        db.payments.insert_one({
+            "userId": user_oid, "amount": amount, "transactionId": transaction_id, "status": status,
+            "createdAt": datetime.utcnow() - age, "updatedAt": datetime.utcnow()
+        })
+    return create
+
+
+def balance(db, user_oid=USER_ID):
+    return db.users.find_one({"_id": user_oid})['walletBalance']
+
+
+def credits(user_oid=USER_ID):
+    return [row for row in read_user_history(user_oid) if row['transactionType'] == 'credit']
+
+
+def test_callback_racing_the_worker_credits_once(app, vendor, db, payments):
+    payments("TXN1", HOUR)
+    vendor.payments["TXN1"] = "200"
+    client = app.test_client()
+    gateway = vendor.payment_status
+
+    def callback_arrives_meanwhile(params):
+        if vendor.calls.count('pg-order-status.php') == 1:
+            # The worker is waiting on the gateway when the callback comes in
+            assert client.post('/api/payment/callback?token=TXN1').status_code == 200
+        return gateway(params)
+
+    vendor.answers['pg-order-status.php'] = callback_arrives_meanwhile
+    with app.app_context():
+        summary = reconcile.reconcile_pending_payments(workers=1)
+        assert summary['raced'] == 1 and 'success' not in summary
+        assert [row['amount'] for row in credits()] == [200]
+
+    assert client.post('/api/payment/callback?token=TXN1').status_code == 200
+    assert balance(db) == 300
+    payment = db.payments.find_one({"transactionId": "TXN1"})
+    assert payment['status'] == 'success' and payment['settledAt']
+
+
+def test_worker_settles_payments_whose_callback_never_came(vendor, db, payments, app_context):
+    payments("TXN-PAID", HOUR, amount=500)
+    payments("TXN-PAID-POOR", HOUR, amount=250, user_oid=POOR_USER_ID)
+    vendor.payments.update({"TXN-PAID": "200", "TXN-PAID-POOR": "200"})
+
+    summary = reconcile.reconcile_pending_payments(workers=2)
+
+    assert summary['success'] == 2
+    assert summary['pendingPayments'] == 0
+    assert (balance(db), balance(db, POOR_USER_ID)) == (600, 255)
+    assert [row['balanceAfter'] for row in credits(POOR_USER_ID)] == [255]
+    assert reconcile.reconcile_pending_payments() == {"pendingPayments": 0, "oldestPendingAgeSeconds": 0}
+
+
+def test_payments_pending_too_long_expire(vendor, db, payments, app_context):
+    expiry = timedelta(seconds=reconcile.PAYMENT_PENDING_EXPIRY_SECONDS)
+    payments("TXN-OLD", expiry + HOUR)
+    payments("TXN-WAITING", HOUR)
+    payments("TXN-OLD-PAID", expiry + HOUR, amount=300)
+    vendor.payments["TXN-OLD-PAID"] = "200"
+
+    summary = reconcile.reconcile_pending_payments()
+
+    assert (summary['expired'], summary['pending'], summary['success']) == (1, 1, 1)
+    statuses = {payment['transactionId']: payment['status'] for payment in db.payments.find()}
+    assert statuses == {"TXN-OLD": "expired", "TXN-WAITING": "pending", "TXN-OLD-PAID": "success"}
+    assert balance(db) == 400
+    assert summary['pendingPayments'] == 1
+
+
+def test_keyset_paging_checks_every_payment_once(vendor, db, payments, app_context):
+    same_moment = datetime.utcnow() - HOUR
+    for index in range(7):
+        db.payments.insert_one({"_id": ObjectId(), "userId": USER_ID, "amount": 200,
+                                "transactionId": f"TXN-TIE-{index}", "status": "pending",
+                                "createdAt": same_moment})
+    for index in range(4):
+        payments(f"TXN-{index}", HOUR + timedelta(minutes=index))
+    # Too young to have missed its callback, and already settled
+    payments("TXN-NEW", timedelta(seconds=1))
+    payments("TXN-DONE", HOUR, status="success")
+    vendor.payments["TXN-TIE-3"] = "200"
+
+    asked = []
+    gateway = vendor.payment_status
+
+    def record(params):
+        asked.append(params['txnid'])
+        return gateway(params)
+
+    vendor.answers['pg-order-status.php'] = record
+    summary = reconcile.reconcile_pending_payments(batch_size=3, workers=2)
+
+    expected = {f"TXN-TIE-{index}" for index in range(7)} | {f"TXN-{index}" for index in range(4)}
+    assert sorted(asked) == sorted(expected)
+    assert (summary['pending'], summary['success']) == (10, 1)
+    assert summary['pendingPayments'] == 11
+
+
+def test_status_checks_queue_under_the_payer(app, vendor, db, payments, app_context):
+    payments("TXN-RICH", HOUR)
+    payments("TXN-POOR", HOUR, user_oid=POOR_USER_ID)
+    reconcile.reconcile_pending_payments()
+    app.test_client().post('/api/payment/callback?token=TXN-RICH')
+
+    users = app.extensions['servicehub'].vendor.scheduler.snapshot()['users']
+    assert {key: user['granted'] for key, user in users.items()} == {str(USER_ID): 2, str(POOR_USER_ID): 1}
@@ -0,0 +1,124 @@
+"""The pending-request work queue: claims, leases, release and responding under a claim."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import DL_SERVICE_ID, USER_ID
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def requests(db):
+    start = datetime.utcnow() - timedelta(hours=1)
+    return [
+        db.service_requests.insert_one({
+            "userId": USER_ID, "serviceId": DL_SERVICE_ID, "serviceName": "DL PDF", "servicePrice": 20,
+            "status": "pending", "createdAt": start + timedelta(minutes=index)
+        }).inserted_id
+        for index in range(3)
+    ]
+
+
+def claim(client, admin_id, request_id=None):
+    payload = {"adminId": admin_id}
+    if request_id:
+        payload['requestId'] = str(request_id)
+    return client.post('/api/admin/service-requests/claim', json=payload)
+
+
+def respond(client, request_id, status="success", admin_id=None):
+    payload = {"status": status, "adminMessage": "done"}
+    if admin_id:
+        payload['adminId'] = admin_id
+    return client.put(f'/api/admin/service-request/{request_id}/respond', json=payload)
+
+
+def expire_claim(db, request_id):
+    db.service_requests.update_one({"_id": request_id},
+                                   {"$set": {"claimExpiresAt": datetime.utcnow() - timedelta(seconds=1)}})
+
+
+def test_claims_hand_out_the_oldest_unclaimed_request(client, requests):
+    first = claim(client, "admin-a").get_json()['request']
+    second = claim(client, "admin-b").get_json()['request']
+
+    assert [first['_id'], second['_id']] == [str(requests[0]), str(requests[1])]
+    assert first['claimedBy'] == "admin-a"
+    claim(client, "admin-c")
+    assert claim(client, "admin-d").get_json() == {"success": True, "request": None,
+                                                    "message": "No pending requests"}
+
+
+def test_claiming_a_named_request(client, db, requests):
+    response = claim(client, "admin-a", requests[2])
+    assert response.status_code == 200
+    lease = db.service_requests.find_one({"_id": requests[2]})['claimExpiresAt']
+
+    assert claim(client, "admin-b", requests[2]).status_code == 409
+    # Claiming it again renews the holder's lease
+    assert claim(client, "admin-a", requests[2]).status_code == 200
+    assert db.service_requests.find_one({"_id": requests[2]})['claimExpiresAt'] >= lease
+    assert claim(client, "admin-a", "650000000000000000000999").status_code == 404
+    assert claim(client, "admin-a", "bad").status_code == 400
+
+
+def test_responding_to_another_admins_claim_is_refused(client, db, requests):
+    claim(client, "admin-a", requests[0])
+
+    # With or without an adminId
+    assert respond(client, requests[0]).status_code == 409
+    assert respond(client, requests[0], "failed", admin_id="admin-b").status_code == 409
+    assert db.service_requests.find_one({"_id": requests[0]})['status'] == 'pending'
+    assert db.users.find_one({"_id": USER_ID})['walletBalance'] == 100
+
+    assert respond(client, requests[0], admin_id="admin-a").status_code == 200
+    done = db.service_requests.find_one({"_id": requests[0]})
+    assert done['status'] == 'success' and 'claimedBy' not in done
+    assert claim(client, "admin-a", requests[0]).status_code == 409
+
+
+def test_an_expired_lease_can_be_taken_over(client, db, requests):
+    claim(client, "admin-a", requests[0])
+    expire_claim(db, requests[0])
+
+    assert respond(client, requests[0], "failed").status_code == 200
+    assert db.users.find_one({"_id": USER_ID})['walletBalance'] == 120
+
+    claim(client, "admin-a", requests[1])
+    expire_claim(db, requests[1])
+    assert claim(client, "admin-b", requests[1]).get_json()['request']['claimedBy'] == "admin-b"
+
+
+def test_release_is_for_the_holder_only(client, db, requests):
+    claim(client, "admin-a", requests[0])
+    release = f'/api/admin/service-request/{requests[0]}/release'
+
+    assert client.post(release, json={"adminId": "admin-b"}).status_code == 409
+    assert client.post(release, json={"adminId": "admin-a"}).status_code == 200
+    assert 'claimedBy' not in db.service_requests.find_one({"_id": requests[0]})
+    assert respond(client, requests[0], admin_id="admin-b").status_code == 200
+
+
+def test_batch_respond_respects_claims_without_an_admin_id(client, db, requests):
+    claim(client, "admin-a", requests[0])
+    response = client.put('/api/admin/service-request/respond/batch', json={"responses": [
+        {"requestId": str(requests[0]), "status": "success"},
+        {"requestId": str(requests[1]), "status": "success"},
+    ]})
+
+    results = response.get_json()['results']
+    assert results[0] == {"index": 0, "success": False, "error": "Request is being handled by another admin"}
+    assert results[1] == {"index": 1, "success": True}
+
+
+def test_queue_lists_pending_oldest_first(client, requests):
+    claim(client, "admin-a", requests[1])
+    body = client.get('/api/admin/service-requests/queue?limit=2').get_json()
+
+    assert [item['_id'] for item in body['requests']] == [str(requests[0]), str(requests[1])]
+    assert body['stats']['claimedRequests'] == 1
+    assert client.get('/api/admin/service-requests/queue?limit=x').status_code == 400
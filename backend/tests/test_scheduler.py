@@ -0,0 +1,138 @@
+"""Weighted fair queueing of vendor calls, threaded and asyncio."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from servicehub.scheduler import AsyncFairScheduler, FairScheduler
+from servicehub.vendor import VendorUnavailable
+
+# The light retailer's two calls go out between the heavy one's, not after all of them
+FAIR_ORDER = ["light", "heavy", "light", "heavy", "heavy", "heavy"]
+
+
+def wait_for_queued(scheduler, count):
+    deadline = time.monotonic() + 5
+    while scheduler.snapshot()['queued'] < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_a_light_retailer_is_not_stuck_behind_a_heavy_one():
+    scheduler = FairScheduler(lambda: 1, user_cap=1, max_queue=4, weights={})
+    served = []
+
+    def call(key):
+        scheduler.acquire(key)
+        served.append(key)
+        scheduler.release(key)
+
+    scheduler.acquire("heavy")
+    threads = []
+    for key in ["heavy"] * 4 + ["light"] * 2:
+        thread = threading.Thread(target=call, args=(key,))
+        thread.start()
+        threads.append(thread)
+        wait_for_queued(scheduler, len(threads))
+    scheduler.release("heavy")
+    for thread in threads:
+        thread.join(5)
+
+    assert served == FAIR_ORDER
+    users = scheduler.snapshot()['users']
+    assert (users['heavy']['granted'], users['light']['granted']) == (5, 2)
+    assert scheduler.snapshot()['inflight'] == 0
+
+
+def test_weights_buy_a_bigger_share():
+    scheduler = FairScheduler(lambda: 1, user_cap=1, max_queue=8, weights={"partner": 2})
+    queue = scheduler.queue
+    scheduler.acquire("other")
+    owners = {}
+    for key in ["partner"] * 6 + ["other"] * 3:
+        owners[id(queue.enter(key, threading.Event))] = key
+
+    served = []
+    key = "other"
+    for _ in range(9):
+        [woken] = queue.leave(key)
+        key = owners[id(woken)]
+        served.append(key)
+
+    assert served[:6].count("partner") == 4
+
+
+def test_a_full_queue_rejects_without_waiting():
+    scheduler = FairScheduler(lambda: 1, user_cap=1, max_queue=1, weights={})
+    scheduler.acquire("heavy")
+    waiting = threading.Thread(target=lambda: scheduler.release(scheduler.acquire("heavy")))
+    waiting.start()
+    wait_for_queued(scheduler, 1)
+
+    with pytest.raises(VendorUnavailable) as raised:
+        scheduler.acquire("heavy")
+    assert raised.value.retry_after == 1
+    # Other retailers still queue
+    other = threading.Thread(target=lambda: scheduler.release(scheduler.acquire("light")))
+    other.start()
+    wait_for_queued(scheduler, 2)
+
+    scheduler.release("heavy")
+    waiting.join(5)
+    other.join(5)
+    assert scheduler.snapshot()['rejected'] == 1
+    assert scheduler.snapshot()['inflight'] == 0
+
+
+def test_a_call_that_waits_too_long_gives_up():
+    scheduler = FairScheduler(lambda: 1, user_cap=1, max_queue=4, max_wait=0.01, weights={})
+    scheduler.acquire("heavy")
+
+    with pytest.raises(VendorUnavailable):
+        scheduler.acquire("light")
+    assert scheduler.snapshot()['queued'] == 0
+    scheduler.release("heavy")
+    assert scheduler.acquire("light") == "light"
+
+
+def test_async_scheduler_is_fair_and_rejects_a_full_queue():
+    async def run():
+        scheduler = AsyncFairScheduler(lambda: 1, user_cap=1, max_queue=4, weights={})
+        served = []
+
+        async def call(key):
+            await scheduler.acquire(key)
+            served.append(key)
+            scheduler.release(key)
+
+        await scheduler.acquire("heavy")
+        tasks = [asyncio.ensure_future(call(key)) for key in ["heavy"] * 4 + ["light"] * 2]
+        await asyncio.sleep(0)
+        assert scheduler.snapshot()['queued'] == 6
+        with pytest.raises(VendorUnavailable):
+            await scheduler.acquire("heavy")
+
+        scheduler.release("heavy")
+        await asyncio.gather(*tasks)
+        return served, scheduler.snapshot()
+
+    served, snapshot = asyncio.run(run())
+    assert served == FAIR_ORDER
+    assert (snapshot['rejected'], snapshot['inflight'], snapshot['queued']) == (1, 0, 0)
+
+
+def test_async_cancelled_waiter_leaves_the_queue():
+    async def run():
+        scheduler = AsyncFairScheduler(lambda: 1, user_cap=1, max_queue=4, weights={})
+        await scheduler.acquire("heavy")
+        waiting = asyncio.ensure_future(scheduler.acquire("light"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        scheduler.release("heavy")
+        return scheduler.snapshot()
+
+    snapshot = asyncio.run(run())
+    assert (snapshot['inflight'], snapshot['queued']) == (0, 0)
@@ -0,0 +1,115 @@
+"""Service deletion: hidden at once, prices purged by the purge-services worker."""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import mongomock
+import pytest
+from bson.objectid import ObjectId
+
+from servicehub import purge
+
+from conftest import DL_SERVICE_ID, LLR_SERVICE_ID, USER_ID
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def prices(monkeypatch, db):
+    monkeypatch.setattr(purge, 'time', SimpleNamespace(sleep=lambda seconds: None))
+    db.user_service_prices.insert_many(
+        [{"userId": ObjectId(), "serviceId": DL_SERVICE_ID, "price": 15} for _ in range(5)]
+        + [{"userId": USER_ID, "serviceId": LLR_SERVICE_ID, "price": 25}]
+    )
+
+
+def deletion(client, service_id=DL_SERVICE_ID):
+    response = client.get(f'/api/admin/services/{service_id}/deletion')
+    return response.status_code, (response.get_json() or {}).get('deletion')
+
+
+def purge_services(app, *args):
+    result = app.test_cli_runner().invoke(args=['purge-services', '--once', *args])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_deleting_hides_the_service_and_leaves_the_purge_to_the_worker(client, db, prices):
+    assert deletion(client)[0] == 404
+    assert client.delete(f'/api/admin/services/{DL_SERVICE_ID}').status_code == 200
+
+    listed = client.get(f'/api/user/services/{USER_ID}').get_json()['services']
+    assert [service['_id'] for service in listed] == [str(LLR_SERVICE_ID)]
+    admin_listed = client.get('/api/admin/services').get_json()['services']
+    assert str(DL_SERVICE_ID) not in [service['_id'] for service in admin_listed]
+    order = client.post('/api/user/service-request', json={"userId": str(USER_ID), "serviceId": str(DL_SERVICE_ID)})
+    assert order.status_code == 404
+    # Nothing runs in the request; the record stays
+    assert db.user_service_prices.count_documents({"serviceId": DL_SERVICE_ID}) == 5
+    assert db.services.find_one({"_id": DL_SERVICE_ID})['name'] == "DL PDF"
+    status, progress = deletion(client)
+    assert status == 200
+    assert (progress['status'], progress['pricesTotal'], progress['pricesDeleted']) == ("pending", 5, 0)
+
+    assert client.delete(f'/api/admin/services/{DL_SERVICE_ID}').status_code == 404
+
+
+def test_purge_removes_prices_in_batches_and_reports_progress(monkeypatch, client, db, prices, app_context):
+    client.delete(f'/api/admin/services/{DL_SERVICE_ID}')
+    seen = []
+    delete_many = mongomock.collection.Collection.delete_many
+
+    def watched(self, *args, **kwargs):
+        result = delete_many(self, *args, **kwargs)
+        if self.name == 'user_service_prices':
+            seen.append(db.services.find_one({"_id": DL_SERVICE_ID})['deletion']['status'])
+        return result
+
+    assert purge.claim_service_purge() == DL_SERVICE_ID
+    monkeypatch.setattr(mongomock.collection.Collection, 'delete_many', watched)
+    assert purge.purge_service_prices(DL_SERVICE_ID, batch_size=2, pause=0) == 5
+
+    assert seen == ["running"] * 3
+    _, progress = deletion(client)
+    assert (progress['status'], progress['pricesDeleted']) == ("done", 5)
+    assert progress['finishedAt']
+    assert db.user_service_prices.count_documents({}) == 1
+
+
+def test_purge_services_command_finishes_pending_and_stalled_purges(app, client, db, prices):
+    client.delete(f'/api/admin/services/{DL_SERVICE_ID}')
+    client.delete(f'/api/admin/services/{LLR_SERVICE_ID}')
+    # Another purger is still advancing this one
+    db.services.update_one({"_id": LLR_SERVICE_ID}, {"$set": {"deletion.status": "running"}})
+
+    output = purge_services(app)
+
+    assert f"Service {DL_SERVICE_ID}: removed 5 prices" in output
+    assert db.user_service_prices.count_documents({"serviceId": DL_SERVICE_ID}) == 0
+    assert deletion(client, LLR_SERVICE_ID)[1]['status'] == "running"
+    assert db.user_service_prices.count_documents({"serviceId": LLR_SERVICE_ID}) == 1
+
+    # It stopped making progress, so the next pass takes it over
+    db.services.update_one({"_id": LLR_SERVICE_ID},
+                           {"$set": {"deletion.updatedAt": datetime.utcnow() - timedelta(hours=1)}})
+    assert f"Service {LLR_SERVICE_ID}: removed 1 prices" in purge_services(app)
+    assert deletion(client, LLR_SERVICE_ID)[1]['status'] == "done"
+    assert purge_services(app) == ""
+
+
+def test_a_failing_purge_is_left_for_a_later_pass(monkeypatch, client, db, prices, app_context):
+    client.delete(f'/api/admin/services/{DL_SERVICE_ID}')
+    purge_service_prices = purge.purge_service_prices
+
+    def primary_down(service_oid, *args, **kwargs):
+        raise ConnectionError("primary stepped down")
+
+    monkeypatch.setattr(purge, 'purge_service_prices', primary_down)
+    assert purge.run_service_purges(stale_seconds=0) == {}
+    assert deletion(client)[1]['status'] == "running"
+
+    monkeypatch.setattr(purge, 'purge_service_prices', purge_service_prices)
+    assert purge.run_service_purges(stale_seconds=0) == {str(DL_SERVICE_ID): 5}
+    assert db.user_service_prices.count_documents({"serviceId": DL_SERVICE_ID}) == 0
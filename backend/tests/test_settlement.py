@@ -0,0 +1,130 @@
+"""Wallet debits, order settlement and refunds, with and without transactions."""
+import pytest
+from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from servicehub import settlement
+from servicehub.helpers import credit_wallet, debit_wallet
+from servicehub.ledger import read_user_history
+
+from conftest import RollbackSession, USER_ID
+
+
+@pytest.fixture(params=['off', 'transaction'])
+def mode(request, monkeypatch, app_context):
+    """The settlement mode under test; the session in ``transaction`` mode, else None."""
+    monkeypatch.setattr(settlement, '_transactions_supported', None)
+    if request.param == 'off':
+        monkeypatch.setattr(settlement, 'SETTLEMENT_TRANSACTIONS', 'off')
+        return None
+    return request.getfixturevalue('transactions')
+
+
+@pytest.fixture
+def user(db):
+    return db.users.find_one({"_id": USER_ID}, {"name": 1, "mobile": 1})
+
+
+def balance(db):
+    return db.users.find_one({"_id": USER_ID})['walletBalance']
+
+
+def ledger(transaction_type=None):
+    rows = read_user_history(USER_ID)
+    return [row for row in rows if transaction_type in (None, row['transactionType'])]
+
+
+def test_debit_wallet_only_when_covered(db, app_context):
+    assert debit_wallet(USER_ID, 30) == 70
+    assert debit_wallet(USER_ID, 71) is None
+    assert balance(db) == 70
+    assert credit_wallet(USER_ID, 30) == 100
+    assert debit_wallet(ObjectId(), 1) is None
+
+
+def test_settle_order_debits_and_records(mode, db, user):
+    record = {"userId": USER_ID, "status": "completed"}
+    record_id, new_balance = settlement.settle_order(user, 30, db.dl_pdfs, record, "DL PDF Generation - X")
+
+    assert new_balance == 70
+    assert balance(db) == 70
+    assert db.dl_pdfs.count_documents({"_id": record_id}) == 1
+    [row] = ledger()
+    assert (row['transactionType'], row['amount'], row['balanceAfter']) == ("debit", 30, 70)
+    assert row['referenceId'] == str(record_id)
+    if mode:
+        assert mode.commits == 1
+
+
+def test_settle_order_refused_without_funds(mode, db, user):
+    assert settlement.settle_order(user, 101, db.dl_pdfs, {"userId": USER_ID}, "too dear") is None
+    assert balance(db) == 100
+    assert db.dl_pdfs.count_documents({}) == 0
+    assert ledger() == []
+
+
+def test_settle_order_against_a_reservation_debits_once(mode, db, user):
+    reserved = debit_wallet(USER_ID, 30)
+    record_id, new_balance = settlement.settle_order(user, 30, db.llr_tokens, {"userId": USER_ID},
+                                                     "LLR exam", reserved_balance=reserved)
+    assert new_balance == 70
+    assert balance(db) == 70
+    assert [row['balanceAfter'] for row in ledger("debit")] == [70]
+
+
+def test_settling_the_same_order_twice_charges_once(mode, db, user):
+    record = {"_id": ObjectId(), "userId": USER_ID}
+    settlement.settle_order(user, 30, db.dl_pdfs, dict(record), "first")
+    with pytest.raises(DuplicateKeyError):
+        settlement.settle_order(user, 30, db.dl_pdfs, dict(record), "again")
+
+    assert balance(db) == 70
+    assert db.dl_pdfs.count_documents({}) == 1
+    assert len(ledger("debit")) == 1
+    if mode:
+        assert (mode.commits, mode.aborts) == (1, 1)
+
+
+def test_settle_refund_credits_at_most_once(mode, db):
+    token_id = db.llr_tokens.insert_one({"userId": USER_ID, "status": "submitted", "servicePrice": 30}).inserted_id
+    debit_wallet(USER_ID, 30)
+
+    def refund():
+        return settlement.settle_refund(
+            db.llr_tokens, {"_id": token_id, "status": {"$ne": "refunded"}},
+            {"$set": {"status": "refunded"}}, USER_ID, 30, "Refund for LLR", str(token_id)
+        )
+
+    assert refund() == 100
+    assert refund() is None
+    assert balance(db) == 100
+    assert db.llr_tokens.find_one({"_id": token_id})['status'] == 'refunded'
+    [row] = ledger("refund")
+    assert (row['amount'], row['balanceAfter'], row['referenceId']) == (30, 100, str(token_id))
+
+
+def test_reserve_and_refund_order_batch(mode, db, user):
+    items = [(ObjectId(), 30, "row 1"), (ObjectId(), 30, "row 2"), (ObjectId(), 30, "row 3")]
+    assert settlement.reserve_order_batch(user, items) == 10
+    assert settlement.reserve_order_batch(user, items) is None
+    assert settlement.refund_order_batch(USER_ID, items[1:]) == 70
+
+    assert balance(db) == 70
+    assert sorted(row['balanceAfter'] for row in ledger("debit")) == [10, 40, 70]
+    assert sorted(row['balanceAfter'] for row in ledger("refund")) == [40, 70]
+
+
+def test_falls_back_when_the_deployment_has_no_transactions(monkeypatch, mongo, db, user, app_context):
+    class StandaloneSession(RollbackSession):
+        def with_transaction(self, callback, **kwargs):
+            raise OperationFailure("Transaction numbers are only allowed on a replica set member or mongos",
+                                   code=settlement.ILLEGAL_OPERATION)
+
+    monkeypatch.setattr(settlement, 'SETTLEMENT_TRANSACTIONS', 'auto')
+    monkeypatch.setattr(settlement, '_transactions_supported', None)
+    monkeypatch.setattr(mongo, 'start_session', lambda **kwargs: StandaloneSession(db), raising=False)
+
+    record_id, new_balance = settlement.settle_order(user, 30, db.dl_pdfs, {"userId": USER_ID}, "DL")
+    assert new_balance == 70
+    assert settlement._transactions_supported is False
+    assert db.dl_pdfs.count_documents({"_id": record_id}) == 1
@@ -0,0 +1,116 @@
+"""Request coalescing: concurrent callers for one key share a single call."""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from servicehub.metrics import metrics
+from servicehub.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def wait_for_shared(name, count):
+    deadline = time.monotonic() + 5
+    while metrics.get('singleflight_shared', flight=name) < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def run_together(flight, name, fn, callers=5):
+    """Start ``callers`` calls for one key; ``fn`` runs until every follower is waiting on it."""
+    gate = threading.Event()
+    calls = []
+
+    def leader_call():
+        calls.append(1)
+        gate.wait(5)
+        return fn()
+
+    def call():
+        try:
+            return flight.do("token-1", leader_call)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        futures = [pool.submit(call) for _ in range(callers)]
+        wait_for_shared(name, callers - 1)
+        gate.set()
+        results = [future.result(5) for future in futures]
+    return results, len(calls)
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight('test-share')
+    results, calls = run_together(flight, 'test-share', lambda: {"status": "processing"})
+
+    assert calls == 1
+    assert results == [{"status": "processing"}] * 5
+    # The next call after the flight lands runs again
+    assert flight.do("token-1", lambda: "fresh") == "fresh"
+
+
+def test_the_leaders_exception_reaches_every_waiter():
+    flight = SingleFlight('test-error')
+
+    def vendor_down():
+        raise ConnectionError("vendor down")
+
+    results, calls = run_together(flight, 'test-error', vendor_down)
+
+    assert calls == 1
+    assert len({id(result) for result in results}) == 1
+    assert isinstance(results[0], ConnectionError)
+    assert flight.do("token-1", lambda: "recovered") == "recovered"
+
+
+def test_different_keys_do_not_wait_on_each_other():
+    flight = SingleFlight('test-keys')
+    assert [flight.do(key, lambda key=key: key.upper()) for key in ("a", "b")] == ["A", "B"]
+    assert metrics.get('singleflight_shared', flight='test-keys') == 0
+
+
+def test_async_callers_share_one_call_and_its_exception():
+    async def run():
+        flight = AsyncSingleFlight('test-async')
+        calls = []
+
+        async def check():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"status": "completed"}
+
+        async def fail():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ConnectionError("vendor down")
+
+        shared = await asyncio.gather(*[flight.do("token-1", check) for _ in range(4)])
+        failed = await asyncio.gather(*[flight.do("token-2", fail) for _ in range(3)], return_exceptions=True)
+        return shared, failed, len(calls), flight
+
+    shared, failed, calls, flight = asyncio.run(run())
+    assert calls == 2
+    assert shared == [{"status": "completed"}] * 4
+    assert all(isinstance(error, ConnectionError) for error in failed)
+    assert flight._calls == {}
+
+
+def test_async_waiter_cancelled_does_not_cancel_the_call():
+    async def run():
+        flight = AsyncSingleFlight('test-async-cancel')
+
+        async def check():
+            await asyncio.sleep(0.01)
+            return "done"
+
+        impatient = asyncio.ensure_future(flight.do("token-1", check))
+        patient = asyncio.ensure_future(flight.do("token-1", check))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await impatient
+        return await patient
+
+    assert asyncio.run(run()) == "done"
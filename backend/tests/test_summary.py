@@ -0,0 +1,122 @@
+"""The per-user dashboard summary: incremental updates, guarded rebuilds and settlement."""
+import mongomock
+import pytest
+from bson.objectid import ObjectId
+
+from servicehub import settlement, summary
+from servicehub.helpers import build_payment_history_doc
+from servicehub.ledger import append_entries
+
+from conftest import DL_SERVICE_ID, LLR_SERVICE_ID, USER_ID
+
+EXAM = {"userId": str(USER_ID), "serviceId": str(LLR_SERVICE_ID),
+        "applno": "ap123", "dob": "01-01-1990", "pass": "secret"}
+DL = {"userId": str(USER_ID), "serviceId": str(DL_SERVICE_ID), "dlno": "ap0120200001234"}
+COUNT_FIELDS = ('requestCounts', 'transactionCounts', 'llrTokenCounts', 'dlPdfCounts')
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def dashboard(client):
+    response = client.get(f'/api/user/summary/{USER_ID}')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def counts(doc):
+    return {field: {key: value for key, value in doc[field].items() if value} for field in COUNT_FIELDS}
+
+
+def test_orders_and_llr_status_changes_are_counted(client, vendor, db, app):
+    dashboard(client)
+    assert client.post('/api/llr/submit-exam', json=EXAM).status_code == 200
+    assert client.post('/api/dl/generate-pdf', json=DL).status_code == 200
+
+    first = dashboard(client)
+    assert first['llrTokenCounts'] == {"submitted": 1, "total": 1}
+    assert first['dlPdfCounts'] == {"completed": 1, "total": 1}
+    assert first['transactionCounts'] == {"debit": 2, "total": 2}
+
+    vendor.answers['checkexam.php'] = (200, {"status": "300", "message": "Refunded by RTO"})
+    assert client.post('/api/llr/check-status', json={"token": "tok-1"}).status_code == 200
+
+    stored = db.user_summaries.find_one({"_id": USER_ID})
+    assert counts(stored)['llrTokenCounts'] == {"refunded": 1, "total": 1}
+    assert counts(stored)['transactionCounts'] == {"debit": 2, "refund": 1, "total": 3}
+    with app.app_context():
+        assert counts(stored) == counts(summary.build_user_summary(USER_ID))
+
+
+def test_rebuild_keeps_an_update_made_while_it_reads(monkeypatch, db, app_context):
+    user = db.users.find_one({"_id": USER_ID})
+    build = summary.build_user_summary
+    raced = []
+
+    def build_while_a_debit_lands(user_oid):
+        result = build(user_oid)
+        if not raced:
+            raced.append(True)
+            append_entries([build_payment_history_doc(user, "debit", 30, "raced", str(ObjectId()), 70)])
+        return result
+
+    monkeypatch.setattr(summary, 'build_user_summary', build_while_a_debit_lands)
+    rebuilt = summary.get_user_summary(USER_ID)
+
+    stored = db.user_summaries.find_one({"_id": USER_ID})
+    assert rebuilt['transactionCounts'] == stored['transactionCounts'] == {"debit": 1, "total": 1}
+    assert not stored.get('stale')
+
+
+def test_rebuild_gives_up_and_leaves_the_summary_stale(monkeypatch, db, app_context):
+    build = summary.build_user_summary
+
+    def build_while_writers_keep_landing(user_oid):
+        db.user_summaries.update_one({"_id": user_oid}, {"$inc": {"version": 1}})
+        return build(user_oid)
+
+    monkeypatch.setattr(summary, 'build_user_summary', build_while_writers_keep_landing)
+    assert summary.get_user_summary(USER_ID)['transactionCounts'] == {"total": 0}
+    assert db.user_summaries.find_one({"_id": USER_ID})['stale'] is True
+
+
+def test_summary_write_failure_does_not_abort_a_settlement(monkeypatch, transactions, db, app_context):
+    summary.get_user_summary(USER_ID)
+    bulk_write = mongomock.collection.Collection.bulk_write
+
+    def failing_for_summaries(self, *args, **kwargs):
+        if self.name == 'user_summaries':
+            raise RuntimeError("summary write failed")
+        return bulk_write(self, *args, **kwargs)
+
+    monkeypatch.setattr(mongomock.collection.Collection, 'bulk_write', failing_for_summaries)
+    user = db.users.find_one({"_id": USER_ID}, {"name": 1, "mobile": 1})
+    record_id, new_balance = settlement.settle_order(user, 30, db.dl_pdfs, {"userId": USER_ID}, "DL")
+
+    assert (transactions.commits, transactions.aborts) == (1, 0)
+    assert new_balance == 70
+    assert db.dl_pdfs.count_documents({"_id": record_id}) == 1
+
+
+def test_summary_updates_wait_for_the_commit(transactions, db, app_context):
+    summary.get_user_summary(USER_ID)
+    seen_inside = []
+    user = db.users.find_one({"_id": USER_ID}, {"name": 1, "mobile": 1})
+    with_transaction = transactions.with_transaction
+
+    def record_summary_inside(callback, **kwargs):
+        def work(session):
+            result = callback(session)
+            seen_inside.append(db.user_summaries.find_one({"_id": USER_ID})['transactionCounts'])
+            return result
+        return with_transaction(work, **kwargs)
+
+    transactions.with_transaction = record_summary_inside
+    settlement.settle_order(user, 30, db.llr_tokens, {"userId": USER_ID, "status": "submitted"}, "LLR")
+
+    assert seen_inside == [{"total": 0}]
+    stored = db.user_summaries.find_one({"_id": USER_ID})
+    assert counts(stored)['transactionCounts'] == {"debit": 1, "total": 1}
+    assert counts(stored)['llrTokenCounts'] == {"submitted": 1, "total": 1}
@@ -0,0 +1,150 @@
+"""Circuit breakers and the AIMD limiter in front of the vendor API."""
+from types import SimpleNamespace
+
+import pytest
+
+from servicehub import vendor as vendor_module
+from servicehub.vendor import VendorClient, VendorUnavailable
+
+from conftest import LLR_SERVICE_ID, USER_ID
+
+STATUS_URL = 'https://vendor.test/checkexam.php'
+EXAM = {"userId": str(USER_ID), "serviceId": str(LLR_SERVICE_ID),
+        "applno": "ap123", "dob": "01-01-1990", "pass": "secret"}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch, vendor):
+    clock = Clock()
+    monkeypatch.setattr(vendor_module, 'time', SimpleNamespace(monotonic=clock.monotonic))
+    vendor.sleep = clock.advance
+    return clock
+
+
+@pytest.fixture
+def client(vendor, clock):
+    return VendorClient(vendor.session())
+
+
+def fail_times(client, count):
+    for _ in range(count):
+        assert client.get('status', STATUS_URL).status_code == 500
+
+
+def test_breaker_trips_after_the_threshold(client, vendor):
+    vendor.answers['checkexam.php'] = (500, {"status": "500"})
+    breaker = client.breakers['status']
+    fail_times(client, breaker.failure_threshold - 1)
+    assert breaker.state == breaker.CLOSED
+
+    fail_times(client, 1)
+    assert breaker.snapshot() == {"state": "open", "failures": breaker.failure_threshold, "trips": 1}
+    with pytest.raises(VendorUnavailable) as raised:
+        client.get('status', STATUS_URL)
+    assert raised.value.retry_after == breaker.reset_seconds
+    assert len(vendor.calls) == breaker.failure_threshold
+    # Other endpoints have breakers of their own
+    assert client.post('exam', 'https://vendor.test/doexam.php').status_code == 200
+
+
+def test_half_open_probe_success_closes(client, vendor, clock):
+    vendor.answers['checkexam.php'] = (500, {"status": "500"})
+    breaker = client.breakers['status']
+    fail_times(client, breaker.failure_threshold)
+
+    clock.advance(breaker.reset_seconds)
+    vendor.answers['checkexam.php'] = (200, {"status": "100"})
+    assert breaker.allow()
+    # One probe at a time
+    assert not breaker.allow()
+    breaker.cancel_probe()
+
+    assert client.get('status', STATUS_URL).status_code == 200
+    assert breaker.snapshot() == {"state": "closed", "failures": 0, "trips": 1}
+
+
+def test_half_open_probe_failure_opens_again(client, vendor, clock):
+    vendor.answers['checkexam.php'] = (500, {"status": "500"})
+    breaker = client.breakers['status']
+    fail_times(client, breaker.failure_threshold)
+
+    clock.advance(breaker.reset_seconds - 1)
+    with pytest.raises(VendorUnavailable):
+        client.get('status', STATUS_URL)
+    clock.advance(1)
+    fail_times(client, 1)
+
+    assert (breaker.state, breaker.trips) == (breaker.OPEN, 2)
+    with pytest.raises(VendorUnavailable):
+        client.get('status', STATUS_URL)
+    assert len(vendor.calls) == breaker.failure_threshold + 1
+
+
+def test_open_breaker_answers_503_with_retry_after(app, vendor, clock, db):
+    vendor.answers['doexam.php'] = (502, {"status": "502"})
+    breaker = app.extensions['servicehub'].vendor.breakers['exam']
+    http = app.test_client()
+    for _ in range(breaker.failure_threshold):
+        assert http.post('/api/llr/submit-exam', json=EXAM).status_code != 503
+    clock.advance(10)
+
+    response = http.post('/api/llr/submit-exam', json=EXAM)
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(int(breaker.reset_seconds - 10))
+    assert len(vendor.calls) == breaker.failure_threshold
+    assert db.users.find_one({"_id": USER_ID})['walletBalance'] == 100
+
+
+def test_limit_halves_on_a_latency_spike_and_grows_back(client, vendor):
+    limiter = client.limiter
+    vendor.latency['checkexam.php'] = 8
+    client.get('status', STATUS_URL)
+    start = limiter.limit
+    for _ in range(5):
+        client.get('status', STATUS_URL)
+    assert limiter.limit > start
+    assert limiter.baselines['status'] == 8
+
+    before = limiter.limit
+    vendor.latency['checkexam.php'] = 40
+    client.get('status', STATUS_URL)
+    assert limiter.limit == pytest.approx(before / 2)
+
+    vendor.latency['checkexam.php'] = 8
+    halved = limiter.limit
+    client.get('status', STATUS_URL)
+    assert limiter.limit == pytest.approx(halved + 1 / halved)
+    assert limiter.snapshot()['inflight'] == 0
+
+
+def test_fast_endpoints_are_not_judged_by_jitter(client, vendor):
+    limiter = client.limiter
+    vendor.latency['checkexam.php'] = 0.2
+    client.get('status', STATUS_URL)
+    before = limiter.limit
+    # Three times the baseline, but under the floor for a slow call
+    vendor.latency['checkexam.php'] = 0.6
+    client.get('status', STATUS_URL)
+    assert limiter.limit == pytest.approx(before + 1 / before)
+
+
+def test_limiter_saturation_fails_fast(client, vendor):
+    client.limiter.limit = 1
+    assert client.limiter.try_acquire()
+    with pytest.raises(VendorUnavailable) as raised:
+        client.get('status', STATUS_URL)
+    assert raised.value.retry_after == 1
+    assert client.limiter.rejected == 1
+    assert vendor.calls == []
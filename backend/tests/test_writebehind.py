@@ -0,0 +1,122 @@
+"""Write-behind buffering of bookkeeping fields such as ``lastChecked``."""
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+from servicehub.writebehind import AsyncWriteBehindBuffer, WriteBehindBuffer
+
+
+class FlakyCollection:
+    """Counts bulk writes and fails the next ``failures`` of them."""
+
+    def __init__(self, collection, failures=0):
+        self.collection = collection
+        self.failures = failures
+        self.writes = 0
+
+    def bulk_write(self, operations, **kwargs):
+        self.writes += 1
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("primary stepped down")
+        return self.collection.bulk_write(operations, **kwargs)
+
+
+class AsyncCollection:
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def bulk_write(self, operations, **kwargs):
+        return self.collection.bulk_write(operations, **kwargs)
+
+
+@pytest.fixture
+def tokens(db):
+    return db.llr_tokens.insert_many([{"token": f"t-{index}"} for index in range(3)]).inserted_ids
+
+
+def checked(db):
+    return {doc['token']: doc.get('lastChecked') for doc in db.llr_tokens.find()}
+
+
+def test_updates_are_merged_and_written_when_the_buffer_fills(db, tokens):
+    collection = FlakyCollection(db.llr_tokens)
+    buffer = WriteBehindBuffer('test-size', collection, interval=60, max_pending=2)
+    first = datetime(2026, 10, 1, 9, 0)
+    second = datetime(2026, 10, 1, 9, 5)
+
+    buffer.set(tokens[0], {"lastChecked": first, "queue": "3"})
+    buffer.set(tokens[0], {"lastChecked": second})
+    assert collection.writes == 0
+    assert buffer.pending(tokens[0]) == {"lastChecked": second, "queue": "3"}
+
+    buffer.set(tokens[1], {"lastChecked": first})
+    assert collection.writes == 1
+    assert checked(db) == {"t-0": second, "t-1": first, "t-2": None}
+    assert buffer.pending(tokens[0]) == {}
+    buffer.close()
+
+
+def test_pending_updates_are_written_every_interval(db, tokens):
+    collection = FlakyCollection(db.llr_tokens)
+    buffer = WriteBehindBuffer('test-interval', collection, interval=0.01, max_pending=100)
+    buffer.set(tokens[2], {"lastChecked": datetime(2026, 10, 1, 9, 0)})
+
+    deadline = time.monotonic() + 5
+    while checked(db)["t-2"] is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+    buffer.close()
+    assert buffer.pending(tokens[2]) == {}
+
+
+def test_a_failed_flush_puts_the_updates_back(db, tokens):
+    collection = FlakyCollection(db.llr_tokens, failures=1)
+    buffer = WriteBehindBuffer('test-retry', collection, interval=60, max_pending=100)
+    buffer.set(tokens[0], {"lastChecked": datetime(2026, 10, 1, 9, 0), "queue": "3"})
+
+    buffer.flush()
+    assert checked(db)["t-0"] is None
+    # A newer value set meanwhile wins over the one that failed to go out
+    buffer.set(tokens[0], {"lastChecked": datetime(2026, 10, 1, 9, 5)})
+    assert buffer.pending(tokens[0]) == {"lastChecked": datetime(2026, 10, 1, 9, 5), "queue": "3"}
+
+    buffer.flush()
+    assert collection.writes == 2
+    doc = db.llr_tokens.find_one({"_id": tokens[0]})
+    assert (doc['lastChecked'], doc['queue']) == (datetime(2026, 10, 1, 9, 5), "3")
+    buffer.close()
+
+
+def test_close_writes_what_is_pending_and_discard_drops_it(db, tokens):
+    buffer = WriteBehindBuffer('test-close', db.llr_tokens, interval=60, max_pending=100)
+    buffer.set(tokens[0], {"lastChecked": datetime(2026, 10, 1, 9, 0)})
+    buffer.set(tokens[1], {"lastChecked": datetime(2026, 10, 1, 9, 0)})
+    buffer.discard(tokens[1])
+
+    buffer.close()
+
+    assert checked(db) == {"t-0": datetime(2026, 10, 1, 9, 0), "t-1": None, "t-2": None}
+    buffer._thread.join(5)
+    assert not buffer._thread.is_alive()
+
+
+def test_async_buffer_flushes_on_size_and_on_close(db, tokens):
+    async def run():
+        buffer = AsyncWriteBehindBuffer('test-async', AsyncCollection(db.llr_tokens),
+                                        interval=60, max_pending=2)
+        await buffer.set(tokens[0], {"lastChecked": datetime(2026, 10, 1, 9, 0)})
+        before = checked(db)
+        await buffer.set(tokens[1], {"lastChecked": datetime(2026, 10, 1, 9, 0)})
+        after_size = checked(db)
+        await buffer.set(tokens[2], {"lastChecked": datetime(2026, 10, 1, 9, 5)})
+        await buffer.close()
+        return before, after_size
+
+    before, after_size = asyncio.run(run())
+    assert before["t-0"] is None
+    assert after_size["t-0"] and after_size["t-1"] and after_size["t-2"] is None
+    assert checked(db)["t-2"] == datetime(2026, 10, 1, 9, 5)
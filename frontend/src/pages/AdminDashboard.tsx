@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import { Users, Plus, DollarSign, Home, Settings, Wallet, LogOut, Phone, FileText, MessageSquare, CheckCircle, XCircle, Clock, Eye, ToggleLeft, ToggleRight, Shield, ShieldOff, TrendingUp, Calendar } from 'lucide-react';
 import toast from 'react-hot-toast';
-import { createUser, getAllUsers, updateWallet, createService, getAllServices, toggleServiceStatus, deleteService, getServiceRequests, respondToRequest, getUserServicePrices, setServicePrice, toggleUserStatus, getDashboardStats } from '../services/api';
+import { createUser, getAllUsers, updateWallet, createService, getAllServices, toggleServiceStatus, deleteService, getServiceRequests, respondToRequest, claimServiceRequest, releaseServiceRequest, getUserServicePrices, setServicePrice, toggleUserStatus, getDashboardStats } from '../services/api';
 
 interface User {
   _id: string;
@@ -270,6 +270,33 @@ const AdminDashboard = () => {
     }
   };
 
+  const getAdminId = (): string => {
+    try {
+      return JSON.parse(localStorage.getItem('admin') || '{}').id || '';
+    } catch (error) {
+      return '';
+    }
+  };
+
+  // Claim the request before showing the form, so two admins never answer the same one
+  const openResponseForm = async (request: ServiceRequest) => {
+    try {
+      await claimServiceRequest(getAdminId(), request._id);
+      setSelectedRequest(request);
+      setShowResponseForm(true);
+    } catch (error: any) {
+      toast.error(error.response?.data?.error || 'Failed to claim request');
+      fetchServiceRequests();
+    }
+  };
+
+  const closeResponseForm = () => {
+    if (selectedRequest) {
+      releaseServiceRequest(selectedRequest._id, getAdminId()).catch(() => {});
+    }
+    setShowResponseForm(false);
+  };
+
   const handleRespondToRequest = async (e: React.FormEvent) => {
     e.preventDefault();
     if (!selectedRequest || !responseStatus) {
@@ -279,7 +306,7 @@ const AdminDashboard = () => {
 
     setLoading(true);
     try {
-      await respondToRequest(selectedRequest._id, responseStatus, adminMessage);
+      await respondToRequest(selectedRequest._id, responseStatus, adminMessage, getAdminId());
       toast.success('Response sent successfully!');
       
       setShowResponseForm(false);
@@ -288,8 +315,8 @@ const AdminDashboard = () => {
       setAdminMessage('');
       fetchServiceRequests();
       fetchDashboardStats();
-    } catch (error) {
-      toast.error('Failed to send response');
+    } catch (error: any) {
+      toast.error(error.response?.data?.error || 'Failed to send response');
     } finally {
       setLoading(false);
     }
@@ -514,10 +541,7 @@ const AdminDashboard = () => {
                         
                         {request.status === 'pending' && (
                           <button
-                            onClick={() => {
-                              setSelectedRequest(request);
-                              setShowResponseForm(true);
-                            }}
+                            onClick={() => openResponseForm(request)}
                             className="bg-green-500 hover:bg-green-600 text-white px-2 sm:px-3 py-1 rounded-lg text-xs sm:text-sm transition-colors"
                           >
                             Respond
@@ -1015,7 +1039,7 @@ const AdminDashboard = () => {
                   </button>
                   <button
                     type="button"
-                    onClick={() => setShowResponseForm(false)}
+                    onClick={closeResponseForm}
                     className="flex-1 bg-gray-500 hover:bg-gray-600 text-white py-2 px-4 rounded-lg transition-colors text-sm sm:text-base"
                   >
                     Cancel
@@ -1,8 +1,8 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import { Home, LogOut, User, FileText, Wallet, Phone, Send, Clock, CheckCircle, XCircle, MessageSquare, AlertCircle, RefreshCw, History, CreditCard, TrendingUp, TrendingDown, RotateCcw, Calendar, BookOpen, Eye, EyeOff, Info } from 'lucide-react';
 import toast from 'react-hot-toast';
-import { getUserServices, submitServiceRequest, getUserRequests, refreshUserData, getPaymentHistory, submitLLRExam } from '../services/api';
+import { getUserServices, submitServiceRequest, getUserRequests, getUserSummary, getPaymentHistory, submitLLRExam, newIdempotencyKey } from '../services/api';
 
 interface UserData {
   id: string;
@@ -46,11 +46,17 @@ interface PaymentHistoryEntry {
   referenceId?: string;
 }
 
+interface DashboardSummary {
+  requestCounts: Record<string, number>;
+  transactionCounts: Record<string, number>;
+}
+
 const UserDashboard = () => {
   const [user, setUser] = useState<UserData | null>(null);
   const [services, setServices] = useState<Service[]>([]);
   const [userRequests, setUserRequests] = useState<ServiceRequest[]>([]);
   const [paymentHistory, setPaymentHistory] = useState<PaymentHistoryEntry[]>([]);
+  const [summary, setSummary] = useState<DashboardSummary | null>(null);
   const [selectedService, setSelectedService] = useState<Service | null>(null);
   const [formData, setFormData] = useState<any>({});
   const [showServiceForm, setShowServiceForm] = useState(false);
@@ -58,6 +64,10 @@ const UserDashboard = () => {
   const [loading, setLoading] = useState(false);
   const [refreshing, setRefreshing] = useState(false);
   const [activeTab, setActiveTab] = useState('services');
+  const activeTabRef = useRef(activeTab);
+  // One key per submission attempt: a double tap or a retry after a dropped
+  // connection reuses it, so the server charges only once
+  const submissionKeyRef = useRef<string | null>(null);
   const navigate = useNavigate();
 
   useEffect(() => {
@@ -72,8 +82,7 @@ const UserDashboard = () => {
       const parsedUser = JSON.parse(userData);
       setUser(parsedUser);
       fetchServices(parsedUser.id);
-      fetchUserRequests(parsedUser.id);
-      fetchPaymentHistory(parsedUser.id);
+      refreshUserDataSilently(parsedUser.id);
       
       // Auto-refresh user data every 30 seconds to sync with admin changes
       const refreshInterval = setInterval(() => {
@@ -116,6 +125,38 @@ const UserDashboard = () => {
     };
   }, [navigate]);
 
+  // Full lists are only loaded while their tab is open; the summary covers the rest
+  useEffect(() => {
+    activeTabRef.current = activeTab;
+    if (user) {
+      fetchActiveList(user.id);
+    }
+  }, [activeTab, user?.id]);
+
+  const fetchActiveList = (userId: string) => {
+    if (activeTabRef.current === 'requests') {
+      return fetchUserRequests(userId);
+    }
+    if (activeTabRef.current === 'history') {
+      return fetchPaymentHistory(userId);
+    }
+  };
+
+  const fetchSummary = async (userId: string) => {
+    const response = await getUserSummary(userId);
+    const { user: updatedUser, requestCounts, transactionCounts, recentRequests, recentTransactions } = response.data;
+
+    setUser(updatedUser);
+    localStorage.setItem('user', JSON.stringify(updatedUser));
+    setSummary({ requestCounts, transactionCounts });
+    if (activeTabRef.current !== 'requests') {
+      setUserRequests(recentRequests);
+    }
+    if (activeTabRef.current !== 'history') {
+      setPaymentHistory(recentTransactions);
+    }
+  };
+
   const fetchServices = async (userId: string) => {
     try {
       const response = await getUserServices(userId);
@@ -151,16 +192,9 @@ const UserDashboard = () => {
   // Silent refresh without showing loading indicators
   const refreshUserDataSilently = async (userId: string) => {
     try {
-      const response = await refreshUserData(userId);
-      const updatedUser = response.data.user;
-      
-      // Update user state and localStorage
-      setUser(updatedUser);
-      localStorage.setItem('user', JSON.stringify(updatedUser));
-      
-      // Also refresh requests and payment history to check for updates
-      fetchUserRequests(userId);
-      fetchPaymentHistory(userId);
+      // Balance, counts and recent activity, plus the list on screen if one is open
+      await fetchSummary(userId);
+      fetchActiveList(userId);
     } catch (error: any) {
       if (error.response?.status === 403) {
         toast.error('Your account has been blocked. Please contact administrator.');
@@ -176,17 +210,12 @@ const UserDashboard = () => {
     
     setRefreshing(true);
     try {
-      const response = await refreshUserData(user.id);
-      const updatedUser = response.data.user;
-      
-      setUser(updatedUser);
-      localStorage.setItem('user', JSON.stringify(updatedUser));
+      await fetchSummary(user.id);
       
       // Refresh all data
       await Promise.all([
         fetchServices(user.id),
-        fetchUserRequests(user.id),
-        fetchPaymentHistory(user.id)
+        fetchActiveList(user.id)
       ]);
       
       toast.success('Data refreshed successfully!');
@@ -204,6 +233,7 @@ const UserDashboard = () => {
 
   const handleLogout = () => {
     localStorage.removeItem('user');
+    localStorage.removeItem('authToken');
     toast.success('Logged out successfully');
     navigate('/login');
   };
@@ -263,6 +293,12 @@ const UserDashboard = () => {
     if (!selectedService || !user) return;
 
     setLoading(true);
+    const submissionKey = () => {
+      if (!submissionKeyRef.current) {
+        submissionKeyRef.current = newIdempotencyKey();
+      }
+      return submissionKeyRef.current;
+    };
     try {
       let response;
       
@@ -284,7 +320,8 @@ const UserDashboard = () => {
           formData.dob.trim(),
           formData.pass.trim(),
           formData.pin?.trim() || '',
-          formData.type || 'day'
+          formData.type || 'day',
+          submissionKey()
         );
         
         toast.success(
@@ -308,10 +345,12 @@ const UserDashboard = () => {
         }
 
         // Submit regular service request
-        response = await submitServiceRequest(user.id, selectedService._id, formData);
+        response = await submitServiceRequest(user.id, selectedService._id, formData, submissionKey());
         toast.success('Service request submitted successfully!');
       }
       
+      submissionKeyRef.current = null;
+      
       // Update user wallet balance
       const updatedUser = { ...user, walletBalance: response.data.newWalletBalance };
       setUser(updatedUser);
@@ -320,9 +359,12 @@ const UserDashboard = () => {
       setShowServiceForm(false);
       setSelectedService(null);
       setFormData({});
-      fetchUserRequests(user.id);
-      fetchPaymentHistory(user.id); // Refresh payment history
+      refreshUserDataSilently(user.id); // Refresh counts and recent activity
     } catch (error: any) {
+      // The server answered, so the next attempt is a new submission
+      if (error.response) {
+        submissionKeyRef.current = null;
+      }
       const errorMessage = error.response?.data?.error || 'Failed to submit request';
       
       // Show more helpful error messages for LLR
@@ -670,19 +712,19 @@ const UserDashboard = () => {
               <div className="bg-gradient-to-br from-blue-500 to-indigo-600 text-white p-3 sm:p-4 rounded-xl shadow-lg">
                 <MessageSquare className="w-5 sm:w-6 h-5 sm:h-6 mb-2" />
                 <h3 className="text-xs sm:text-sm font-bold mb-1">Total</h3>
-                <p className="text-lg sm:text-xl font-bold">{userRequests.length}</p>
+                <p className="text-lg sm:text-xl font-bold">{summary?.requestCounts.total ?? userRequests.length}</p>
               </div>
               
               <div className="bg-gradient-to-br from-yellow-500 to-orange-600 text-white p-3 sm:p-4 rounded-xl shadow-lg">
                 <Clock className="w-5 sm:w-6 h-5 sm:h-6 mb-2" />
                 <h3 className="text-xs sm:text-sm font-bold mb-1">Pending</h3>
-                <p className="text-lg sm:text-xl font-bold">{userRequests.filter(r => r.status === 'pending').length}</p>
+                <p className="text-lg sm:text-xl font-bold">{summary ? summary.requestCounts.pending || 0 : userRequests.filter(r => r.status === 'pending').length}</p>
               </div>
               
               <div className="bg-gradient-to-br from-green-500 to-emerald-600 text-white p-3 sm:p-4 rounded-xl shadow-lg col-span-2 lg:col-span-1">
                 <CheckCircle className="w-5 sm:w-6 h-5 sm:h-6 mb-2" />
                 <h3 className="text-xs sm:text-sm font-bold mb-1">Completed</h3>
-                <p className="text-lg sm:text-xl font-bold">{userRequests.filter(r => r.status === 'success').length}</p>
+                <p className="text-lg sm:text-xl font-bold">{summary ? summary.requestCounts.success || 0 : userRequests.filter(r => r.status === 'success').length}</p>
               </div>
             </div>
 
@@ -749,25 +791,25 @@ const UserDashboard = () => {
               <div className="bg-gradient-to-br from-green-500 to-emerald-600 text-white p-3 sm:p-4 rounded-xl shadow-lg">
                 <TrendingUp className="w-5 sm:w-6 h-5 sm:h-6 mb-2" />
                 <h3 className="text-xs sm:text-sm font-bold mb-1">Credits</h3>
-                <p className="text-lg sm:text-xl font-bold">{paymentHistory.filter(h => h.transactionType === 'credit').length}</p>
+                <p className="text-lg sm:text-xl font-bold">{summary ? summary.transactionCounts.credit || 0 : paymentHistory.filter(h => h.transactionType === 'credit').length}</p>
               </div>
               
               <div className="bg-gradient-to-br from-red-500 to-pink-600 text-white p-3 sm:p-4 rounded-xl shadow-lg">
                 <TrendingDown className="w-5 sm:w-6 h-5 sm:h-6 mb-2" />
                 <h3 className="text-xs sm:text-sm font-bold mb-1">Debits</h3>
-                <p className="text-lg sm:text-xl font-bold">{paymentHistory.filter(h => h.transactionType === 'debit').length}</p>
+                <p className="text-lg sm:text-xl font-bold">{summary ? summary.transactionCounts.debit || 0 : paymentHistory.filter(h => h.transactionType === 'debit').length}</p>
               </div>
               
               <div className="bg-gradient-to-br from-blue-500 to-indigo-600 text-white p-3 sm:p-4 rounded-xl shadow-lg">
                 <RotateCcw className="w-5 sm:w-6 h-5 sm:h-6 mb-2" />
                 <h3 className="text-xs sm:text-sm font-bold mb-1">Refunds</h3>
-                <p className="text-lg sm:text-xl font-bold">{paymentHistory.filter(h => h.transactionType === 'refund').length}</p>
+                <p className="text-lg sm:text-xl font-bold">{summary ? summary.transactionCounts.refund || 0 : paymentHistory.filter(h => h.transactionType === 'refund').length}</p>
               </div>
               
               <div className="bg-gradient-to-br from-purple-500 to-violet-600 text-white p-3 sm:p-4 rounded-xl shadow-lg">
                 <History className="w-5 sm:w-6 h-5 sm:h-6 mb-2" />
                 <h3 className="text-xs sm:text-sm font-bold mb-1">Total</h3>
-                <p className="text-lg sm:text-xl font-bold">{paymentHistory.length}</p>
+                <p className="text-lg sm:text-xl font-bold">{summary?.transactionCounts.total ?? paymentHistory.length}</p>
               </div>
             </div>
 
@@ -8,6 +8,23 @@ const api = axios.create({
     'Content-Type': 'application/json',
   },
 });
+
+// Attach the signed user token so the backend can skip the per-request user lookup
+api.interceptors.request.use((config) => {
+  const token = localStorage.getItem('authToken');
+  if (token) {
+    config.headers.Authorization = `Bearer ${token}`;
+  }
+  return config;
+});
+
+// Login and refresh responses carry a fresh short-lived token
+api.interceptors.response.use((response) => {
+  if (response.data?.token && response.data?.user) {
+    localStorage.setItem('authToken', response.data.token);
+  }
+  return response;
+});
 // Admin APIs
 export const adminLogin = (username: string, password: string) => {
   return api.post('/admin/login', { username, password });
@@ -37,6 +54,23 @@ export const updateWallet = (userId: string, walletBalance: number) => {
   return api.put('/admin/update-wallet', { userId, walletBalance });
 };
 
+// Batch admin operations; each returns a per-item `results` array
+export const setServicePricesBatch = (prices: { userId: string; serviceId: string; price: number }[]) => {
+  return api.put('/admin/set-service-price/batch', { prices });
+};
+
+export const updateWalletsBatch = (wallets: { userId: string; walletBalance: number }[]) => {
+  return api.put('/admin/update-wallet/batch', { wallets });
+};
+
+export const toggleUserStatusBatch = (users: { userId: string; isBlocked: boolean }[]) => {
+  return api.put('/admin/toggle-user-status/batch', { users });
+};
+
+export const respondToRequestsBatch = (responses: { requestId: string; status: string; adminMessage?: string }[], adminId?: string) => {
+  return api.put('/admin/service-request/respond/batch', { responses, adminId });
+};
+
 export const getUserServicePrices = (userId: string) => {
   return api.get(`/admin/user-service-prices/${userId}`);
 };
@@ -62,8 +96,22 @@ export const getServiceRequests = () => {
   return api.get('/admin/service-requests');
 };
 
-export const respondToRequest = (requestId: string, status: string, adminMessage: string) => {
-  return api.put(`/admin/service-request/${requestId}/respond`, { status, adminMessage });
+export const respondToRequest = (requestId: string, status: string, adminMessage: string, adminId?: string) => {
+  return api.put(`/admin/service-request/${requestId}/respond`, { status, adminMessage, adminId });
+};
+
+// Pending-request work queue: oldest first, claimed with a lease so admins don't collide
+export const getRequestQueue = (limit?: number) => {
+  return api.get('/admin/service-requests/queue', { params: { limit } });
+};
+
+// Without a requestId, claims the oldest unclaimed request; claiming one already held renews its lease
+export const claimServiceRequest = (adminId: string, requestId?: string) => {
+  return api.post('/admin/service-requests/claim', { adminId, requestId });
+};
+
+export const releaseServiceRequest = (requestId: string, adminId: string) => {
+  return api.post(`/admin/service-request/${requestId}/release`, { adminId });
 };
 
 // User APIs
@@ -80,12 +128,27 @@ export const refreshUserData = (userId: string) => {
   return api.get(`/user/refresh/${userId}`);
 };
 
+// Balance, counts and recent activity for the dashboard home in one call
+export const getUserSummary = (userId: string) => {
+  return api.get(`/user/summary/${userId}`);
+};
+
 export const getUserServices = (userId: string) => {
   return api.get(`/user/services/${userId}`);
 };
 
-export const submitServiceRequest = (userId: string, serviceId: string, fieldData: any) => {
-  return api.post('/user/service-request', { userId, serviceId, fieldData });
+// One key per submission attempt (crypto.randomUUID needs a secure context)
+export const newIdempotencyKey = () =>
+  typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function'
+    ? crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`;
+
+// Pass the same idempotencyKey when retrying a submission so it is not charged twice
+const idempotencyHeaders = (idempotencyKey?: string) =>
+  idempotencyKey ? { headers: { 'Idempotency-Key': idempotencyKey } } : undefined;
+
+export const submitServiceRequest = (userId: string, serviceId: string, fieldData: any, idempotencyKey?: string) => {
+  return api.post('/user/service-request', { userId, serviceId, fieldData }, idempotencyHeaders(idempotencyKey));
 };
 
 export const getUserRequests = (userId: string) => {
@@ -98,18 +161,28 @@ export const getPaymentHistory = (userId: string) => {
 };
 
 // LLR Service APIs
-export const submitLLRExam = (userId: string, serviceId: string, applno: string, dob: string, pass: string, pin?: string, type?: string) => {
-  return api.post('/llr/submit-exam', { userId, serviceId, applno, dob, pass, pin, type });
+export const submitLLRExam = (userId: string, serviceId: string, applno: string, dob: string, pass: string, pin?: string, type?: string, idempotencyKey?: string) => {
+  return api.post('/llr/submit-exam', { userId, serviceId, applno, dob, pass, pin, type }, idempotencyHeaders(idempotencyKey));
 };
 
 export const checkLLRStatus = (token: string) => {
   return api.post('/llr/check-status', { token });
 };
 
+// Checks many tokens in one call; completed/refunded tokens are answered without a vendor call
+export const checkLLRStatusBatch = (tokens: string[]) => {
+  return api.post('/llr/check-status/batch', { tokens });
+};
+
 export const downloadLLRPdf = (token: string) => {
   return api.post('/llr/download-pdf', { token });
 };
 
+// Plain link to the PDF, so the browser caches it and can resume the download
+export const llrPdfFileUrl = (token: string) => {
+  return `${API_BASE_URL}/llr/download-pdf/${encodeURIComponent(token)}/file`;
+};
+
 export const getUserLLRTokens = (userId: string) => {
   return api.get(`/llr/user-tokens/${userId}`);
 };